@@ -0,0 +1,63 @@
+# benchmark suite, from the repository root:
+#
+#   python -m benchmarks                      all benchmarks, results saved per commit
+#   python -m benchmarks --quick              smaller catalogs and fewer runs
+#   python -m benchmarks --compare <commit>   compare with a saved run
+#
+# catalogs and found.db files are synthetic, generated into a temporary directory.
+# Qt benchmarks run on the offscreen platform and are skipped without PySide6
+import argparse
+import importlib.util
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import core, harness
+
+ITEM_COUNTS = [545, 10_000, 100_000]
+QUICK_ITEM_COUNTS = [545, 5_000]
+
+
+def cli():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument(
+        '--items',
+        type=lambda value: [int(count) for count in value.split(',')],
+        help=f'comma separated synthetic catalog sizes, default {ITEM_COUNTS}',
+    )
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--quick', action='store_true')
+    parser.add_argument('--no-ui', action='store_true', help='skip Qt benchmarks')
+    parser.add_argument('--output', type=Path, help='results file, default results/<commit>.json')
+    parser.add_argument('--compare', help='commit or results file to compare with')
+    args = parser.parse_args()
+
+    # before saving, the baseline may be a run of this same commit
+    baseline = harness.load(args.compare) if args.compare else None
+    item_counts = args.items or (QUICK_ITEM_COUNTS if args.quick else ITEM_COUNTS)
+    repeat = 5 if args.quick else args.repeat
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        results = core.run(workdir, item_counts, repeat)
+        if args.no_ui:
+            pass
+        elif importlib.util.find_spec('PySide6') is None:
+            print('PySide6 is not installed, skipping Qt benchmarks')
+        else:
+            from benchmarks import ui
+
+            results.update(ui.run(workdir, item_counts, repeat))
+
+    for name, stats in results.items():
+        ops = f'{stats["ops_per_s"]:>12.0f} ops/s' if 'ops_per_s' in stats else ''
+        print(f'{name:<64}{stats["median_ms"]:>10.3f} ms{ops}')
+    print(f'saved to {harness.save(results, args.output)}')
+    if baseline is not None:
+        print(f'\n{"":<64}{"before":>10}{"after":>10}')
+        print('\n'.join(harness.compare(baseline, results)))
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,127 @@
+import shutil
+from pathlib import Path
+
+import founddb
+import items
+from benchmarks import harness, synthetic
+
+# (query, fuzzy) as typed by users
+REALISTIC_QUERIES = [
+    ('shako', False),
+    ('tal rasha', False),
+    ('ring', False),
+    ('rarity:set slot:ring', False),
+    ('found:no -ring', False),
+    ('harlequn crst', True),
+]
+# queries that match most of the catalog or defeat the indexes
+ADVERSARIAL_QUERIES = [
+    ('e', False),
+    ('a e i o', False),
+    ('zzzzzzzzzzzzzzzzzzzzzzzzzzzzzz', False),
+    ('zzzzzzzzzzzzzzzzzzzzzzzzzzzzzz', True),
+    ('slot:helm,armor,belt,gloves,boots,weapon,shield -rarity:unique', False),
+    ('aaaa eeee iiii', True),
+]
+RECORD_COUNTS = [1_000, 10_000, 100_000, 1_000_000]
+MARKED_ITEMS = 5_000
+
+
+def search_benchmarks(workdir: Path, item_counts: list[int], repeat: int) -> dict:
+    results = {}
+    for item_count in item_counts:
+        catalog = synthetic.catalog(workdir, item_count)
+
+        def cold_load():
+            fresh = items.Catalog(catalog.csv_path, workdir / 'cold.cache')
+            fresh.load()
+
+        results[f'catalog/parse/{item_count}'] = harness.measure(
+            cold_load,
+            max(1, repeat // 5),
+            setup=lambda: (workdir / 'cold.cache').unlink(missing_ok=True),
+        )
+        catalog.load()
+        results[f'catalog/cached/{item_count}'] = harness.measure(
+            lambda: items.Catalog(catalog.csv_path, catalog.cache_path).load(), repeat
+        )
+        results[f'catalog/fuzzy_index/{item_count}'] = harness.measure(
+            catalog.build_fuzzy_index, 1
+        )
+        found_mask = sum(1 << i for i in range(0, item_count, 3))
+        for kind, queries in (
+            ('realistic', REALISTIC_QUERIES),
+            ('adversarial', ADVERSARIAL_QUERIES),
+        ):
+            for query, fuzzy in queries:
+                name = f'search/{kind}/{item_count}/{query}{" ~" if fuzzy else ""}'
+                results[name] = harness.measure(
+                    lambda: catalog.search(query, limit=15, found_mask=found_mask, fuzzy=fuzzy),
+                    repeat,
+                )
+        # typing into a session, every prefix of the query is one search
+        session = items.SearchSession(catalog)
+        results[f'search/session/{item_count}/tal rasha'] = harness.measure(
+            lambda: [session.search('tal rasha'[:i], limit=15) for i in range(1, 10)],
+            repeat,
+            setup=session.clear,
+        )
+    return results
+
+
+def found_benchmarks(workdir: Path, item_count: int, repeat: int) -> dict:
+    results = {}
+    for record_count in RECORD_COUNTS:
+        runs = repeat if record_count < 1_000_000 else max(1, repeat // 10)
+        db_path = synthetic.write_found_db(workdir / 'found.db', record_count, item_count)
+
+        def load():
+            progress = items.Progress(str(db_path))
+            # compaction would rewrite the file measured by the next run
+            progress.compact_slack_records = float('inf')
+            progress.load()
+
+        results[f'found/load/{record_count}'] = harness.measure(load, runs)
+        results[f'found/replay/{record_count}'] = harness.measure(
+            lambda: sum(1 for _ in founddb.read_records(str(db_path))), runs
+        )
+        results[f'found/compact/{record_count}'] = harness.measure(
+            lambda: founddb.compact(str(db_path), founddb.bitset_size_for(item_count)),
+            1,
+        )
+
+        v1_path = synthetic.write_found_db_v1(workdir / 'found-v1.db', record_count, item_count)
+        migrated_path = workdir / 'found-migrated.db'
+        results[f'found/migrate_v1/{record_count}'] = harness.measure(
+            lambda: founddb.migrate_v1(str(migrated_path), item_count),
+            max(1, runs // 5),
+            setup=lambda: shutil.copyfile(v1_path, migrated_path),
+        )
+    return results
+
+
+def mark_benchmarks(workdir: Path, repeat: int) -> dict:
+    results = {}
+    for policy in (founddb.FSYNC_NEVER, founddb.FSYNC_INTERVAL, founddb.FSYNC_ALWAYS):
+        db_path = workdir / f'mark-{policy}.db'
+        founddb.create(str(db_path), MARKED_ITEMS)
+        progress = items.Progress(str(db_path), fsync_policy=policy)
+
+        def mark():
+            for item_id in range(MARKED_ITEMS):
+                progress.mark_found(item_id)
+            for item_id in range(MARKED_ITEMS):
+                progress.mark_missing(item_id)
+            progress.flush()
+
+        results[f'found/mark/{policy}'] = harness.throughput(2 * MARKED_ITEMS, mark)
+        progress.close()
+    return results
+
+
+def run(workdir: Path, item_counts: list[int], repeat: int) -> dict:
+    return {
+        **search_benchmarks(workdir, item_counts, repeat),
+        **found_benchmarks(workdir, max(item_counts), repeat),
+        **mark_benchmarks(workdir, repeat),
+    }
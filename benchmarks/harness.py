@@ -0,0 +1,104 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+RESULTS_PATH = Path(__file__).parent / 'results'
+
+
+def measure(fn, repeat: int = 20, setup=None) -> dict:
+    # wall time of fn() in ms, setup() runs before every call and isn't timed
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return summary(timings)
+
+
+def summary(timings_ms: list[float]) -> dict:
+    timings_ms = sorted(timings_ms)
+    return {
+        'median_ms': statistics.median(timings_ms),
+        'p99_ms': timings_ms[min(len(timings_ms) - 1, int(len(timings_ms) * 0.99))],
+        'min_ms': timings_ms[0],
+        'runs': len(timings_ms),
+    }
+
+
+def throughput(operations: int, fn) -> dict:
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    return {
+        'median_ms': seconds * 1000,
+        'ops_per_s': operations / seconds if seconds else float('inf'),
+        'runs': 1,
+    }
+
+
+def commit() -> str:
+    try:
+        sha = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{sha}-dirty' if dirty else sha
+
+
+def save(results: dict, path: Path | None = None) -> Path:
+    # one file per commit so runs on two commits can be compared
+    sha = commit()
+    if path is None:
+        path = RESULTS_PATH / f'{sha}.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps(
+            {
+                'commit': sha,
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            },
+            indent=2,
+            sort_keys=True,
+        )
+    )
+    return path
+
+
+def load(name: str) -> dict:
+    # name is a results file or a commit with results in RESULTS_PATH
+    path = Path(name)
+    if not path.is_file():
+        path = RESULTS_PATH / f'{name}.json'
+    return json.loads(path.read_text())['results']
+
+
+def compare(baseline: dict, results: dict, threshold: float = 1.1) -> list[str]:
+    # median of every benchmark in both, slower than threshold is a regression
+    lines = []
+    for name in sorted(results.keys() & baseline.keys()):
+        old = baseline[name]['median_ms']
+        new = results[name]['median_ms']
+        ratio = new / old if old else float('inf')
+        flag = '  REGRESSION' if ratio > threshold else ''
+        lines.append(f'{name:<64}{old:>10.3f}{new:>10.3f} ms {ratio:>6.2f}x{flag}')
+    return lines
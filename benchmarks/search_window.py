@@ -0,0 +1,101 @@
+# keystroke to paint latency of the search window
+#
+#   python benchmarks/search_window.py [--query 'tal rasha'] [--repeat 5]
+#
+# types the query one character at a time (and deletes it again) into a
+# SearchWindow on the offscreen Qt platform. every keystroke is timed from
+# the text change until the results of that keystroke are painted.
+# run it on two commits to compare them, it is also part of python -m benchmarks
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PySide6.QtGui import QFontDatabase
+from PySide6.QtWidgets import QApplication
+
+import items
+import main
+from benchmarks import harness
+
+
+def keystrokes(query):
+    # typing then backspacing, like someone correcting a search
+    texts = [query[:i] for i in range(1, len(query) + 1)]
+    return texts + texts[-2::-1]
+
+
+def application():
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv[:1])
+        QFontDatabase.addApplicationFont(
+            str(Path(main.__file__).parent / 'assets' / 'exocetblizzardot-medium.otf')
+        )
+    return app
+
+
+def measure(window, app, text):
+    painted = []
+
+    def paint(generation, _):
+        if generation == window._search_generation:
+            window.repaint()
+            painted.append(time.perf_counter())
+
+    window._search_signals.finished.connect(paint)
+    start = time.perf_counter()
+    window.search_bar.setText(text)
+    while not painted:
+        app.processEvents()
+    window._search_signals.finished.disconnect(paint)
+    return painted[0] - start
+
+
+def run(query, repeat, debounce=0):
+    # expects items.tracker() to be set up, returns seconds per keystroke
+    app = application()
+    items.tracker().catalog.build_fuzzy_index()
+    window = main.SearchWindow()
+    window._debounce_timer.setInterval(debounce)
+    window.show()
+    timings = []
+    for _ in range(repeat):
+        for text in keystrokes(query):
+            timings.append(measure(window, app, text))
+        window.search_bar.clear()
+        app.processEvents()
+    window.hide()
+    window.deleteLater()
+    return timings
+
+
+def cli():
+    parser = argparse.ArgumentParser(description='search window keystroke to paint latency')
+    parser.add_argument('--query', default='tal rasha')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--debounce',
+        type=int,
+        default=0,
+        help='debounce in ms, 0 measures search and paint only',
+    )
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        items.set_tracker(items.GrailTracker(os.path.join(tmp, 'found.db')))
+        timings = run(args.query, args.repeat, args.debounce)
+        items.close_found()
+    stats = harness.summary([t * 1000 for t in timings])
+    print(f'keystrokes: {stats["runs"]}')
+    print(f'median:     {stats["median_ms"]:.2f} ms')
+    print(f'p99:        {stats["p99_ms"]:.2f} ms')
+    print(f'min:        {stats["min_ms"]:.2f} ms')
+
+
+if __name__ == '__main__':
+    cli()
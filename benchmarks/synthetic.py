@@ -0,0 +1,78 @@
+import csv
+import datetime
+import random
+import uuid
+from pathlib import Path
+
+import founddb
+import items
+
+SEED = 2024
+
+
+def write_catalog(path: Path, item_count: int, seed: int = SEED) -> Path:
+    # items.csv with item_count items. names are new combinations of words of
+    # the real catalog, slot/rarity/category follow the real distribution
+    rng = random.Random(seed)
+    with open(items.CATALOG_PATH) as items_file:
+        real = list(csv.DictReader(items_file))
+    words = sorted({word for row in real for word in row['name'].split()})
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'name', 'base', 'slot', 'rarity', 'category'])
+        for i in range(item_count):
+            row = real[i] if i < len(real) else rng.choice(real)
+            name = row['name']
+            if i >= len(real):
+                name = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+            writer.writerow([i, name, row['base'], row['slot'], row['rarity'], row['category']])
+    return path
+
+
+def catalog(directory: Path, item_count: int) -> items.Catalog:
+    csv_path = write_catalog(directory / f'items-{item_count}.csv', item_count)
+    return items.Catalog(csv_path, directory / f'items-{item_count}.cache')
+
+
+def records(count: int, item_count: int, seed: int = SEED):
+    # a plausible history: mostly finds, every tenth record undoes an earlier one
+    rng = random.Random(seed)
+    found = []
+    timestamp = 1_700_000_000.0
+    for _ in range(count):
+        timestamp += rng.uniform(1, 600)
+        if found and rng.random() < 0.1:
+            yield founddb.REMOVE, found.pop(rng.randrange(len(found))), timestamp
+        else:
+            item_id = rng.randrange(item_count)
+            found.append(item_id)
+            yield founddb.ADD, item_id, timestamp
+
+
+def write_found_db(path: Path, record_count: int, item_count: int) -> Path:
+    # found.db version 2 with record_count log records, as if never compacted
+    log = list(records(record_count, item_count))
+    found = 0
+    for action, item_id, _ in log:
+        if action == founddb.ADD:
+            found |= 1 << item_id
+        else:
+            found &= ~(1 << item_id)
+    founddb._write_atomic(
+        str(path), uuid.UUID(int=SEED), founddb.bitset_size_for(item_count), found, log
+    )
+    return path
+
+
+def write_found_db_v1(path: Path, record_count: int, item_count: int) -> Path:
+    # the same history in the version 1 text format
+    with open(path, 'w') as f:
+        f.write(f'H,1,{uuid.UUID(int=SEED)}\n')
+        for action, item_id, timestamp in records(record_count, item_count):
+            if action == founddb.ADD:
+                found_at = datetime.datetime.fromtimestamp(timestamp).isoformat()
+                f.write(f'A,{item_id},{found_at}\n')
+            else:
+                f.write(f'R,{item_id}\n')
+    return path
+
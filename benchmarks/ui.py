@@ -0,0 +1,46 @@
+# Qt benchmarks, on the offscreen platform so they run headless
+import os
+from pathlib import Path
+
+import items
+from benchmarks import harness, synthetic
+
+QUERIES = ['tal rasha', 'harlequin crest', 'rarity:set slot:ring']
+
+
+def run(workdir: Path, item_counts: list[int], repeat: int) -> dict:
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import main
+    from benchmarks import search_window
+
+    app = search_window.application()
+    results = {}
+    previous_tracker = items.tracker()
+    for item_count in item_counts:
+        found_path = synthetic.write_found_db(
+            workdir / f'ui-found-{item_count}.db', item_count // 2, item_count
+        )
+        items.set_tracker(
+            items.GrailTracker(str(found_path), synthetic.catalog(workdir, item_count))
+        )
+        try:
+            list_window = main.ListOverlayWindow()
+            list_window.show()
+            app.processEvents()
+
+            def set_stats():
+                list_window.set_stats()
+                list_window.repaint()
+
+            results[f'overlay/set_stats/{item_count}'] = harness.measure(set_stats, repeat)
+            list_window.hide()
+
+            for query in QUERIES:
+                timings = search_window.run(query, max(1, repeat // 5))
+                results[f'search_window/keystroke/{item_count}/{query}'] = harness.summary(
+                    [t * 1000 for t in timings]
+                )
+        finally:
+            items.close_found()
+            items.set_tracker(previous_tracker)
+    return results
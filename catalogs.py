@@ -0,0 +1,103 @@
+import csv
+from pathlib import Path
+
+import instrument
+import items
+import pollwatch
+
+# extra catalogs layered over items.csv, e.g. for mods or new ladder items.
+# every .csv in CATALOGS_DIR is a layer named after the file, with columns
+#   name, base, rarity, slot, category
+# rarity and slot by name (unique, ring), category by name too, the layer name
+# if empty. layers are reread when they change and applied with Catalog.update_layer
+CATALOGS_DIR = Path('catalogs')
+CATALOG_SUFFIX = '.csv'
+POLL_INTERVAL = 2.0  # seconds between scans of CATALOGS_DIR
+COLUMNS = ('name', 'base', 'rarity', 'slot', 'category')
+
+
+class LayerFormatError(Exception):
+    pass
+
+
+def _enum_member(enum_type, value: str, path: str, line: int):
+    value = value.strip()
+    try:
+        if value.isdigit():
+            return enum_type(int(value))
+        return enum_type[value.upper()]
+    except (KeyError, ValueError):
+        raise LayerFormatError(f'{path}:{line}: unknown {enum_type.__name__.lower()} {value!r}')
+
+
+def read_layer(path) -> list[items.LayerItem]:
+    layer = Path(path).stem
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        missing = set(COLUMNS) - set(reader.fieldnames or ())
+        if missing:
+            raise LayerFormatError(f'{path}: missing columns {", ".join(sorted(missing))}')
+        layer_items = []
+        for row in reader:
+            name = row['name'].strip()
+            if not name:
+                continue
+            layer_items.append(
+                items.LayerItem(
+                    name,
+                    row['base'].strip(),
+                    _enum_member(items.Slot, row['slot'], path, reader.line_num),
+                    _enum_member(items.Rarity, row['rarity'], path, reader.line_num),
+                    row['category'].strip() or layer,
+                )
+            )
+    return layer_items
+
+
+# reports layers that changed since the last scan, files are only read again
+# when their mtime or size changed
+class LayerScanner:
+    def __init__(self):
+        self.files = pollwatch.FileTracker((CATALOG_SUFFIX,))
+
+    def scan(self, directory) -> list[tuple[str, list[items.LayerItem] | None]]:
+        # (layer, its items) of changed layers, None for deleted ones
+        changes = []
+        with instrument.timer('catalogs.scan'):
+            scanned = self.files.scan(directory)
+            # the layers of a directory that is gone are too
+            changed, deleted = scanned if scanned is not None else ([], self.files.clear())
+            for path in changed:
+                try:
+                    layer_items = read_layer(path)
+                except OSError:
+                    # being written, try again next scan
+                    self.files.retry(path)
+                    continue
+                except (LayerFormatError, UnicodeDecodeError) as e:
+                    # keeps the layer as it was until the file is fixed
+                    print(f'ERROR: Failed to read {path}: {e}')
+                    continue
+                changes.append((Path(path).stem, layer_items))
+            changes += [(Path(path).stem, None) for path in deleted]
+        return changes
+
+
+def apply(catalog: items.Catalog, changes) -> list[int]:
+    # ids of the items changed
+    changed = []
+    for layer, layer_items in changes:
+        changed += catalog.update_layer(layer, layer_items)
+    return changed
+
+
+def load_layers(catalog: items.Catalog, directory=CATALOGS_DIR) -> list[int]:
+    return apply(catalog, LayerScanner().scan(directory))
+
+
+# scans directory every interval seconds and calls on_change(changes) with what
+# LayerScanner.scan returns, see pollwatch.PollingWatcher. the layers are read
+# on the watcher thread, only the update is left to the Qt thread
+class LayerWatcher(pollwatch.PollingWatcher):
+    def __init__(self, on_change, directory=CATALOGS_DIR, interval=POLL_INTERVAL):
+        super().__init__('catalog-watcher', LayerScanner(), on_change, directory, interval)
@@ -0,0 +1,347 @@
+# command line access to the grail without the overlay, e.g.
+#
+#   python cli.py mark --from list.txt     one item name per line, '#' starts a comment
+#   python cli.py mark --missing "Harlequin Crest"
+#   python cli.py query "rarity:set found:no" --limit 20
+#   python cli.py stats
+#   python cli.py export --format csv --output grail.csv
+#   python cli.py sync ~/Dropbox/grail     merge with other machines through a shared folder
+#   python cli.py merge laptop-found.db
+#   python cli.py history --days 14      finds per day and session, sets, projected completion
+#   python cli.py --profile ladder --create stats     other profiles, --create starts a new one
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+
+import catalogs
+import founddb
+import history
+import items
+import sync as replicas
+
+EXIT_UNRESOLVED = 1
+EXIT_UNKNOWN_PROFILE = 2
+
+
+def read_names(lines) -> list[str]:
+    names = []
+    for line in lines:
+        name = line.split('#', 1)[0].strip()
+        if name:
+            names.append(name)
+    return names
+
+
+def resolve(catalog: items.Catalog, name: str) -> list[int]:
+    # ids of the items name can mean, exactly one if it is unambiguous.
+    # an exact item name wins over substring matches, typos are tried last.
+    # "name - base" as shown by the search window is accepted too
+    name, _, base = name.partition(' - ')
+    words = items.prepare_words(name)
+    base_words = items.prepare_words(base)
+    if not words:
+        return []
+    indices = catalog.search_indices(words + base_words)
+    exact = [
+        i
+        for i in indices
+        if catalog.item_field_words[i][0] == words
+        and (not base_words or catalog.item_field_words[i][1] == base_words)
+    ]
+    if exact:
+        return sorted(exact)
+    if not indices:
+        all_words = words + base_words
+        indices = catalog.search_indices(all_words, catalog.fuzzy_words(all_words))
+    return sorted(indices)
+
+
+def describe(item: items.Item) -> str:
+    return f'{item.name} - {item.base}'
+
+
+def mark(tracker: items.GrailTracker, args) -> int:
+    names = list(args.names)
+    if args.from_file == '-':
+        names += read_names(sys.stdin)
+    elif args.from_file:
+        with open(args.from_file, encoding='utf-8') as f:
+            names += read_names(f)
+
+    item_ids = []
+    unresolved = 0
+    for name in names:
+        matches = resolve(tracker.catalog, name)
+        if len(matches) == 1:
+            item_ids.append(matches[0])
+        elif not matches:
+            unresolved += 1
+            print(f'not found: {name}', file=sys.stderr)
+        else:
+            unresolved += 1
+            print(f'ambiguous: {name}, matches {len(matches)} items:', file=sys.stderr)
+            for item_id in matches[: args.candidates]:
+                print(f'    {describe(tracker.catalog.item(item_id))}', file=sys.stderr)
+            if len(matches) > args.candidates:
+                print(f'    ... and {len(matches) - args.candidates} more', file=sys.stderr)
+
+    found = not args.missing
+    if args.dry_run:
+        changed = [i for i in dict.fromkeys(item_ids) if (i in tracker.found_ids) != found]
+    else:
+        changed = tracker.mark_many(item_ids, found)
+    for item_id in changed:
+        print(f'{"found" if found else "missing"}: {describe(tracker.catalog.item(item_id))}')
+    print(
+        f'{len(changed)} marked {"found" if found else "missing"}, '
+        f'{len(set(item_ids)) - len(changed)} unchanged, {unresolved} unresolved'
+        f'{" (dry run)" if args.dry_run else ""}'
+    )
+    return EXIT_UNRESOLVED if unresolved else 0
+
+
+def query(tracker: items.GrailTracker, args) -> int:
+    results = tracker.search(args.query, limit=args.limit, fuzzy=args.fuzzy)
+    found_ids = tracker.found_ids
+    for item in results:
+        print(f'[{"x" if item.id in found_ids else " "}] {describe(item)}')
+    if results.total is not None and results.total > len(results):
+        print(f'... {results.total - len(results)} more')
+    return 0
+
+
+def stats(tracker: items.GrailTracker, args) -> int:
+    rows = [
+        ('Uniques', items.Rarity.UNIQUE),
+        ('Sets', items.Rarity.SET),
+        ('Runes', items.Slot.RUNE),
+    ]
+    if args.sets:
+        set_mask = tracker.catalog.mask(items.Rarity.SET)
+        rows += [
+            (category, i)
+            for i, category in enumerate(tracker.catalog.category_names)
+            if tracker.catalog.mask(i) & set_mask
+        ]
+    tracker_stats = tracker.stats
+    for name, key in rows:
+        found = tracker_stats.found[key]
+        total = tracker_stats.totals[key]
+        print(f'{name:<28}{found:>4}/{total:<4}{int(found / total * 100):>4}%')
+    return 0
+
+
+def found_at(db_path: str) -> dict[int, float]:
+    # {item id: when it was last found}
+    timestamps = {}
+    for action, item_id, timestamp in founddb.read_records(db_path):
+        if action == founddb.ADD:
+            timestamps[item_id] = timestamp
+    return timestamps
+
+
+def export(tracker: items.GrailTracker, args) -> int:
+    found_ids = tracker.found_ids
+    timestamps = found_at(tracker.progress.db_path)
+    rows = []
+    for item in tracker.items:
+        if args.found_only and item.id not in found_ids:
+            continue
+        timestamp = timestamps.get(item.id) if item.id in found_ids else None
+        rows.append(
+            {
+                'id': item.id,
+                'name': item.name,
+                'base': item.base,
+                'rarity': item.rarity.name.lower(),
+                'slot': item.slot.name.lower(),
+                'category': tracker.catalog.category_names[item.category],
+                'found': item.id in found_ids,
+                'found_at': (
+                    datetime.datetime.fromtimestamp(timestamp).isoformat(timespec='seconds')
+                    if timestamp
+                    else ''
+                ),
+            }
+        )
+    output = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            json.dump(rows, output, indent=2)
+            output.write('\n')
+        else:
+            writer = csv.DictWriter(output, fieldnames=list(rows[0]) if rows else ['id'])
+            writer.writeheader()
+            writer.writerows(rows)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+def format_time(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp).isoformat(' ', 'minutes')
+
+
+def format_date(timestamp: float) -> str:
+    return datetime.date.fromtimestamp(timestamp).isoformat()
+
+
+def format_duration(seconds: float) -> str:
+    days, seconds = divmod(int(seconds), history.DAY)
+    hours, seconds = divmod(seconds, 60 * 60)
+    if days:
+        return f'{days}d {hours}h'
+    return f'{hours}h {seconds // 60}m'
+
+
+def history_report(tracker: items.GrailTracker, args) -> int:
+    grail = history.History(tracker.catalog, tracker.progress)
+    print('Finds per day')
+    for day, count in grail.per_day(args.days):
+        print(f'  {day.isoformat()}{count:>5} {"#" * count}'.rstrip())
+
+    print('Sessions')
+    for session in grail.sessions()[-args.sessions :]:
+        names = ', '.join(tracker.catalog.item(i).name for i in session.item_ids[:3])
+        more = f' and {len(session.item_ids) - 3} more' if len(session.item_ids) > 3 else ''
+        print(
+            f'  {format_time(session.start)} ({format_duration(session.end - session.start)})'
+            f'{len(session.item_ids):>5} found: {names}{more}'
+        )
+
+    print('Sets')
+    for set_progress in grail.sets():
+        if set_progress.complete and set_progress.duration is not None:
+            state = f'completed in {format_duration(set_progress.duration)}'
+        elif set_progress.first_found is not None:
+            state = f'started {format_date(set_progress.first_found)}'
+        else:
+            state = ''
+        print(
+            f'  {tracker.catalog.category_names[set_progress.category]:<28}'
+            f'{set_progress.found:>2}/{set_progress.total:<4}{state}'.rstrip()
+        )
+
+    projected = grail.projected_completion()
+    rate = grail.find_rate()
+    if projected is None:
+        print(f'Projected completion: nothing found in the last {history.PROJECTION_DAYS} days')
+    else:
+        print(
+            f'Projected completion: {format_date(projected)} '
+            f'({rate:.1f} finds per day over the last {history.PROJECTION_DAYS} days)'
+        )
+    return 0
+
+
+def print_merged(tracker: items.GrailTracker, changed: list[int]) -> int:
+    found_ids = tracker.found_ids
+    for item_id in changed:
+        state = 'found' if item_id in found_ids else 'missing'
+        try:
+            print(f'{state}: {describe(tracker.catalog.item(item_id))}')
+        except IndexError:
+            # of a layer this machine doesn't have
+            print(f'{state}: item {item_id}')
+    print(f'{len(changed)} changed')
+    return 0
+
+
+def sync(tracker: items.GrailTracker, args) -> int:
+    # every profile has its own replicas in a subfolder
+    folder = os.path.join(args.folder, tracker.profile)
+    return print_merged(tracker, replicas.sync(tracker.progress, folder, tracker.catalog))
+
+
+def merge(tracker: items.GrailTracker, args) -> int:
+    return print_merged(
+        tracker, replicas.merge(tracker.progress, args.replicas, tracker.catalog)
+    )
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='cli.py', description='Diablo 2 grail tracker')
+    parser.add_argument('--db', default=items.FOUND_DB_PATH, help='found.db to use')
+    parser.add_argument('--profile', default=items.DEFAULT_PROFILE, help='progress profile')
+    parser.add_argument(
+        '--create', action='store_true', help="create the profile if it doesn't exist"
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    mark_parser = commands.add_parser('mark', help='mark items found (or missing) by name')
+    mark_parser.add_argument('names', nargs='*', help='item names')
+    mark_parser.add_argument(
+        '--from', dest='from_file', help='file with one item name per line, - for stdin'
+    )
+    mark_parser.add_argument('--missing', action='store_true', help='mark missing instead')
+    mark_parser.add_argument('--dry-run', action='store_true', help="don't write found.db")
+    mark_parser.add_argument(
+        '--candidates', type=int, default=5, help='matches listed for ambiguous names'
+    )
+    mark_parser.set_defaults(run=mark)
+
+    query_parser = commands.add_parser('query', help='search items, same syntax as the overlay')
+    query_parser.add_argument('query')
+    query_parser.add_argument('--limit', type=int, default=None)
+    query_parser.add_argument('--fuzzy', action='store_true', help='also match typos')
+    query_parser.set_defaults(run=query)
+
+    stats_parser = commands.add_parser('stats', help='found/total counts')
+    stats_parser.add_argument('--sets', action='store_true', help='also every set')
+    stats_parser.set_defaults(run=stats)
+
+    export_parser = commands.add_parser('export', help='every item and whether it is found')
+    export_parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    export_parser.add_argument('--output', help='file to write, default stdout')
+    export_parser.add_argument('--found-only', action='store_true')
+    export_parser.set_defaults(run=export)
+
+    sync_parser = commands.add_parser(
+        'sync', help='merge with the found.db of other machines in a shared folder'
+    )
+    sync_parser.add_argument('folder')
+    sync_parser.set_defaults(run=sync)
+
+    merge_parser = commands.add_parser('merge', help='merge other found.db files into this one')
+    merge_parser.add_argument('replicas', nargs='+', metavar='found.db')
+    merge_parser.set_defaults(run=merge)
+
+    history_parser = commands.add_parser('history', help='when items were found')
+    history_parser.add_argument('--days', type=int, default=14, help='days of finds per day')
+    history_parser.add_argument('--sessions', type=int, default=5, help='last sessions listed')
+    history_parser.set_defaults(run=history_report)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = parser().parse_args(argv)
+    tracker = items.GrailTracker(args.db)
+    catalogs.load_layers(tracker.catalog)
+    try:
+        # a mistyped profile would silently start an empty one
+        if not args.create and args.profile not in tracker.profile_names():
+            print(
+                f'unknown profile: {args.profile}, one of {", ".join(tracker.profile_names())}'
+                ' or --create',
+                file=sys.stderr,
+            )
+            return EXIT_UNKNOWN_PROFILE
+        try:
+            tracker.profile_path(args.profile)
+        except ValueError as e:
+            # not a valid profile name
+            print(e, file=sys.stderr)
+            return EXIT_UNKNOWN_PROFILE
+        tracker.switch_profile(args.profile)
+        return args.run(tracker, args)
+    finally:
+        # every change of the run is written in one go before exiting
+        tracker.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,448 @@
+import contextlib
+import datetime
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+import instrument
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# found.db version 2 layout, all little endian:
+#   header  HEADER_SIZE bytes, see HEADER
+#   bitset  bitset_size bytes, bit i (byte i // 8, bit i % 8) is set if item i is found
+#   log     RECORD_SIZE byte records, appended on every change
+# a change is appended to the log before the bitset is patched, the log can be
+# ahead of the bitset after a crash in between. APPLIED counts the records the
+# bitset includes, read_repaired applies the ones after them.
+# several processes may write the same file (the overlay and cli.py), every
+# change of the file is made holding the lock on path + LOCK_SUFFIX, see locked
+MAGIC = b'YAD2GTDB'
+VERSION = 2
+# magic, version, bitset size, UUID, rest of HEADER_SIZE is reserved
+HEADER = struct.Struct('<8sHxxI16s')
+HEADER_SIZE = 64
+# records at the start of the log the bitset includes, right after HEADER
+APPLIED = struct.Struct('<Q')
+APPLIED_OFFSET = HEADER.size
+# action (ADD/REMOVE), item id, epoch timestamp
+RECORD = struct.Struct('<cId')
+RECORD_SIZE = RECORD.size
+ADD = b'A'
+REMOVE = b'R'
+# bitset grows in these steps so new items rarely need a rewrite
+BITSET_ALIGNMENT = 64
+V1_PREFIX = b'H,1,'
+LOCK_SUFFIX = '.lock'
+
+
+@dataclass
+class FoundDb:
+    uuid: uuid.UUID
+    bitset_size: int
+    # bit i is set if item i is found
+    found: int
+    records: int
+    # records the bitset includes, fewer than records after a crash
+    applied: int
+
+    @property
+    def capacity(self) -> int:
+        return self.bitset_size * 8
+
+
+def bitset_size_for(item_count: int) -> int:
+    size = (item_count + 7) // 8
+    return max(BITSET_ALIGNMENT, -(-size // BITSET_ALIGNMENT) * BITSET_ALIGNMENT)
+
+
+def bits(mask: int):
+    # yields indices of set bits, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+@contextlib.contextmanager
+def locked(path: str):
+    # exclusive lock on path across processes, waits until it is free. a file
+    # of its own since compaction replaces path. not reentrant
+    with open(f'{path}{LOCK_SUFFIX}', 'a+b') as f:
+        if os.name == 'nt':
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after 10 seconds
+                    continue
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _pack_header(db_uuid: uuid.UUID, bitset_size: int, applied: int) -> bytes:
+    header = HEADER.pack(MAGIC, VERSION, bitset_size, db_uuid.bytes) + APPLIED.pack(applied)
+    return header.ljust(HEADER_SIZE, b'\0')
+
+
+def _write_atomic(path: str, db_uuid: uuid.UUID, bitset_size: int, found: int, records):
+    temp_file = f'{path}.tmp'
+    log = b''.join(RECORD.pack(*record) for record in records)
+    with open(temp_file, 'wb') as temp:
+        temp.write(_pack_header(db_uuid, bitset_size, len(log) // RECORD_SIZE))
+        temp.write(found.to_bytes(bitset_size, 'little'))
+        temp.write(log)
+        temp.flush()
+        os.fsync(temp.fileno())
+    # atomic, path is either the old file or the complete new one
+    os.replace(temp_file, path)
+
+
+def create(path: str, item_count: int = 0):
+    _write_atomic(path, uuid.uuid4(), bitset_size_for(item_count), 0, [])
+
+
+def is_v1(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(V1_PREFIX)) == V1_PREFIX
+
+
+def read(path: str) -> FoundDb:
+    # a single mapping of the file, the bitset is the whole state
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        if len(m) < HEADER_SIZE:
+            raise AssertionError(f'{path} file corrupted')
+        magic, version, bitset_size, uuid_bytes = HEADER.unpack_from(m)
+        (applied,) = APPLIED.unpack_from(m, APPLIED_OFFSET)
+        log_offset = HEADER_SIZE + bitset_size
+        if magic != MAGIC or version != VERSION or len(m) < log_offset:
+            raise AssertionError(f'{path} file corrupted')
+        records = (len(m) - log_offset) // RECORD_SIZE
+        return FoundDb(
+            uuid=uuid.UUID(bytes=uuid_bytes),
+            bitset_size=bitset_size,
+            found=int.from_bytes(m[HEADER_SIZE:log_offset], 'little'),
+            records=records,
+            applied=min(applied, records),
+        )
+
+
+def _current_bitset(f, path: str) -> tuple[bytearray, int, int]:
+    # (bitset, records, applied) of the open file as it is now, the records
+    # after applied (a crash, see APPLIED) are applied to the bitset.
+    # the caller holds the lock
+    f.seek(0)
+    header = f.read(HEADER_SIZE)
+    _, _, bitset_size, _ = HEADER.unpack_from(header)
+    (applied,) = APPLIED.unpack_from(header, APPLIED_OFFSET)
+    bitset = bytearray(f.read(bitset_size))
+    log_offset = HEADER_SIZE + bitset_size
+    records = (f.seek(0, os.SEEK_END) - log_offset) // RECORD_SIZE
+    applied = min(applied, records)
+    if applied < records:
+        f.seek(log_offset + applied * RECORD_SIZE)
+        for action, item_id, _ in RECORD.iter_unpack(f.read((records - applied) * RECORD_SIZE)):
+            if item_id >= bitset_size * 8:
+                # never in the log without a bitset for it, see Writer.compact
+                raise AssertionError(f'{path} file corrupted')
+            _apply(bitset, action, item_id)
+    return bitset, records, applied
+
+
+def _apply(bitset: bytearray, action: bytes, item_id: int):
+    byte, bit = divmod(item_id, 8)
+    if action == ADD:
+        bitset[byte] |= 1 << bit
+    else:
+        bitset[byte] &= ~(1 << bit)
+
+
+def _write_bitset(f, bitset: bytearray, records: int):
+    # the bitset first, APPLIED last: a crash in between applies the log again
+    f.seek(HEADER_SIZE)
+    f.write(bitset)
+    f.seek(APPLIED_OFFSET)
+    f.write(APPLIED.pack(records))
+    f.flush()
+
+
+def read_repaired(path: str) -> FoundDb:
+    # read, with the records the bitset misses applied to it and written back.
+    # only the records after APPLIED are read, none unless a write crashed
+    db = read(path)
+    if db.applied == db.records:
+        return db
+    with locked(path), open(path, 'r+b') as f:
+        bitset, records, applied = _current_bitset(f, path)
+        if applied < records:
+            _write_bitset(f, bitset, records)
+            os.fsync(f.fileno())
+    return read(path)
+
+
+def read_records(path: str, start: int = 0):
+    # yields (action, item_id, timestamp) of the change log, from record start on
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        _, _, bitset_size, _ = HEADER.unpack_from(m)
+        log_offset = HEADER_SIZE + bitset_size
+        end = log_offset + (len(m) - log_offset) // RECORD_SIZE * RECORD_SIZE
+        yield from RECORD.iter_unpack(m[log_offset + start * RECORD_SIZE : end])
+
+
+def compact(path: str, bitset_size: int = 0):
+    # keeps UUID, one ADD record per found item with the timestamp it was found at
+    # and one REMOVE record per removed item, merging replicas needs both.
+    # the bitset grows to bitset_size, it never shrinks
+    with locked(path):
+        with open(path, 'rb') as f:
+            bitset, _, _ = _current_bitset(f, path)
+        _compact(path, max(bitset_size, len(bitset)), int.from_bytes(bitset, 'little'))
+
+
+def _compact(path: str, bitset_size: int, found: int):
+    db = read(path)
+    found_at = {}
+    removed_at = {}
+    for action, item_id, timestamp in read_records(path):
+        if action == ADD:
+            found_at[item_id] = timestamp
+            removed_at.pop(item_id, None)
+        else:
+            removed_at[item_id] = timestamp
+    records = [(ADD, i, found_at.get(i, 0.0)) for i in bits(found)]
+    records += [(REMOVE, i, t) for i, t in removed_at.items() if not found >> i & 1]
+    records.sort(key=lambda record: record[1])
+    _write_atomic(path, db.uuid, bitset_size, found, records)
+
+
+def _read_v1(path: str):
+    # returns (UUID, [(action, item_id, timestamp)]) of a version 1 text log
+    records = []
+    last_timestamp = 0.0
+    with open(path) as f:
+        header_line = f.readline().rstrip('\n')
+        _, _, uuid_str = header_line.split(',', 2)
+        lines = f.readlines()
+        # early version 1 files have no newline after the header
+        if uuid_str[36:]:
+            lines.insert(0, uuid_str[36:])
+    for line in lines:
+        if not line.strip():
+            continue
+        action, item_id_str, *rest = line.strip().split(',')
+        # 'R' records have no timestamp in version 1, they happened after the previous record
+        if action == 'A' and rest and rest[0]:
+            last_timestamp = datetime.datetime.fromisoformat(rest[0]).timestamp()
+        records.append((action.encode(), int(item_id_str), last_timestamp))
+    return uuid.UUID(uuid_str[:36]), records
+
+
+def migrate_v1(path: str, item_count: int = 0):
+    # converts a version 1 text log to version 2 in place, history included
+    db_uuid, records = _read_v1(path)
+    found = 0
+    max_id = item_count - 1
+    for action, item_id, _ in records:
+        if action == ADD:
+            found |= 1 << item_id
+        else:
+            found &= ~(1 << item_id)
+        max_id = max(max_id, item_id)
+    _write_atomic(path, db_uuid, bitset_size_for(max_id + 1), found, records)
+
+
+FSYNC_ALWAYS = 'always'  # after every group commit
+FSYNC_INTERVAL = 'interval'  # at most once per fsync_interval seconds
+FSYNC_NEVER = 'never'  # leave it to the OS
+
+
+@dataclass
+class _Compaction:
+    bitset_size: int
+
+
+class WriterError(Exception):
+    pass
+
+
+# applies changes to a version 2 file on a background thread so a slow disk
+# never blocks the GUI. keeps the file open and writes everything queued in
+# one go: records are appended and the bitset patched. the bitset and the log
+# are read again for every write, another process may have written since
+# queue entries are (action, item_id, timestamp) records, lists of them, compactions,
+# flush requests (threading.Event) and None to stop.
+# if writing fails the thread stops, flush, stop and every later append raise WriterError
+class Writer(threading.Thread):
+    def __init__(self, path: str, fsync_policy: str, fsync_interval: float):
+        super().__init__(name='found-db-writer', daemon=True)
+        self.path = path
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self._queue = queue.Queue()
+        self._last_fsync = time.monotonic()
+        # records were written since the last fsync
+        self._unsynced = False
+        # why the thread stopped early, set together with emptying the queue
+        self.error: Exception | None = None
+        self._error_lock = threading.Lock()
+        # entries taken from the queue and not handled yet
+        self._batch = []
+        self._file = None
+
+    def _put(self, entry):
+        with self._error_lock:
+            self._raise_error()
+            self._queue.put(entry)
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise WriterError(f'Failed to write {self.path}: {self.error}') from self.error
+
+    def append(self, action: bytes, item_id: int, timestamp: float):
+        self._put((action, item_id, timestamp))
+
+    def append_many(self, records: list):
+        # written together, in the same group commit
+        self._put(records)
+
+    def compact(self, bitset_size: int):
+        self._put(_Compaction(bitset_size))
+
+    def flush(self):
+        done = threading.Event()
+        self._put(done)
+        done.wait()
+        self._raise_error()
+
+    def stop(self):
+        with self._error_lock:
+            if self.error is None:
+                self._queue.put(None)
+        self.join()
+        self._raise_error()
+
+    def _reopen_if_replaced(self):
+        # another process compacted the file since it was opened
+        if self._file is not None:
+            if os.stat(self.path).st_ino == os.fstat(self._file.fileno()).st_ino:
+                return
+            self._file.close()
+        self._file = open(self.path, 'r+b')
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            print(f'ERROR: Failed to write {self.path}: {e}')
+            with self._error_lock:
+                self.error = e
+                # nothing queued gets written, nobody may wait for it
+                while True:
+                    try:
+                        self._batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                for entry in self._batch:
+                    if isinstance(entry, threading.Event):
+                        entry.set()
+
+    def _fsync_timeout(self) -> float | None:
+        # how long records written since the last fsync may wait for the next one
+        if not self._unsynced or self.fsync_policy != FSYNC_INTERVAL:
+            return None
+        return max(0.0, self._last_fsync + self.fsync_interval - time.monotonic())
+
+    def _run(self):
+        self._file = open(self.path, 'r+b')
+        try:
+            while True:
+                try:
+                    self._batch = [self._queue.get(timeout=self._fsync_timeout())]
+                except queue.Empty:
+                    # nothing else was written within the interval
+                    self._fsync()
+                    continue
+                while True:
+                    try:
+                        self._batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                records = []
+                for entry in self._batch:
+                    if isinstance(entry, tuple):
+                        records.append(entry)
+                        continue
+                    if isinstance(entry, list):
+                        records.extend(entry)
+                        continue
+                    # commands must see every record queued before them
+                    self._write(records, sync=entry is None)
+                    records = []
+                    if entry is None:
+                        return
+                    elif isinstance(entry, threading.Event):
+                        entry.set()
+                    else:
+                        self._file.close()
+                        self._file = None
+                        try:
+                            compact(self.path, entry.bitset_size)
+                        except OSError as e:
+                            # the file is left as it was
+                            print(f'ERROR: Failed to compact {self.path}: {e}')
+                        self._reopen_if_replaced()
+                self._write(records)
+        finally:
+            if self._file is not None:
+                self._file.close()
+
+    def _write(self, records: list, sync: bool = False):
+        if records:
+            with instrument.timer('found_db.append'):
+                self._append(records)
+            instrument.count('found_db.records', len(records))
+            self._unsynced = self.fsync_policy != FSYNC_NEVER
+        if self._unsynced and (
+            sync
+            or self.fsync_policy == FSYNC_ALWAYS
+            or time.monotonic() - self._last_fsync >= self.fsync_interval
+        ):
+            self._fsync()
+
+    def _fsync(self):
+        with instrument.timer('found_db.fsync'):
+            os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+
+    def _append(self, records: list):
+        with locked(self.path):
+            self._reopen_if_replaced()
+            f = self._file
+            bitset, count, _ = _current_bitset(f, self.path)
+            for action, item_id, _ in records:
+                _apply(bitset, action, item_id)
+            # log first, the bitset is only patched for changes that are in the log.
+            # a record cut off by a crash is overwritten, it would misalign the ones after it
+            f.seek(HEADER_SIZE + len(bitset) + count * RECORD_SIZE)
+            f.write(b''.join(RECORD.pack(*record) for record in records))
+            f.truncate()
+            _write_bitset(f, bitset, count + len(records))
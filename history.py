@@ -0,0 +1,157 @@
+import bisect
+import datetime
+import time
+from dataclasses import dataclass
+
+import founddb
+import items
+
+# finds further apart than this are in separate play sessions
+SESSION_GAP = 2 * 60 * 60
+# completion is projected from the find rate of this many last days
+PROJECTION_DAYS = 30
+DAY = 24 * 60 * 60
+
+
+@dataclass
+class Session:
+    start: float
+    end: float
+    item_ids: list[int]
+
+
+@dataclass
+class SetProgress:
+    category: int  # index into catalog.category_names
+    found: int
+    total: int
+    # when the first and the last found piece was found, None if none is
+    first_found: float | None
+    last_found: float | None
+
+    @property
+    def complete(self) -> bool:
+        return self.found == self.total
+
+    @property
+    def duration(self) -> float | None:
+        # seconds from the first piece to the last, None until complete
+        if not self.complete or self.first_found is None:
+            return None
+        return self.last_found - self.first_found
+
+
+# when every found item was found, indexed by time. read from the found.db
+# log once, then follows the records progress writes (merged ones keep their
+# own, possibly older, timestamps). items found before found.db kept
+# timestamps aren't in it
+class History:
+    def __init__(self, catalog: items.Catalog, progress: items.Progress):
+        self.catalog = catalog
+        self.progress = progress
+        # {item_id: when it was found}
+        self.found_at: dict[int, float] = {}
+        # (timestamp, item_id) of found_at, oldest first
+        self._finds: list[tuple[float, int]] = []
+        self._load()
+        progress.subscribe_records(self._records_written)
+
+    def _load(self):
+        progress = self.progress
+        found_ids = progress.found_ids
+        progress.flush()
+        latest = {}
+        for action, item_id, timestamp in founddb.read_records(progress.db_path):
+            if action == founddb.ADD:
+                latest[item_id] = timestamp
+        self.found_at = {i: latest[i] for i in found_ids if latest.get(i)}
+        self._finds = sorted((t, i) for i, t in self.found_at.items())
+
+    def reset(self, progress: items.Progress):
+        # follows another progress from now on, e.g. after switching profiles
+        self.progress.unsubscribe_records(self._records_written)
+        self.progress = progress
+        self._load()
+        progress.subscribe_records(self._records_written)
+
+    def _records_written(self, records: list):
+        for action, item_id, timestamp in records:
+            previous = self.found_at.pop(item_id, None)
+            if previous is not None:
+                del self._finds[bisect.bisect_left(self._finds, (previous, item_id))]
+            if action == founddb.ADD and timestamp:
+                self.found_at[item_id] = timestamp
+                bisect.insort(self._finds, (timestamp, item_id))
+
+    def finds(self, start: float | None = None, end: float | None = None) -> list[int]:
+        # ids of the items found in [start, end), oldest first
+        low = 0 if start is None else bisect.bisect_left(self._finds, (start,))
+        high = len(self._finds) if end is None else bisect.bisect_left(self._finds, (end,))
+        return [item_id for _, item_id in self._finds[low:high]]
+
+    def per_day(self, days: int, now: float | None = None) -> list[tuple[datetime.date, int]]:
+        # number of finds on each of the last days (local time), today last
+        today = datetime.date.fromtimestamp(time.time() if now is None else now)
+        counts = []
+        for offset in range(days - 1, -1, -1):
+            day = today - datetime.timedelta(days=offset)
+            start = datetime.datetime.combine(day, datetime.time()).timestamp()
+            end = datetime.datetime.combine(
+                day + datetime.timedelta(days=1), datetime.time()
+            ).timestamp()
+            low = bisect.bisect_left(self._finds, (start,))
+            counts.append((day, bisect.bisect_left(self._finds, (end,), lo=low) - low))
+        return counts
+
+    def sessions(self, gap: float = SESSION_GAP) -> list[Session]:
+        # finds grouped into play sessions, oldest first
+        sessions = []
+        for timestamp, item_id in self._finds:
+            if sessions and timestamp - sessions[-1].end <= gap:
+                sessions[-1].end = timestamp
+                sessions[-1].item_ids.append(item_id)
+            else:
+                sessions.append(Session(timestamp, timestamp, [item_id]))
+        return sessions
+
+    def sets(self) -> list[SetProgress]:
+        # progress of every set in catalog.category_names order
+        catalog = self.catalog
+        found_ids = self.progress.found_ids
+        set_mask = catalog.mask(items.Rarity.SET)
+        sets = []
+        for category, item_ids in enumerate(catalog.category_items):
+            if not catalog.mask(category) & set_mask:
+                continue
+            found = item_ids & found_ids
+            times = [self.found_at[i] for i in found if i in self.found_at]
+            sets.append(
+                SetProgress(
+                    category,
+                    len(found),
+                    len(item_ids),
+                    min(times, default=None),
+                    max(times, default=None),
+                )
+            )
+        return sets
+
+    def find_rate(self, days: int = PROJECTION_DAYS, now: float | None = None) -> float:
+        # finds per day over the last days
+        now = time.time() if now is None else now
+        return len(self.finds(now - days * DAY)) / days
+
+    def projected_completion(
+        self, days: int = PROJECTION_DAYS, now: float | None = None
+    ) -> float | None:
+        # when every catalog item is found at the find rate of the last days,
+        # None if nothing was found in them
+        now = time.time() if now is None else now
+        all_mask = self.catalog.all_mask()
+        remaining = (all_mask & ~self.progress.found_mask).bit_count()
+        if not remaining:
+            return self._finds[-1][0] if self._finds else now
+        rate = self.find_rate(days, now)
+        if not rate:
+            return None
+        return now + remaining / rate * DAY
@@ -0,0 +1,152 @@
+import atexit
+import contextlib
+import functools
+import json
+import threading
+import time
+from collections import deque
+
+# timers and counters of hot paths. disabled they cost one global lookup per
+# call, enable() with --instrument or by showing the debug HUD
+WINDOW = 1000  # percentiles are over the last WINDOW samples of a timer
+DUMP_INTERVAL = 10.0  # seconds between JSON lines written by start_dump
+
+_enabled = False
+_lock = threading.Lock()
+_metrics: dict[str, 'Metric'] = {}
+
+
+class Metric:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.samples: deque[float] = deque(maxlen=WINDOW)
+
+    def record(self, value_ms: float):
+        self.count += 1
+        self.total_ms += value_ms
+        self.samples.append(value_ms)
+
+    def add(self, n: int):
+        # counters have a count but no durations
+        self.count += n
+
+    def snapshot(self) -> dict:
+        snapshot = {'count': self.count}
+        if self.samples:
+            samples = sorted(self.samples)
+            snapshot.update(
+                p50_ms=samples[len(samples) // 2],
+                p99_ms=samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+                last_ms=self.samples[-1],
+                total_ms=self.total_ms,
+            )
+        return snapshot
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
+
+
+def _metric(name: str) -> Metric:
+    metric = _metrics.get(name)
+    if metric is None:
+        with _lock:
+            metric = _metrics.setdefault(name, Metric())
+    return metric
+
+
+def record(name: str, value_ms: float):
+    if _enabled:
+        _metric(name).record(value_ms)
+
+
+def count(name: str, n: int = 1):
+    if _enabled:
+        _metric(name).add(n)
+
+
+@contextlib.contextmanager
+def timer(name: str):
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _metric(name).record((time.perf_counter() - start) * 1000)
+
+
+def timed(name: str):
+    # decorator version of timer
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _metric(name).record((time.perf_counter() - start) * 1000)
+
+        return wrapper
+
+    return decorator
+
+
+def snapshot() -> dict[str, dict]:
+    with _lock:
+        metrics = list(_metrics.items())
+    return {name: metric.snapshot() for name, metric in sorted(metrics)}
+
+
+def dump(path: str):
+    # appends one JSON line with every metric
+    line = json.dumps({'time': time.time(), 'metrics': snapshot()})
+    with open(path, 'a') as f:
+        f.write(line + '\n')
+
+
+def start_dump(path: str, interval: float = DUMP_INTERVAL) -> threading.Thread:
+    # dumps every interval seconds and once more at exit
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                dump(path)
+            except OSError as e:
+                print(f'ERROR: Failed to write {path}: {e}')
+
+    thread = threading.Thread(target=run, name='instrument-dump', daemon=True)
+    thread.start()
+    atexit.register(dump, path)
+    return thread
+
+
+def format_hud() -> str:
+    lines = []
+    for name, metric in snapshot().items():
+        if 'p50_ms' in metric:
+            lines.append(
+                f'{name} p50 {metric["p50_ms"]:.2f} p99 {metric["p99_ms"]:.2f} ms n={metric["count"]}'
+            )
+        else:
+            lines.append(f'{name} n={metric["count"]}')
+    return '\n'.join(lines) or 'no samples yet'
@@ -1,12 +1,25 @@
+import atexit
 import csv
-import datetime
 import enum
+import hashlib
+import heapq
+import json
 import os
 import pathlib
-import uuid
+import pickle
+import re
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
 from dataclasses import dataclass
 from pathlib import Path
 
+import founddb
+import instrument
+
 
 class Rarity(enum.Enum):
     NORMAL = 1
@@ -67,10 +80,10 @@ CATEGORIES = [
     'Runes',  # 32
     'Uncategorized TODO',  # 33 
 ]
-CATEGORY_ITEMS = [set() for _ in range(len(CATEGORIES))]
 
 
-@dataclass
+# lightweight view of one catalog row, created on demand
+@dataclass(slots=True)
 class Item:
     id: int
     name: str
@@ -86,110 +99,1289 @@ def prepare_words(text: str) -> list[str]:
     return list(map(str.lower, text.split()))
 
 
-# {word: set([indices])}
-_SEARCH_STRUCTURE: dict[str : set[int]] = {}
-_ITEMS: list[Item] = []
+# 'word', '-word', 'field:value', '-field:value', 'field:"quoted value"'
+_QUERY_TOKEN = re.compile(r'(-?)(?:(\w+):)?("[^"]*"?|\S+)')
+FILTER_FIELDS = {'rarity', 'slot', 'set', 'category', 'found'}
+
+
+@dataclass
+class Query:
+    # every word has to match
+    words: list[str]
+    # no word may match
+    excluded: list[str]
+    # (negated, field, value), every filter has to match
+    filters: list[tuple[bool, str, str]]
+
+
+def parse_query(query: str) -> Query:
+    parsed = Query([], [], [])
+    for negated, field, value in _QUERY_TOKEN.findall(query):
+        value = value.strip('"')
+        field = field.lower()
+        if field in FILTER_FIELDS:
+            parsed.filters.append((bool(negated), field, value.lower()))
+        elif field:
+            # not a filter, search for it as text
+            parsed.words.extend(prepare_words(f'{field}:{value}'))
+        elif negated:
+            parsed.excluded.extend(prepare_words(value))
+        else:
+            parsed.words.extend(prepare_words(value))
+    return parsed
+
+
+def _mask_from(indices, size: int) -> int:
+    buffer = bytearray((size + 7) // 8)
+    for i in indices:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def _indices_from(mask: int) -> list[int]:
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    return [
+        byte_index * 8 + bit
+        for byte_index, byte in enumerate(data)
+        if byte
+        for bit in range(8)
+        if byte >> bit & 1
+    ]
+
+
+NGRAM_SIZE = 3
+
+
+def _ngrams(word: str, n: int) -> set[str]:
+    return {word[i : i + n] for i in range(len(word) - n + 1)}
+
+
+def _discard(index: dict[str, set[str]], key: str, word: str):
+    words = index.get(key)
+    if words is not None:
+        words.discard(word)
+        if not words:
+            del index[key]
+
+
+# list of returned items that also knows how many items matched in total
+class SearchResults(list):
+    def __init__(self, results=(), total: int | None = None):
+        super().__init__(results)
+        self.total = len(self) if total is None else total
+
+
+# how well a query word matches an item word, lower is better
+MATCH_EXACT = 0
+MATCH_PREFIX = 1
+MATCH_INFIX = 2
+# one typo, every further typo adds one
+MATCH_FUZZY = 3
+# typos forgiven by fuzzy search, words shorter than FUZZY_MIN_LENGTH get none
+# and words up to FUZZY_SHORT_LENGTH only one
+FUZZY_MAX_DISTANCE = 2
+# item_field_words order, name over base over set name
+_FIELDS_COUNT = 3
+_NO_MATCH = (MATCH_FUZZY + FUZZY_MAX_DISTANCE) * _FIELDS_COUNT
+
+FUZZY_MIN_LENGTH = 4
+FUZZY_SHORT_LENGTH = 5
+
+
+def _fuzzy_distance(word: str) -> int:
+    if len(word) < FUZZY_MIN_LENGTH:
+        return 0
+    if len(word) <= FUZZY_SHORT_LENGTH:
+        return 1
+    return FUZZY_MAX_DISTANCE
+
+
+def _deletes(word: str, distance: int) -> set[str]:
+    # word with up to distance characters deleted, word itself included
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1 :] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def _fuzzy_prefix_distance(word: str, key: str, max_distance: int) -> int:
+    # smallest edit distance between word and key or one of its prefixes
+    shortest = max(1, len(word) - max_distance)
+    longest = min(len(key), len(word) + max_distance)
+    return min(
+        (edit_distance(word, key[:length], max_distance) for length in range(shortest, longest + 1)),
+        default=max_distance + 1,
+    )
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    # optimal string alignment distance (a swap of neighbours counts as one edit),
+    # returns max_distance + 1 as soon as it is known to be larger
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (
+                i > 1 and j > 1
+                and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+CATALOG_PATH = Path(__file__).parent / 'assets' / 'items.csv'
+# parsed catalog and its indexes, rebuilt whenever items.csv changes
+CATALOG_CACHE_PATH = Path(__file__).parent / 'assets' / 'items.cache'
+# bump when anything stored in the cache changes shape
+CATALOG_CACHE_VERSION = 3
+# items of extra catalogs layered over items.csv (see catalogs.py) get ids from
+# LAYER_FIRST_ID on, so items.csv can grow below them. ids are kept in
+# CATALOG_IDS_PATH and never reused so found.db stays right when layers change.
+# they are allocated in the order this machine first sees the items, other
+# machines know them by their key (see layer_key), e.g. when syncing
+LAYER_FIRST_ID = 4096
+CATALOG_IDS_PATH = 'catalog_ids.json'
+# slot and rarity column value of ids without an item, no Slot or Rarity has it
+_NO_VALUE = 0
+UNCATEGORIZED = CATEGORIES.index('Uncategorized TODO')
+
+
+def layer_key(layer: str, name: str, base: str) -> str:
+    return f'{layer}/{name}/{base}'
+
+
+# one item of a layer, category by name
+@dataclass(slots=True)
+class LayerItem:
+    name: str
+    base: str
+    slot: Slot
+    rarity: Rarity
+    category: str
+
+
+# read only sequence of Item views over the catalog columns in id order.
+# ids without an item (see Catalog.removed) aren't in it, so the position of an
+# item is its id only while no layer is applied
+class ItemsView(Sequence):
+    def __init__(self, catalog: 'Catalog'):
+        self._catalog = catalog
+        self._ids = catalog.item_ids()
+
+    def __len__(self) -> int:
+        return len(self._ids)
 
-def _load_items(file_name: str):
-    with open(file_name) as items_file:
-        reader = csv.DictReader(items_file)
-        for row in reader:
-            row['id'] = int(row['id'])
-            row['slot'] = Slot(int(row['slot']))
-            row['rarity'] = Rarity(int(row['rarity']))
-            row['category'] = int(row['category'])
-            _ITEMS.append(Item(**row))
-            CATEGORY_ITEMS[row['category']].add(row['id'])
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._catalog.item(i) for i in self._ids[index]]
+        return self._catalog.item(self._ids[index])
 
-_load_items(Path(__file__).parent / 'assets' / 'items.csv')
 
-# future proofing if new items are added
-_ITEMS.sort(key=lambda i: i.id)  # sort so that item.id == index
+# items and their search indexes. loaded from csv_path (or its cache) on first
+# use, or ahead of time with load_in_background().
+# items are stored in columns indexed by item id (item.id == index), enums as
+# their values, and one bitmask per Rarity, Slot and category (int index into
+# CATEGORIES) with bit i set for item i, so aggregates are bitwise operations.
+# layers (mods, new ladder items) are applied while running with update_layer,
+# which only touches the indexes of the items that changed
+class Catalog:
+    def __init__(
+        self, csv_path=CATALOG_PATH, cache_path=CATALOG_CACHE_PATH, ids_path=CATALOG_IDS_PATH
+    ):
+        self.csv_path = csv_path
+        self.cache_path = cache_path
+        self.ids_path = ids_path
+        self._loaded = False
+        self._lock = threading.Lock()
+        # held while searching and while layers are updated, searches run on another thread
+        self.update_lock = threading.RLock()
+        # bumped by every layer update, results of earlier searches may be stale
+        self.version = 0
+        # CATEGORIES followed by the categories of layers
+        self.category_names: list[str] = list(CATEGORIES)
+        # bit i is set if id i has no item: removed layer items and the ids
+        # between items.csv and LAYER_FIRST_ID
+        self.removed = 0
+        # {layer: {item key: id}} of the current items of every layer
+        self.layers: dict[str, dict[str, int]] = {}
+        # {item key: id} of every layer item ever seen, read on first use
+        self._layer_ids: dict[str, int] | None = None
+        self._next_layer_id = LAYER_FIRST_ID
+        # called with the ids changed by a layer update
+        self._listeners = []
+        self.names: list[str] = []
+        self.bases: list[str] = []
+        self.slots = array('B')
+        self.rarities = array('B')
+        self.categories = array('H')
+        # {Rarity | Slot | category: bitmask of items}
+        self.masks: dict[Rarity | Slot | int, int] = {}
+        self._category_items: list[set[int]] = [set() for _ in range(len(CATEGORIES))]
+        # {word: set([indices])}
+        self.search_structure: dict[str : set[int]] = {}
+        # {ngram: set([words])} for every 1 to NGRAM_SIZE long substring of search_structure keys
+        self.ngram_index: dict[str : set[str]] = {}
+        # {word with up to FUZZY_MAX_DISTANCE characters deleted: set([words])}
+        # of search_structure keys and their prefixes (so typos are forgiven
+        # while typing), symmetric delete index for fuzzy search.
+        # large and only needed by fuzzy search, so built on first use and not cached
+        self.deletes: dict[str : set[str]] | None = None
+        # searchable words of each item, indexed by item id
+        self.item_words: list[list[str]] = []
+        # words of each item split into (name words, base words, set name words), used for ranking
+        self.item_field_words: list[tuple[list[str], list[str], list[str]]] = []
 
-for i, item in enumerate(_ITEMS):
-    if i != item.id:
-        raise AssertionError(
-            f'Item id={item.id} is different than it\'s index={i} in _ITEMS'
+    @property
+    def items(self) -> ItemsView:
+        self.load()
+        return ItemsView(self)
+
+    def item(self, item_id: int) -> Item:
+        self.load()
+        if self.removed >> item_id & 1:
+            raise IndexError(f'no item with id {item_id}')
+        return Item(
+            item_id,
+            self.names[item_id],
+            self.bases[item_id],
+            Slot(self.slots[item_id]),
+            Rarity(self.rarities[item_id]),
+            self.categories[item_id],
+        )
+
+    def item_ids(self) -> Sequence[int]:
+        # ids that have an item, ascending
+        self.load()
+        if not self.removed:
+            return range(len(self.rarities))
+        return _indices_from(self.all_mask())
+
+    def mask(self, key: Rarity | Slot | int) -> int:
+        self.load()
+        return self.masks.get(key, 0)
+
+    def count(self, key: Rarity | Slot | int, found_mask: int = -1) -> int:
+        # items with key, only those in found_mask if given
+        return (self.mask(key) & found_mask).bit_count()
+
+    def counts(self, found_mask: int = -1) -> dict[Rarity | Slot | int, int]:
+        self.load()
+        return {key: (mask & found_mask).bit_count() for key, mask in self.masks.items()}
+
+    @property
+    def category_items(self) -> list[set[int]]:
+        self.load()
+        return self._category_items
+
+    def __len__(self) -> int:
+        self.load()
+        return len(self.rarities)
+
+    def load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            key = self._cache_key()
+            if not self._load_cache(key):
+                self._load_items()
+                self._build_indexes()
+                try:
+                    self._write_cache(key)
+                except OSError as e:
+                    # read only install, parse again on next start
+                    print(f'ERROR: Failed to write {self.cache_path}: {e}')
+            self._loaded = True
+
+    def load_in_background(self, fuzzy: bool = False) -> threading.Thread:
+        # anything using the catalog meanwhile waits for the load to finish
+        def load():
+            self.load()
+            if fuzzy:
+                self.build_fuzzy_index()
+
+        thread = threading.Thread(target=load, name='catalog-loader', daemon=True)
+        thread.start()
+        return thread
+
+    def build_fuzzy_index(self):
+        self.load()
+        if self.deletes is not None:
+            return
+        with self.update_lock:
+            if self.deletes is not None:
+                return
+            deletes = {}
+            for word in self.search_structure:
+                self._index_deletes(word, deletes)
+            self.deletes = deletes
+
+    def _load_items(self):
+        with open(self.csv_path) as items_file:
+            rows = list(csv.DictReader(items_file))
+        # future proofing if new items are added
+        rows.sort(key=lambda row: int(row['id']))  # sort so that item.id == index
+        self.masks = {key: 0 for key in [*Rarity, *Slot, *range(len(CATEGORIES))]}
+        for i, row in enumerate(rows):
+            if i != int(row['id']):
+                raise AssertionError(
+                    f'Item id={row["id"]} is different than it\'s index={i} in items'
+                )
+            slot = Slot(int(row['slot']))
+            rarity = Rarity(int(row['rarity']))
+            category = int(row['category'])
+            self.names.append(sys.intern(row['name']))
+            self.bases.append(sys.intern(row['base']))
+            self.slots.append(slot.value)
+            self.rarities.append(rarity.value)
+            self.categories.append(category)
+            bit = 1 << i
+            self.masks[slot] |= bit
+            self.masks[rarity] |= bit
+            self.masks[category] |= bit
+            self._category_items[category].add(i)
+
+    def _build_indexes(self):
+        for i in range(len(self.names)):
+            name_words = prepare_words(self.names[i])
+            base_words = prepare_words(self.bases[i])
+            # make set items searchable by set name
+            set_words = []
+            if self.rarities[i] == Rarity.SET.value:
+                set_words = prepare_words(self.category_names[self.categories[i]])
+            words = name_words + base_words + set_words
+            self.item_words.append(words)
+            self.item_field_words.append((name_words, base_words, set_words))
+            self._index_words(i, words)
+
+    def _index_words(self, i: int, words: list[str]):
+        for word in words:
+            if word not in self.search_structure:
+                self.search_structure[word] = set()
+                self._index_ngrams(word)
+                if self.deletes is not None:
+                    self._index_deletes(word, self.deletes)
+            self.search_structure[word].add(i)
+
+    def _unindex_words(self, i: int, words: list[str]):
+        for word in set(words):
+            hits = self.search_structure[word]
+            hits.discard(i)
+            if hits:
+                continue
+            # no item has the word anymore
+            del self.search_structure[word]
+            for n in range(1, NGRAM_SIZE + 1):
+                for ngram in _ngrams(word, n):
+                    _discard(self.ngram_index, ngram, word)
+            if self.deletes is not None:
+                for length in range(min(FUZZY_MIN_LENGTH, len(word)), len(word) + 1):
+                    for variant in _deletes(word[:length], FUZZY_MAX_DISTANCE):
+                        _discard(self.deletes, variant, word)
+
+    def _index_ngrams(self, word: str):
+        for n in range(1, NGRAM_SIZE + 1):
+            for ngram in _ngrams(word, n):
+                if ngram not in self.ngram_index:
+                    self.ngram_index[ngram] = set()
+                self.ngram_index[ngram].add(word)
+
+    @staticmethod
+    def _index_deletes(word: str, deletes: dict):
+        for length in range(min(FUZZY_MIN_LENGTH, len(word)), len(word) + 1):
+            for variant in _deletes(word[:length], FUZZY_MAX_DISTANCE):
+                if variant not in deletes:
+                    deletes[variant] = set()
+                deletes[variant].add(word)
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def category_index(self, name: str) -> int:
+        # layer categories are added on first use
+        if name not in self.category_names:
+            self.category_names.append(name)
+            self._category_items.append(set())
+            self.masks[len(self.category_names) - 1] = 0
+        return self.category_names.index(name)
+
+    def update_layer(self, layer: str, layer_items: list[LayerItem] | None) -> list[int]:
+        # replaces the items of layer (None removes it). the items are diffed
+        # against the layer's current ones, only the added, changed and removed
+        # ones are indexed again. returns their ids
+        self.load()
+        with self.update_lock:
+            ids = self._get_layer_ids()
+            allocated = False
+            old = self.layers.pop(layer, {})
+            new = {}
+            changed = []
+            for layer_item in layer_items or ():
+                key = layer_key(layer, layer_item.name, layer_item.base)
+                if key in new:
+                    continue
+                item_id = ids.get(key)
+                if item_id is None:
+                    item_id = self._allocate_layer_id(key)
+                    allocated = True
+                new[key] = item_id
+                category = self.category_index(layer_item.category)
+                if key in old:
+                    if (
+                        self.slots[item_id] == layer_item.slot.value
+                        and self.rarities[item_id] == layer_item.rarity.value
+                        and self.categories[item_id] == category
+                    ):
+                        continue
+                    self._remove_item(item_id)
+                self._add_item(item_id, layer_item, category)
+                changed.append(item_id)
+            for key, item_id in old.items():
+                if key not in new:
+                    self._remove_item(item_id)
+                    changed.append(item_id)
+            if new:
+                self.layers[layer] = new
+            if allocated:
+                self._write_layer_ids()
+            if changed:
+                self.version += 1
+        if changed:
+            for listener in self._listeners:
+                listener(changed)
+        return changed
+
+    def _add_item(self, i: int, layer_item: LayerItem, category: int):
+        while len(self.names) <= i:
+            # ids without an item up to i
+            self.removed |= 1 << len(self.names)
+            self.names.append('')
+            self.bases.append('')
+            self.slots.append(_NO_VALUE)
+            self.rarities.append(_NO_VALUE)
+            self.categories.append(UNCATEGORIZED)
+            self.item_words.append([])
+            self.item_field_words.append(([], [], []))
+        self.names[i] = sys.intern(layer_item.name)
+        self.bases[i] = sys.intern(layer_item.base)
+        self.slots[i] = layer_item.slot.value
+        self.rarities[i] = layer_item.rarity.value
+        self.categories[i] = category
+        bit = 1 << i
+        self.removed &= ~bit
+        self.masks[layer_item.slot] |= bit
+        self.masks[layer_item.rarity] |= bit
+        self.masks[category] |= bit
+        self._category_items[category].add(i)
+        name_words = prepare_words(layer_item.name)
+        base_words = prepare_words(layer_item.base)
+        set_words = []
+        if layer_item.rarity == Rarity.SET:
+            set_words = prepare_words(self.category_names[category])
+        words = name_words + base_words + set_words
+        self.item_words[i] = words
+        self.item_field_words[i] = (name_words, base_words, set_words)
+        self._index_words(i, words)
+
+    def _remove_item(self, i: int):
+        bit = 1 << i
+        self.removed |= bit
+        self.masks[Slot(self.slots[i])] &= ~bit
+        self.masks[Rarity(self.rarities[i])] &= ~bit
+        self.masks[self.categories[i]] &= ~bit
+        self._category_items[self.categories[i]].discard(i)
+        self._unindex_words(i, self.item_words[i])
+        self.names[i] = ''
+        self.bases[i] = ''
+        self.slots[i] = _NO_VALUE
+        self.rarities[i] = _NO_VALUE
+        self.categories[i] = UNCATEGORIZED
+        self.item_words[i] = []
+        self.item_field_words[i] = ([], [], [])
+
+    def layer_ids(self) -> dict[str, int]:
+        # {layer key: item id} of every layer item this machine has seen
+        with self.update_lock:
+            return dict(self._get_layer_ids())
+
+    def layer_item_id(self, key: str) -> int:
+        # id of the layer item with key, allocated if it was never seen, e.g.
+        # found on another machine with a layer this one doesn't have yet
+        with self.update_lock:
+            item_id = self._get_layer_ids().get(key)
+            if item_id is None:
+                item_id = self._allocate_layer_id(key)
+                self._write_layer_ids()
+            return item_id
+
+    def _allocate_layer_id(self, key: str) -> int:
+        item_id = self._layer_ids[key] = self._next_layer_id
+        self._next_layer_id += 1
+        return item_id
+
+    def _get_layer_ids(self) -> dict[str, int]:
+        if self._layer_ids is None:
+            try:
+                with open(self.ids_path, encoding='utf-8') as f:
+                    self._layer_ids = json.load(f)
+            except FileNotFoundError:
+                self._layer_ids = {}
+            self._next_layer_id = max([LAYER_FIRST_ID - 1, *self._layer_ids.values()]) + 1
+        return self._layer_ids
+
+    def _write_layer_ids(self):
+        temp_file = f'{self.ids_path}.tmp'
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._layer_ids, f, indent=0)
+            os.replace(temp_file, self.ids_path)
+        except OSError as e:
+            print(f'ERROR: Failed to write {self.ids_path}: {e}')
+
+    def _cache_key(self) -> str:
+        key = hashlib.sha256(Path(self.csv_path).read_bytes())
+        # indexes also depend on these
+        key.update(repr((CATALOG_CACHE_VERSION, NGRAM_SIZE, CATEGORIES)).encode())
+        return key.hexdigest()
+
+    def _state(self) -> dict:
+        return {
+            'names': self.names,
+            'bases': self.bases,
+            'slots': self.slots,
+            'rarities': self.rarities,
+            'categories': self.categories,
+            'masks': self.masks,
+            '_category_items': self._category_items,
+            'search_structure': self.search_structure,
+            'ngram_index': self.ngram_index,
+            'item_words': self.item_words,
+            'item_field_words': self.item_field_words,
+        }
+
+    def _load_cache(self, key: str) -> bool:
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached['key'] != key:
+                return False
+            state = {name: cached['state'][name] for name in self._state()}
+        except Exception:
+            # missing, stale or broken cache, it will be rebuilt
+            return False
+        for name, value in state.items():
+            setattr(self, name, value)
+        return True
+
+    def _write_cache(self, key: str):
+        temp_file = f'{self.cache_path}.tmp'
+        with open(temp_file, 'wb') as f:
+            pickle.dump({'key': key, 'state': self._state()}, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, self.cache_path)
+
+    def build_cache(self):
+        # build step, see main.spec
+        self.load()
+        self._write_cache(self._cache_key())
+
+    def matching_keys(self, word: str) -> set[str]:
+        # returns keys of search_structure that contain word as a substring
+        self.load()
+        if len(word) <= NGRAM_SIZE:
+            return self.ngram_index.get(word, set())
+        # every key containing word also contains all of word's ngrams,
+        # start with the rarest ngram to keep the candidate set small
+        ngram_keys = sorted(
+            (self.ngram_index.get(ngram, set()) for ngram in _ngrams(word, NGRAM_SIZE)),
+            key=len,
         )
-    words = prepare_words(item.name) + prepare_words(item.base)
-    # make set items searchable by set name
-    if item.rarity == Rarity.SET:
-        words.extend(prepare_words(CATEGORIES[item.category]))
-    for word in words:
-        if word not in _SEARCH_STRUCTURE:
-            _SEARCH_STRUCTURE[word] = set()
-        _SEARCH_STRUCTURE[word].add(item.id)
-
-
-def search(query: str) -> list[Item]:
-    words = prepare_words(query)
-    result_indices = set()
-    for i, word in enumerate(words):
-        hits = set()
-        for key in _SEARCH_STRUCTURE.keys():
+        candidates = ngram_keys[0]
+        for keys in ngram_keys[1:]:
+            if not candidates:
+                break
+            candidates = candidates & keys
+        # ngrams can be present in a key without forming word, so verify
+        return {key for key in candidates if word in key}
+
+    def fuzzy_keys(self, word: str) -> dict[str, int]:
+        # {key: typos} of search_structure keys that don't contain word but
+        # start with (or are) something within a few typos of it
+        max_distance = _fuzzy_distance(word)
+        if not max_distance:
+            return {}
+        self.build_fuzzy_index()
+        candidates = set()
+        for variant in _deletes(word, max_distance):
+            candidates |= self.deletes.get(variant, set())
+        fuzzy = {}
+        for key in candidates:
             if word in key:
-                hits.update(_SEARCH_STRUCTURE[key])
-        if i == 0:
-            result_indices.update(hits)
+                continue
+            distance = _fuzzy_prefix_distance(word, key, max_distance)
+            if distance <= max_distance:
+                fuzzy[key] = distance
+        return fuzzy
+
+    def fuzzy_words(self, words: list[str]) -> dict[str, dict[str, int]]:
+        return {word: self.fuzzy_keys(word) for word in words}
+
+    def search_indices(self, words: list[str], fuzzy_words: dict | None = None) -> set[int]:
+        # fuzzy_words ({word: fuzzy_keys(word)}) adds typo matches to the hits
+        result_indices = set()
+        for i, word in enumerate(words):
+            hits = set()
+            keys = self.matching_keys(word)
+            if fuzzy_words:
+                keys = keys | fuzzy_words[word].keys()
+            for key in keys:
+                hits.update(self.search_structure[key])
+            if i == 0:
+                result_indices.update(hits)
+            else:
+                result_indices.intersection_update(hits)
+        return result_indices
+
+    def item_matches(self, item_id: int, words: tuple[str], fuzzy_words: dict | None = None) -> bool:
+        # fuzzy_words ({word: fuzzy_keys(word)}) also lets words match with typos
+        item_words = self.item_words[item_id]
+        return all(
+            any(
+                word in item_word or (fuzzy_words is not None and item_word in fuzzy_words[word])
+                for item_word in item_words
+            )
+            for word in words
+        )
+
+    def fuzzy_indices(self, words, fuzzy_words: dict) -> set[int]:
+        # hits of search_indices(words, fuzzy_words) that match a word only with typos,
+        # the others are search_indices(words). costs what the typo matches' items do
+        candidates = set()
+        for word in words:
+            for key in fuzzy_words[word]:
+                candidates |= self.search_structure[key]
+        return {i for i in candidates if self.item_matches(i, words, fuzzy_words)}
+
+    def match_score(self, item_id: int, words: list[str], bound: int, fuzzy_words: dict | None = None) -> int:
+        # sum of the best (match kind, field) rank of every query word,
+        # stops early and returns something > bound when bound is exceeded
+        score = 0
+        for word in words:
+            best = _NO_MATCH
+            for field, field_words in enumerate(self.item_field_words[item_id]):
+                for item_word in field_words:
+                    if item_word == word:
+                        kind = MATCH_EXACT
+                    elif item_word.startswith(word):
+                        kind = MATCH_PREFIX
+                    elif word in item_word:
+                        kind = MATCH_INFIX
+                    elif fuzzy_words and item_word in fuzzy_words[word]:
+                        kind = MATCH_FUZZY + fuzzy_words[word][item_word] - 1
+                    else:
+                        continue
+                    best = min(best, kind * _FIELDS_COUNT + field)
+            score += best
+            if score > bound:
+                break
+        return score
+
+    def filter_value_mask(self, field: str, value: str, found_mask: int) -> int:
+        # value can list alternatives, e.g. 'rarity:set,unique'
+        mask = 0
+        for alternative in value.split(','):
+            if field == 'rarity':
+                keys = [r for r in Rarity if r.name.lower().startswith(alternative)]
+            elif field == 'slot':
+                keys = [s for s in Slot if s.name.lower().startswith(alternative)]
+            elif field in ('set', 'category'):
+                words = ' '.join(prepare_words(alternative))
+                keys = [
+                    i for i, name in enumerate(self.category_names)
+                    if words in ' '.join(prepare_words(name))
+                ]
+            elif alternative in ('yes', 'y', 'true'):
+                mask |= found_mask
+                keys = []
+            elif alternative in ('no', 'n', 'false'):
+                mask |= self.all_mask() & ~found_mask
+                keys = []
+            else:
+                keys = []
+            for key in keys:
+                mask |= self.masks.get(key, 0)
+        return mask
+
+    def all_mask(self) -> int:
+        return ((1 << len(self)) - 1) & ~self.removed
+
+    def words_mask(self, words: list[str]) -> int:
+        # items matching any of words
+        return _mask_from(
+            (i for word in words for key in self.matching_keys(word)
+             for i in self.search_structure[key]),
+            len(self),
+        )
+
+    def filter_indices(self, query: Query, text_indices, found_mask: int = 0):
+        # applies filters and excluded words of query to the hits of its words,
+        # text_indices is None if query has no words
+        if not query.filters and not query.excluded:
+            return text_indices if text_indices is not None else set()
+        if text_indices is None:
+            mask = self.all_mask()
         else:
-            result_indices.intersection_update(hits)
+            mask = _mask_from(text_indices, len(self))
+        for negated, field, value in query.filters:
+            value_mask = self.filter_value_mask(field, value, found_mask)
+            mask = mask & ~value_mask if negated else mask & value_mask
+        if query.excluded:
+            mask &= ~self.words_mask(query.excluded)
+        return _indices_from(mask)
+
+    def top_k(self, indices, words: list[str], limit: int, found_mask: int = 0, fuzzy_words: dict | None = None) -> list[Item]:
+        # ranked by (match score, found, id), keeps a max-heap of the best limit
+        # entries so the whole hit list is never sorted
+        if limit <= 0:
+            return []
+        heap = []  # entries are negated keys so heap[0] is the worst kept hit
+        bound = len(words) * _NO_MATCH
+        for i in indices:
+            score = self.match_score(i, words, bound, fuzzy_words)
+            if score > bound:
+                continue
+            entry = (-score, -(found_mask >> i & 1), -i)
+            if len(heap) < limit:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+            else:
+                continue
+            if len(heap) == limit:
+                # hits scoring worse than the worst kept one can't get in
+                bound = -heap[0][0]
+        return [self.item(-i) for _, _, i in sorted(heap, reverse=True)]
+
+    def results(
+        self, indices, words: list[str], limit: int | None, found_mask: int = 0, fuzzy_words: dict | None = None
+    ) -> SearchResults:
+        if limit is not None:
+            return SearchResults(
+                self.top_k(indices, words, limit, found_mask, fuzzy_words), len(indices)
+            )
+        return SearchResults([self.item(i) for i in indices])
+
+    @instrument.timed('search')
+    def search(
+        self, query: str, limit: int | None = None, found_mask: int = 0, fuzzy: bool = False
+    ) -> SearchResults:
+        # see parse_query for the query syntax, found_mask is used by found: filters and ranking.
+        # fuzzy also matches words with typos, ranked below exact and substring matches
+        parsed = parse_query(query)
+        with self.update_lock:
+            fuzzy_words = self.fuzzy_words(parsed.words) if fuzzy else None
+            text_indices = self.search_indices(parsed.words, fuzzy_words) if parsed.words else None
+            indices = self.filter_indices(parsed, text_indices, found_mask)
+            return self.results(indices, parsed.words, limit, found_mask, fuzzy_words)
+
+
+def _refines(old_words: tuple[str], new_words: tuple[str]) -> bool:
+    # True when every hit of new_words is guaranteed to be a hit of old_words,
+    # e.g. "shak" -> "shako" or "tal" -> "tal ras"
+    if not old_words or len(new_words) < len(old_words):
+        return False
+    return all(old in new for old, new in zip(old_words, new_words))
+
+
+# type-ahead search that reuses results of the previous query.
+# queries that extend the previous one only filter its hits,
+# queries seen recently (e.g. after backspace) are served from a bounded cache.
+# typo matches of a longer word aren't a subset of the shorter one's, so fuzzy
+# sessions narrow the substring hits only and add the typo hits separately
+class SearchSession:
+    PREFIX_CACHE_SIZE = 32
+
+    def __init__(
+        self,
+        catalog: Catalog,
+        progress: 'Progress | None' = None,
+        cache_size: int = PREFIX_CACHE_SIZE,
+        fuzzy: bool = False,
+    ):
+        self.catalog = catalog
+        # for found: filters and ranking unfound items first
+        self.progress = progress
+        self.fuzzy = fuzzy
+        self._cache_size = cache_size
+        # {words: (substring hits, fuzzy_words, all hits)}, least recently used first.
+        # fuzzy_words is None unless fuzzy, all hits are the substring hits then
+        self._cache: OrderedDict[tuple[str], tuple] = OrderedDict()
+        self._last_words: tuple[str] = ()
+        self._last_hits: tuple = (frozenset(), None, frozenset())
+        # catalog version the cache is for
+        self._version = catalog.version
+
+    @instrument.timed('search.session')
+    def search(self, query: str, limit: int | None = None) -> SearchResults:
+        # only the text part is reused between queries,
+        # filters are cheap and found state can change between keystrokes
+        parsed = parse_query(query)
+        found_mask = self.progress.found_mask if self.progress is not None else 0
+        with self.catalog.update_lock:
+            if self._version != self.catalog.version:
+                # layers changed the catalog since
+                self.clear()
+                self._version = self.catalog.version
+            text_indices = None
+            fuzzy_words = None
+            if parsed.words:
+                text_indices, fuzzy_words = self._indices(tuple(parsed.words))
+            indices = self.catalog.filter_indices(parsed, text_indices, found_mask)
+            return self.catalog.results(indices, parsed.words, limit, found_mask, fuzzy_words)
+
+    def clear(self):
+        self._cache.clear()
+        self._last_words = ()
+        self._last_hits = (frozenset(), None, frozenset())
+
+    def _indices(self, words: tuple[str]) -> tuple[frozenset[int], dict | None]:
+        # (hits, fuzzy_words) of words
+        if words == self._last_words:
+            hits = self._last_hits
+        elif words in self._cache:
+            self._cache.move_to_end(words)
+            hits = self._cache[words]
+        else:
+            if _refines(self._last_words, words):
+                substring = frozenset(
+                    i for i in self._last_hits[0] if self.catalog.item_matches(i, words)
+                )
+            else:
+                substring = frozenset(self.catalog.search_indices(list(words)))
+            fuzzy_words = None
+            indices = substring
+            if self.fuzzy:
+                fuzzy_words = self.catalog.fuzzy_words(list(words))
+                indices = substring | self.catalog.fuzzy_indices(words, fuzzy_words)
+            hits = (substring, fuzzy_words, indices)
+        self._remember(words, hits)
+        return hits[2], hits[1]
+
+    def _remember(self, words: tuple[str], hits: tuple):
+        self._last_words = words
+        self._last_hits = hits
+        self._cache[words] = hits
+        self._cache.move_to_end(words)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+
+FOUND_DB_PATH = 'found.db'
+CURRENT_FOUND_DB_VERSION = founddb.VERSION
+# log is compacted once it holds this many more records than found items
+COMPACT_SLACK_RECORDS = 1000
+# profile whose progress is in FOUND_DB_PATH, others are in found-<name>.db
+DEFAULT_PROFILE = 'default'
+_PROFILE_NAME = re.compile(r'[\w-]+')
+FOUND_DB_FSYNC = founddb.FSYNC_INTERVAL
+FOUND_DB_FSYNC_INTERVAL = 1.0
+
+
+# found items persisted in found.db at db_path, the file is created
+# (or migrated) and read on first use. with a catalog its bitset is created
+# large enough for every item in it
+class Progress:
+    def __init__(
+        self,
+        db_path=FOUND_DB_PATH,
+        fsync_policy: str = FOUND_DB_FSYNC,
+        fsync_interval: float = FOUND_DB_FSYNC_INTERVAL,
+        catalog: 'Catalog | None' = None,
+    ):
+        self.db_path = db_path
+        self.catalog = catalog
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.compact_slack_records = COMPACT_SLACK_RECORDS
+        self._loaded = False
+        # None while suspended, rebuilt from _found_mask when used
+        self._found_ids: set[int] | None = set()
+        # bit i is set if item i is found, same as found_ids
+        self._found_mask = 0
+        # number of records currently in found.db change log
+        self._records = 0
+        # found.db bitset size in bytes, item ids beyond it need a rewrite
+        self._bitset_size = 0
+        self._writer: founddb.Writer | None = None
+        # called with (item_id, found) after every change
+        self._listeners = []
+        # called with the (action, item_id, timestamp) records written
+        self._record_listeners = []
+
+    @property
+    def found_ids(self) -> set[int]:
+        self.load()
+        if self._found_ids is None:
+            self._found_ids = set(founddb.bits(self._found_mask))
+        return self._found_ids
+
+    @property
+    def found_mask(self) -> int:
+        self.load()
+        return self._found_mask
+
+    def load(self):
+        if self._loaded:
+            return
+        with instrument.timer('found_db.load'):
+            self._load()
+
+    def _load(self):
+        with founddb.locked(self.db_path):
+            if not pathlib.Path(self.db_path).is_file():
+                founddb.create(self.db_path, self._item_count())
+            elif founddb.is_v1(self.db_path):
+                founddb.migrate_v1(self.db_path, self._item_count())
+        db = founddb.read_repaired(self.db_path)
+        self._found_ids = set(founddb.bits(db.found))
+        self._found_mask = db.found
+        self._records = db.records
+        self._bitset_size = db.bitset_size
+        self._loaded = True
+        self._compact_if_needed()
+
+    def _item_count(self) -> int:
+        # ids the bitset of a new file has room for, loads the catalog
+        return len(self.catalog) if self.catalog is not None else 0
+
+    def _get_writer(self) -> founddb.Writer:
+        if self._writer is None:
+            self._writer = founddb.Writer(self.db_path, self.fsync_policy, self.fsync_interval)
+            self._writer.start()
+            atexit.register(self.close)
+        return self._writer
+
+    def flush(self):
+        # blocks until every queued record is written
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self):
+        if self._writer is not None:
+            writer = self._writer
+            self._writer = None
+            atexit.unregister(self.close)
+            # raises if writing failed, the next write starts a new writer
+            writer.stop()
+
+    def suspend(self):
+        # keeps nothing but the found bitset until the progress is used again
+        self.close()
+        if self._loaded:
+            self._found_ids = None
+
+    def _record(self, action: bytes, item_id: int):
+        if item_id >= self._bitset_size * 8:
+            # bitset is too small for the item, rewrite the file with a larger one
+            self.compact()
+        timestamp = time.time()
+        self._get_writer().append(action, item_id, timestamp)
+        self._records += 1
+        self._compact_if_needed()
+        for listener in self._record_listeners:
+            listener([(action, item_id, timestamp)])
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def subscribe_records(self, listener):
+        self._record_listeners.append(listener)
+
+    def unsubscribe_records(self, listener):
+        self._record_listeners.remove(listener)
+
+    def _notify(self, item_id: int, found: bool):
+        for listener in self._listeners:
+            listener(item_id, found)
+
+    def mark_found(self, item_id: int):
+        if item_id in self.found_ids:
+            return
+        self._found_ids.add(item_id)
+        self._found_mask |= 1 << item_id
+        self._record(founddb.ADD, item_id)
+        self._notify(item_id, True)
 
-    results = []
-    for i in result_indices:
-        item = _ITEMS[i]
-        results.append(item)
-    return results
+    def mark_missing(self, item_id: int):
+        self.found_ids.remove(item_id)
+        self._found_mask &= ~(1 << item_id)
+        self._record(founddb.REMOVE, item_id)
+        self._notify(item_id, False)
 
+    def mark_many(self, item_ids, found: bool = True) -> list[int]:
+        # marks every item with a single found.db write,
+        # returns the ids whose state changed in order
+        action = founddb.ADD if found else founddb.REMOVE
+        timestamp = time.time()
+        return self.apply_records([(action, i, timestamp) for i in dict.fromkeys(item_ids)])
+
+    def apply_records(self, records) -> list[int]:
+        # applies (action, item_id, timestamp) records in order with a single
+        # found.db write, keeping their timestamps (e.g. merged from a replica).
+        # records that change nothing are skipped, returns the ids changed in order
+        found_ids = self.found_ids
+        changed = []
+        for record in records:
+            action, item_id, _ = record
+            found = action == founddb.ADD
+            if (item_id in found_ids) == found:
+                continue
+            if found:
+                found_ids.add(item_id)
+                self._found_mask |= 1 << item_id
+            else:
+                found_ids.remove(item_id)
+                self._found_mask &= ~(1 << item_id)
+            changed.append(record)
+        if not changed:
+            return []
+        if max(item_id for _, item_id, _ in changed) >= self._bitset_size * 8:
+            self.compact()
+        self._get_writer().append_many(changed)
+        self._records += len(changed)
+        self._compact_if_needed()
+        for listener in self._record_listeners:
+            listener(changed)
+        for action, item_id, _ in changed:
+            self._notify(item_id, action == founddb.ADD)
+        return [item_id for _, item_id, _ in changed]
+
+    def _compact_if_needed(self):
+        if self._records - len(self._found_ids) > self.compact_slack_records:
+            self.compact()
+
+    def compact(self):
+        # rewrites found.db keeping its UUID, the found bitset and the latest
+        # record of every item, see founddb.compact. done by the writer, after the records queued before it
+        self.load()
+        self._bitset_size = max(
+            self._bitset_size,
+            founddb.bitset_size_for(max([0, *(i + 1 for i in self.found_ids)])),
+        )
+        self._get_writer().compact(self._bitset_size)
+        self._records = len(self.found_ids)
+
+
+# found/total counts per Rarity, Slot and category (int index into CATEGORIES).
+# totals are counted once, found counts follow progress changes in O(1)
+class ProgressStats:
+    def __init__(self, catalog: Catalog, progress: Progress):
+        self.catalog = catalog
+        self.totals: dict[Rarity | Slot | int, int] = catalog.counts()
+        self.progress = progress
+        self.found: dict[Rarity | Slot | int, int] = catalog.counts(progress.found_mask)
+        # called with the set of keys whose found count changed
+        self._subscribers = []
+        progress.subscribe(self._item_changed)
+        catalog.subscribe(self._catalog_changed)
+
+    def reset(self, progress: Progress):
+        # counts another progress from now on, e.g. after switching profiles
+        self.progress.unsubscribe(self._item_changed)
+        self.progress = progress
+        self.found = self.catalog.counts(progress.found_mask)
+        progress.subscribe(self._item_changed)
+        for subscriber in self._subscribers:
+            subscriber(set(self.found))
+
+    def _catalog_changed(self, item_ids: list[int]):
+        # a layer added or removed items, counting all keys again is a few bit counts
+        self.totals = self.catalog.counts()
+        self.found = self.catalog.counts(self.progress.found_mask)
+        for subscriber in self._subscribers:
+            subscriber(set(self.found))
+
+    def _keys(self, item_id: int) -> tuple:
+        catalog = self.catalog
+        return (
+            Rarity(catalog.rarities[item_id]),
+            Slot(catalog.slots[item_id]),
+            catalog.categories[item_id],
+        )
+
+    def subscribe(self, subscriber):
+        self._subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.remove(subscriber)
+
+    def _item_changed(self, item_id: int, found: bool):
+        catalog = self.catalog
+        if item_id >= len(catalog) or catalog.removed >> item_id & 1:
+            # e.g. merged from a replica with other layers, counted by nothing
+            return
+        keys = self._keys(item_id)
+        for key in keys:
+            self.found[key] += 1 if found else -1
+        for subscriber in self._subscribers:
+            subscriber(set(keys))
+
+
+# catalog and progress of one player, each loaded separately on first use.
+# progress is kept per profile (e.g. softcore and hardcore), every profile has
+# its own found.db next to db_path and they all share the catalog
+class GrailTracker:
+    def __init__(self, db_path=FOUND_DB_PATH, catalog: Catalog | None = None):
+        self.catalog = catalog if catalog is not None else Catalog()
+        self.db_path = db_path
+        self.profile = DEFAULT_PROFILE
+        self.progress = Progress(db_path, catalog=self.catalog)
+        # {name: Progress}, inactive ones are suspended to their found bitset
+        self._profiles: dict[str, Progress] = {DEFAULT_PROFILE: self.progress}
+        self._stats: ProgressStats | None = None
+        # called with the name of the profile switched to
+        self._profile_subscribers = []
+
+    @property
+    def stats(self) -> ProgressStats:
+        if self._stats is None:
+            self._stats = ProgressStats(self.catalog, self.progress)
+        return self._stats
+
+    @property
+    def items(self) -> list[Item]:
+        return self.catalog.items
+
+    @property
+    def found_ids(self) -> set[int]:
+        return self.progress.found_ids
+
+    def search(self, query: str, limit: int | None = None, fuzzy: bool = False) -> SearchResults:
+        return self.catalog.search(query, limit, self.progress.found_mask, fuzzy)
+
+    def search_session(self, fuzzy: bool = False) -> SearchSession:
+        return SearchSession(self.catalog, self.progress, fuzzy=fuzzy)
+
+    def mark_found(self, item_id: int):
+        self.progress.mark_found(item_id)
+
+    def mark_missing(self, item_id: int):
+        self.progress.mark_missing(item_id)
+
+    def mark_many(self, item_ids, found: bool = True) -> list[int]:
+        return self.progress.mark_many(item_ids, found)
+
+    def profile_path(self, name: str) -> str:
+        if name == DEFAULT_PROFILE:
+            return str(self.db_path)
+        if not _PROFILE_NAME.fullmatch(name):
+            raise ValueError(f'Invalid profile name {name!r}, use letters, numbers, - and _')
+        path = Path(self.db_path)
+        return str(path.with_name(f'{path.stem}-{name}{path.suffix}'))
+
+    def profile_names(self) -> list[str]:
+        # default first, then profiles on disk or created since, by name
+        path = Path(self.db_path)
+        names = set(self._profiles)
+        for profile_path in path.parent.glob(f'{path.stem}-*{path.suffix}'):
+            name = profile_path.stem[len(path.stem) + 1 :]
+            if _PROFILE_NAME.fullmatch(name):
+                names.add(name)
+        names.discard(DEFAULT_PROFILE)
+        return [DEFAULT_PROFILE, *sorted(names)]
+
+    def load_profiles(self):
+        # reads the bitset of every profile so switching to it needs no disk access
+        for name in self.profile_names():
+            progress = self._profile(name)
+            if progress is not self.progress:
+                progress.load()
+                progress.suspend()
+
+    def _profile(self, name: str) -> Progress:
+        if name not in self._profiles:
+            self._profiles[name] = Progress(self.profile_path(name), catalog=self.catalog)
+        return self._profiles[name]
+
+    def switch_profile(self, name: str):
+        if name == self.profile:
+            return
+        progress = self._profile(name)
+        progress.load()
+        self.progress.suspend()
+        self.progress = progress
+        self.profile = name
+        if self._stats is not None:
+            self._stats.reset(progress)
+        for subscriber in self._profile_subscribers:
+            subscriber(name)
+
+    def subscribe_profile(self, subscriber):
+        self._profile_subscribers.append(subscriber)
+
+    def unsubscribe_profile(self, subscriber):
+        self._profile_subscribers.remove(subscriber)
+
+    def close(self):
+        # closes every profile even if writing one failed, then raises a
+        # WriterError naming every failure
+        errors = []
+        for progress in self._profiles.values():
+            try:
+                progress.close()
+            except founddb.WriterError as e:
+                errors.append(e)
+        if errors:
+            raise founddb.WriterError('\n'.join(str(e) for e in errors)) from errors[0]
+
+
+_tracker: GrailTracker | None = None
+
+
+def tracker() -> GrailTracker:
+    # default tracker used by the app, nothing is loaded until it is used
+    global _tracker
+    if _tracker is None:
+        _tracker = GrailTracker()
+    return _tracker
+
+
+def set_tracker(new_tracker: GrailTracker):
+    global _tracker
+    _tracker = new_tracker
+
+
+def search(query: str, limit: int | None = None, fuzzy: bool = False) -> SearchResults:
+    return tracker().search(query, limit, fuzzy)
 
-_FOUND_ITEMS_IDS: set[int] = set()
 
 def mark_found(item_id: int):
-    dt = datetime.datetime.now()
-    _FOUND_ITEMS_IDS.add(item_id)
-    with open('found.db', 'a') as f:
-        f.write(f'A,{item_id},{dt.isoformat()}\n')
+    tracker().mark_found(item_id)
+
 
 def mark_missing(item_id: int):
-    _FOUND_ITEMS_IDS.remove(item_id)
-    with open('found.db', 'a') as f:
-        f.write(f'R,{item_id}\n')
-
-
-# def deduplicate_todo(item_id: int):
-#     _FOUND_ITEMS_IDS.remove(item_id)
-    
-#     temp_file = 'found_temp.db'
-#     with open('found.db', 'r') as original, open(temp_file, 'w') as temp:
-#         for line in original:
-#             if not line.startswith(f'{item_id},'):
-#                 temp.write(line)
-    
-#     os.replace(temp_file, 'found.db')
-
-CURRENT_FOUND_DB_VERSION = '1'
-def load_found():
-    with open('found.db') as f:
-        header_line = f.readline()
-        prefix, version, _ = header_line.split(',')
-        # _ is UUID. identifier for a future feature that would be awkward to add later.
-        # version is also just future proofing the file format 
-        if prefix != 'H' or version != CURRENT_FOUND_DB_VERSION:
-            raise AssertionError('found.db file corrupted')
-        for line in f.readlines():
-            action, item_id_str, *_ = line.strip().split(',')
-            if action == 'A':
-                _FOUND_ITEMS_IDS.add(int(item_id_str))
-            else:
-                _FOUND_ITEMS_IDS.remove(int(item_id_str))
+    tracker().mark_missing(item_id)
 
 
-def ensure_found_file():
-    found_file = pathlib.Path('found.db')
-    if not found_file.is_file():
-        with open('found.db', 'w') as f:
-            f.write(f'H,{CURRENT_FOUND_DB_VERSION},{uuid.uuid4()}')
-            pass
+def switch_profile(name: str):
+    tracker().switch_profile(name)
 
 
-ensure_found_file()
-load_found()
+def close_found():
+    if _tracker is not None:
+        _tracker.close()
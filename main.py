@@ -1,7 +1,10 @@
+import contextlib
+import functools
 import sys
+import time
 from pathlib import Path
 
-from PySide6 import QtCore
+from PySide6 import QtCore, QtGui, QtWidgets
 from PySide6.QtWidgets import (
     QApplication,
     QSystemTrayIcon,
@@ -10,11 +13,9 @@ from PySide6.QtWidgets import (
     QLabel,
     QVBoxLayout,
     QHBoxLayout,
-    QFormLayout,
     QLineEdit,
     QLayout,
     QAbstractButton,
-    QCheckBox,
     QSizePolicy,
 )
 from PySide6.QtGui import (
@@ -26,14 +27,38 @@ from PySide6.QtGui import (
     QFontDatabase, 
     QColor, 
     QPainter, 
-    QPixmap, 
-    QTransform, 
-    QCursor,
 )
 
+import catalogs
+import founddb
+import instrument
 import items
+import savewatch
+import sprites
 import win
 
+FONT_FAMILY = 'ExocetBlizzardMixedCapsOTMedium'
+# (r, g, b) of item text, keyed like items.ProgressStats
+ITEM_COLORS = {
+    items.Rarity.UNIQUE: (199, 179, 119),
+    items.Rarity.SET: (0, 255, 0),
+    items.Slot.RUNE: (175, 117, 5),
+}
+CRAFTED_COLOR = (255, 168, 0)
+INSTRUMENT_OUTPUT_PATH = 'instrument.jsonl'
+
+
+@functools.cache
+def font(size):
+    # one QFont per size shared by every widget, call after QApplication exists
+    return QFont(FONT_FAMILY, size)
+
+
+def label_style(color):
+    r, g, b = color
+    return f'QLabel {{ color: rgba({r}, {g}, {b}, 0.8); background-color: transparent; }}'
+
+
 class SystemTrayIcon(QSystemTrayIcon):
     def __init__(self, icon, parent=None):
         super().__init__(icon, parent)
@@ -42,16 +67,52 @@ class SystemTrayIcon(QSystemTrayIcon):
         exitAction = menu.addAction('Exit')
         self.setContextMenu(menu)
         QtCore.QObject.connect(exitAction, QtCore.SIGNAL('triggered()'), self.exit)
+        self.exit_action = exitAction
+
+    def add_toggle(self, text, toggled):
+        # checkable entry above Exit, toggled(checked) is called on every click
+        action = QtGui.QAction(text, self.contextMenu())
+        action.setCheckable(True)
+        action.toggled.connect(toggled)
+        self.contextMenu().insertAction(self.exit_action, action)
+        return action
+
+    def add_profiles_menu(self):
+        # Profile submenu above Exit, built when opened to show profiles added meanwhile
+        self.profiles_menu = QMenu('Profile', self.contextMenu())
+        self.profiles_menu.aboutToShow.connect(self._fill_profiles_menu)
+        self.contextMenu().insertMenu(self.exit_action, self.profiles_menu)
+
+    def _fill_profiles_menu(self):
+        tracker = items.tracker()
+        self.profiles_menu.clear()
+        group = QtGui.QActionGroup(self.profiles_menu)
+        for name in tracker.profile_names():
+            action = self.profiles_menu.addAction(name)
+            action.setCheckable(True)
+            action.setChecked(name == tracker.profile)
+            group.addAction(action)
+            action.triggered.connect(lambda checked=False, name=name: items.switch_profile(name))
+        self.profiles_menu.addSeparator()
+        self.profiles_menu.addAction('New profile...').triggered.connect(self._new_profile)
+
+    def _new_profile(self):
+        name, ok = QtWidgets.QInputDialog.getText(None, 'New profile', 'Profile name:')
+        if not ok or not name.strip():
+            return
+        try:
+            items.switch_profile(name.strip())
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(None, 'New profile', str(e))
 
     def exit(self):
-        QtCore.QCoreApplication.exit()
-
-class HandCursor(QCursor):
-    def __init__(self):
-        p = QPixmap(str(Path(__file__).parent / 'assets' / 'ppress.sprite.01.png')).transformed(QTransform().fromScale(0.68, 0.68))
-        super().__init__(p, hotX=3, hotY=10)
-
-
+        # write out progress still queued for found.db
+        try:
+            items.close_found()
+        except founddb.WriterError as e:
+            QtWidgets.QMessageBox.critical(None, 'Exit', f'Progress could not be saved:\n{e}')
+        finally:
+            QtCore.QCoreApplication.exit()
 
 class ListOverlayWindow(QWidget):
     DEFAULT_STATE =  (
@@ -65,9 +126,11 @@ class ListOverlayWindow(QWidget):
         | QtCore.Qt.FramelessWindowHint
         | QtCore.Qt.Tool
     )
+    HUD_REFRESH_MS = 500
+
     def __init__(self):
         super().__init__()
-        self.setCursor(HandCursor())
+        self.setCursor(sprites.hand_cursor())
         # palette = QPalette()
         # palette.setColor(QPalette.ColorRole.Window, QColor(0, 0, 0, 100))
         # self.setPalette(palette)
@@ -83,61 +146,75 @@ class ListOverlayWindow(QWidget):
         self.setWindowFlags(self.DEFAULT_STATE)
         
         self.uniques_label = QLabel('')
-        self.uniques_label.setFont(QFont('ExocetBlizzardMixedCapsOTMedium', 15))
-        self.uniques_label.setStyleSheet(
-            'QLabel { color: rgba(199, 179, 119, 0.8); background-color: transparent; }'
-        )
+        self.uniques_label.setFont(font(15))
+        self.uniques_label.setStyleSheet(label_style(ITEM_COLORS[items.Rarity.UNIQUE]))
         self.vlayout.addWidget(self.uniques_label)
 
         self.sets_label = QLabel('')
-        self.sets_label.setFont(QFont('ExocetBlizzardMixedCapsOTMedium', 15))
-        self.sets_label.setStyleSheet(
-            'QLabel { color: rgba(0, 255, 0, 0.8); background-color: transparent; }'
-        )
+        self.sets_label.setFont(font(15))
+        self.sets_label.setStyleSheet(label_style(ITEM_COLORS[items.Rarity.SET]))
         self.vlayout.addWidget(self.sets_label)
 
         self.runes_label = QLabel('')
-        self.runes_label.setFont(QFont('ExocetBlizzardMixedCapsOTMedium', 15))
-        self.runes_label.setStyleSheet(
-            'QLabel { color: rgba(175, 117, 5, 0.8); background-color: transparent; }'
-        )
+        self.runes_label.setFont(font(15))
+        self.runes_label.setStyleSheet(label_style(ITEM_COLORS[items.Slot.RUNE]))
         self.vlayout.addWidget(self.runes_label)
 
+        # {stats key: (label, name, padding)}, padding is tuned to the font
+        self.stats_labels = {
+            items.Rarity.UNIQUE: (self.uniques_label, 'Uniques', 12),
+            items.Rarity.SET: (self.sets_label, 'Sets', 7),
+            items.Slot.RUNE: (self.runes_label, 'Runes', 9),
+        }
+        self.stats = items.tracker().stats
+        self.stats.subscribe(self.update_stats)
         self.set_stats()
-    
-    def show(self):
-        self.set_stats()
-        super().show()
-    
+
+        # instrument timings, toggled from the tray menu
+        self.hud_label = QLabel('')
+        hud_font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
+        hud_font.setPointSize(8)
+        self.hud_label.setFont(hud_font)
+        self.hud_label.setStyleSheet(label_style((255, 255, 255)))
+        self.hud_label.setVisible(False)
+        self.vlayout.addWidget(self.hud_label)
+        self._hud_timer = QtCore.QTimer(self)
+        self._hud_timer.setInterval(self.HUD_REFRESH_MS)
+        self._hud_timer.timeout.connect(self.update_hud)
+        # the HUD turned instrumenting on, --instrument keeps it on when hidden
+        self._hud_enabled_instrument = False
+
     def set_stats(self):
-        uniques = 0
-        found_uniques = 0
-        sets = 0
-        found_sets = 0
-        runes = 0
-        found_runes = 0
-        for item in items._ITEMS:
-            if item.rarity == items.Rarity.UNIQUE:
-                uniques += 1
-                if item.id in items._FOUND_ITEMS_IDS:
-                    found_uniques += 1
-            elif item.rarity == items.Rarity.SET:
-                sets += 1
-                if item.id in items._FOUND_ITEMS_IDS:
-                    found_sets += 1
-            elif item.slot == items.Slot.RUNE:
-                runes += 1
-                if item.id in items._FOUND_ITEMS_IDS:
-                    found_runes += 1
-        uniqes_stats = f'[{found_uniques}/{uniques}][{int(found_uniques/uniques*100)}%]'
-        self.uniques_label.setText(f'[+] Uniques {"":>{27-12-len(uniqes_stats)}}{uniqes_stats}')
-
-        sets_stats = f'[{found_sets}/{sets}][{int(found_sets/sets*100)}%]'
-        self.sets_label.setText(f'[+] Sets {"":>{27-7-len(uniqes_stats)}}{sets_stats}')
-
-        runes_stats = f'[{found_runes}/{runes}][{int(found_runes/runes*100)}%]'
-        self.runes_label.setText(f'[+] Runes {"":>{27-9-len(runes_stats)}}{runes_stats}')
+        self.update_stats(self.stats_labels.keys())
 
+    def toggle_hud(self, visible):
+        if visible:
+            if not instrument.enabled():
+                instrument.enable()
+                self._hud_enabled_instrument = True
+            self.update_hud()
+            self._hud_timer.start()
+        else:
+            self._hud_timer.stop()
+            if self._hud_enabled_instrument:
+                instrument.disable()
+                self._hud_enabled_instrument = False
+        self.hud_label.setVisible(visible)
+
+    def update_hud(self):
+        self.hud_label.setText(instrument.format_hud())
+
+    @instrument.timed('overlay.update_stats')
+    def update_stats(self, keys):
+        # only labels whose counters changed are repainted
+        for key in keys:
+            if key not in self.stats_labels:
+                continue
+            label, name, padding = self.stats_labels[key]
+            found = self.stats.found[key]
+            total = self.stats.totals[key]
+            stats = f'[{found}/{total}][{int(found/total*100)}%]'
+            label.setText(f'[+] {name} {"":>{27-padding-len(stats)}}{stats}')
 
     def toggle_locked(self):
         visible = self.isVisible()
@@ -155,9 +232,8 @@ class ListOverlayWindow(QWidget):
 class PictureButton(QAbstractButton):
     def __init__(self, parent):
         super().__init__(parent)
-        _mirror_tranform = QTransform().scale(-1, 1)
-        self.default_picture = QPixmap(str(Path(__file__).parent / 'assets' / 'advancedstatsbutton.sprite.00.png')).transformed(_mirror_tranform)
-        self.press_picture = QPixmap(str(Path(__file__).parent / 'assets' / 'advancedstatsbutton.sprite.01.png')).transformed(_mirror_tranform)
+        self.default_picture = sprites.pixmap('advancedstatsbutton.sprite.00.png', mirror=True)
+        self.press_picture = sprites.pixmap('advancedstatsbutton.sprite.01.png', mirror=True)
         self.setPicture(self.default_picture)
         self.pressed.connect(self._mouse_press)
         self.released.connect(self._mouse_release)
@@ -184,9 +260,9 @@ class ListLockButton(QAbstractButton):
     def __init__(self, parent):
         super().__init__(parent)
         self._locked = True
-        self.locked_picture = QPixmap(str(Path(__file__).parent / 'assets' / 'lootbody.sprite.00.png'))
-        self.pressed_picture = QPixmap(str(Path(__file__).parent / 'assets' / 'lootbody.sprite.01.png'))
-        self.unlocked_picture = QPixmap(str(Path(__file__).parent / 'assets' / 'lootbody.sprite.02.png'))
+        self.locked_picture = sprites.pixmap('lootbody.sprite.00.png')
+        self.pressed_picture = sprites.pixmap('lootbody.sprite.01.png')
+        self.unlocked_picture = sprites.pixmap('lootbody.sprite.02.png')
         self._default_picture = self.locked_picture
         self.setPicture(self.locked_picture)
         self.pressed.connect(self._mouse_press)
@@ -227,7 +303,7 @@ class ButtonWindow(QWidget):
         self.list_window_locked = True
 
         self.search_button = PictureButton(self)
-        self.setCursor(HandCursor())
+        self.setCursor(sprites.hand_cursor())
         # self.setFixedSize(self.search_button.sizeHint())
         self.setAttribute(QtCore.Qt.WA_TranslucentBackground, True)
         self.setWindowFlags(
@@ -238,7 +314,7 @@ class ButtonWindow(QWidget):
         self.search_button.clicked.connect(toggle_windows)
 
         self.list_button = ListLockButton(self)
-        self.setCursor(HandCursor())
+        self.setCursor(sprites.hand_cursor())
         self.setAttribute(QtCore.Qt.WA_TranslucentBackground, True)
         self.setWindowFlags(
             QtCore.Qt.WindowStaysOnTopHint
@@ -252,35 +328,233 @@ class ButtonWindow(QWidget):
         self.hlayout.addWidget(self.search_button)
         self.hlayout.addWidget(self.list_button)
 
-class ItemCheckbox(QCheckBox):
-    def __init__(self, item_id=None):
-        super().__init__()
-        self.item_id = item_id
-        self.clicked.connect(self.mark_item)
+class ItemResultsModel(QtCore.QAbstractListModel):
+    ItemRole = QtCore.Qt.UserRole + 1
 
-    def mark_item(self, checked: bool):
-        if self.item_id is None:
-            return
-        
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._items = []
+        # {item id: row}
+        self._rows = {}
+        # repaint checkboxes when progress changes from anywhere
+        self._progress = items.tracker().progress
+        self._progress.subscribe(self._item_changed)
+        items.tracker().subscribe_profile(self._profile_switched)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._items)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self._items[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return f'{item.name} - {item.base}'
+        if role == QtCore.Qt.CheckStateRole:
+            if item.id in items.tracker().found_ids:
+                return QtCore.Qt.Checked
+            return QtCore.Qt.Unchecked
+        if role == self.ItemRole:
+            return item
+        return None
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsUserCheckable
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if role != QtCore.Qt.CheckStateRole or not index.isValid():
+            return False
+        item = self._items[index.row()]
+        # marking notifies _item_changed which repaints the row
+        if QtCore.Qt.CheckState(value) == QtCore.Qt.Checked:
+            items.mark_found(item.id)
+        else:
+            items.mark_missing(item.id)
+        return True
+
+    def _profile_switched(self, name):
+        self._progress.unsubscribe(self._item_changed)
+        self._progress = items.tracker().progress
+        self._progress.subscribe(self._item_changed)
+        if self._items:
+            self.dataChanged.emit(
+                self.index(0), self.index(len(self._items) - 1), [QtCore.Qt.CheckStateRole]
+            )
+
+    def _item_changed(self, item_id, found):
+        row = self._rows.get(item_id)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [QtCore.Qt.CheckStateRole])
+
+    def set_items(self, new_items):
+        # replaces rows with the smallest change, rows that stay the same
+        # are not repainted and the view keeps its scroll position
+        old_ids = [item.id for item in self._items]
+        new_ids = [item.id for item in new_items]
+        prefix = 0
+        while prefix < min(len(old_ids), len(new_ids)) and old_ids[prefix] == new_ids[prefix]:
+            prefix += 1
+        suffix = 0
+        while (
+            suffix < min(len(old_ids), len(new_ids)) - prefix
+            and old_ids[-1 - suffix] == new_ids[-1 - suffix]
+        ):
+            suffix += 1
+        old_middle = len(old_ids) - prefix - suffix
+        new_middle = len(new_ids) - prefix - suffix
+        common = min(old_middle, new_middle)
+
+        self._items[prefix : prefix + common] = new_items[prefix : prefix + common]
+        # only repaint runs of rows whose item changed
+        run_start = None
+        for row in range(prefix, prefix + common + 1):
+            changed = row < prefix + common and old_ids[row] != new_ids[row]
+            if changed and run_start is None:
+                run_start = row
+            elif not changed and run_start is not None:
+                self.dataChanged.emit(self.index(run_start), self.index(row - 1))
+                run_start = None
+
+        if new_middle > common:
+            first = prefix + common
+            self.beginInsertRows(QtCore.QModelIndex(), first, prefix + new_middle - 1)
+            self._items[first:first] = new_items[first : prefix + new_middle]
+            self.endInsertRows()
+        elif old_middle > common:
+            first = prefix + common
+            self.beginRemoveRows(QtCore.QModelIndex(), first, prefix + old_middle - 1)
+            del self._items[first : prefix + old_middle]
+            self.endRemoveRows()
+        self._rows = {item.id: row for row, item in enumerate(self._items)}
+
+
+class RowStyle:
+    # pens and brushes of one item color, built once and shared by every row
+    def __init__(self, color):
+        self.checked_brush = QtGui.QBrush(QColor(*color))
+        self.pen = QtGui.QPen(QColor(*color, int(255 * 0.8)))
+
+
+class ItemResultDelegate(QtWidgets.QStyledItemDelegate):
+    CHECKBOX_WIDTH = 20
+    CHECKBOX_HEIGHT = 18
+    SPACING = 8
+    ROW_PADDING = 4
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.font = font(20)
+        self.metrics = QtGui.QFontMetrics(self.font)
+        self.row_height = max(self.metrics.height(), self.CHECKBOX_HEIGHT) + self.ROW_PADDING
+        self.styles = {key: RowStyle(color) for key, color in ITEM_COLORS.items()}
+
+    def style(self, item):
+        # runes are the only items that are neither unique nor set
+        return self.styles.get(item.rarity) or self.styles[items.Slot.RUNE]
+
+    def checkbox_rect(self, option):
+        rect = option.rect
+        return QtCore.QRect(
+            rect.left() + 1,
+            rect.top() + (rect.height() - self.CHECKBOX_HEIGHT) // 2,
+            self.CHECKBOX_WIDTH,
+            self.CHECKBOX_HEIGHT,
+        )
+
+    def sizeHint(self, option, index):
+        width = (
+            self.CHECKBOX_WIDTH
+            + self.SPACING
+            + self.metrics.horizontalAdvance(index.data(QtCore.Qt.DisplayRole))
+        )
+        return QtCore.QSize(width, self.row_height)
+
+    def paint(self, painter, option, index):
+        item = index.data(ItemResultsModel.ItemRole)
+        checked = index.data(QtCore.Qt.CheckStateRole) == QtCore.Qt.Checked
+        style = self.style(item)
+
+        painter.save()
+        checkbox = self.checkbox_rect(option)
         if checked:
-            items.mark_found(self.item_id)
+            painter.fillRect(checkbox, style.checked_brush)
         else:
-            items.mark_missing(self.item_id)
+            painter.setPen(style.pen)
+            painter.drawRect(checkbox.adjusted(0, 0, -1, -1))
+
+        text_rect = option.rect.adjusted(self.CHECKBOX_WIDTH + self.SPACING, 0, 0, 0)
+        painter.setFont(self.font)
+        painter.setPen(style.pen)
+        painter.drawText(
+            text_rect,
+            QtCore.Qt.AlignVCenter | QtCore.Qt.AlignLeft,
+            index.data(QtCore.Qt.DisplayRole),
+        )
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        # toggle when the checkbox is clicked
+        if (
+            event.type() == QtCore.QEvent.MouseButtonRelease
+            and event.button() == QtCore.Qt.LeftButton
+            and self.checkbox_rect(option).contains(event.position().toPoint())
+        ):
+            checked = index.data(QtCore.Qt.CheckStateRole) == QtCore.Qt.Checked
+            new_state = QtCore.Qt.Unchecked if checked else QtCore.Qt.Checked
+            return model.setData(index, new_state, QtCore.Qt.CheckStateRole)
+        return False
+
+
+class SaveWatchSignals(QtCore.QObject):
+    # ids of items found in save files, emitted by the watcher thread
+    found = QtCore.Signal(object)
+
+
+class CatalogWatchSignals(QtCore.QObject):
+    # layers read by the catalog watcher thread, see catalogs.LayerScanner.scan
+    changed = QtCore.Signal(object)
+
+
+class SearchSignals(QtCore.QObject):
+    # generation, items.SearchResults
+    finished = QtCore.Signal(int, object)
+
+
+class SearchTask(QtCore.QRunnable):
+    def __init__(self, session, query, limit, generation, latest_generation, signals):
+        super().__init__()
+        self.session = session
+        self.query = query
+        self.limit = limit
+        self.generation = generation
+        self.latest_generation = latest_generation
+        self.signals = signals
+
+    def run(self):
+        # user kept typing while this task was waiting in the pool
+        if self.generation != self.latest_generation():
+            return
+        results = self.session.search(self.query, limit=self.limit)
+        self.signals.finished.emit(self.generation, results)
 
 
 class SearchWindow(QWidget):
-    ITEM_RESULTS_LIMIT = 15
+    # results are ranked, the list only paints rows that are scrolled into view
+    ITEM_RESULTS_LIMIT = 5000
+    VISIBLE_ROWS = 15
+    # keystrokes closer together than this are searched only once
+    SEARCH_DEBOUNCE_MS = 60
 
     def __init__(self):
         super().__init__()
-        self.setCursor(HandCursor())
+        self.setCursor(sprites.hand_cursor())
         self.setStyleSheet('background-color: rgba(0, 0, 0, 0.6);')
         self.vlayout = QVBoxLayout()
         self.setLayout(self.vlayout)
-        self.flayout = QFormLayout()
         self.search_bar = QLineEdit()
         self.search_bar.setMinimumWidth(665)  # TODO: why doesn't this work on window
-        self.search_bar.setFont(QFont('ExocetBlizzardMixedCapsOTMedium', 20))
+        self.search_bar.setFont(font(20))
         self.search_bar.setStyleSheet(
             '''
             QLineEdit { 
@@ -294,9 +568,45 @@ class SearchWindow(QWidget):
             }
             '''
         )
+        self.search_session = items.tracker().search_session(fuzzy=True)
+        items.tracker().subscribe_profile(self._profile_switched)
+        items.tracker().catalog.subscribe(self._catalog_changed)
+        # only results of the latest query are shown, older ones are dropped
+        self._search_generation = 0
+        self._keystroke_time = 0.0
+        # single thread, SearchSession is not thread safe
+        self._search_pool = QtCore.QThreadPool(self)
+        self._search_pool.setMaxThreadCount(1)
+        self._search_signals = SearchSignals(self)
+        self._search_signals.finished.connect(self._show_results)
+        self._debounce_timer = QtCore.QTimer(self)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self._debounce_timer.timeout.connect(self._start_search)
         self.search_bar.textChanged.connect(self.search)
         self.vlayout.addWidget(self.search_bar)
-        self.vlayout.addLayout(self.flayout)
+
+        self.results_model = ItemResultsModel(self)
+        self.results_delegate = ItemResultDelegate(self)
+        self.results_view = QtWidgets.QListView()
+        self.results_view.setModel(self.results_model)
+        self.results_view.setItemDelegate(self.results_delegate)
+        # every row has the same height, lets the view skip measuring rows
+        self.results_view.setUniformItemSizes(True)
+        self.results_view.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.results_view.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.results_view.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.results_view.setFocusPolicy(QtCore.Qt.NoFocus)
+        self.results_view.setFrameShape(QtWidgets.QFrame.NoFrame)
+        self.results_view.setStyleSheet('QListView { background-color: transparent; }')
+        self.results_view.setVisible(False)
+        self.vlayout.addWidget(self.results_view)
+
+        self.truncated_label = QLabel('... results truncated ...')
+        self.truncated_label.setFont(font(20))
+        self.truncated_label.setStyleSheet(label_style(CRAFTED_COLOR))
+        self.truncated_label.setVisible(False)
+        self.vlayout.addWidget(self.truncated_label)
         # shrink window when removing items
         self.vlayout.setSizeConstraint(QLayout.SetFixedSize)
 
@@ -310,62 +620,57 @@ class SearchWindow(QWidget):
             | QtCore.Qt.Tool
         )
 
-        self.item_results_rows = []
-        for i in range(self.ITEM_RESULTS_LIMIT):
-            label = QLabel('TEST')
-            label.setFont(QFont('ExocetBlizzardMixedCapsOTMedium', 20))
-            checkbox = ItemCheckbox()
-            self.item_results_rows.append((checkbox, label,))
-            self.flayout.addRow(checkbox, label)
-            self.flayout.setRowVisible(i, False)
-        
-        label = QLabel('... results truncated ...')
-        label.setFont(QFont('ExocetBlizzardMixedCapsOTMedium', 20))
-        label.setStyleSheet(
-                'QLabel { color: rgba(255, 168, 0, 0.8); background-color: transparent; }'
-            )
-        self.flayout.addRow(label)
-        self.flayout.setRowVisible(self.ITEM_RESULTS_LIMIT, False)
-        
-
     def search(self):
-        for i in range(self.flayout.rowCount()):
-            self.flayout.setRowVisible(i, False)
-
-        search_text = self.search_bar.text()
-        if not search_text:
+        # supersede any running or queued search
+        self._keystroke_time = time.perf_counter()
+        self._search_generation += 1
+        self._search_pool.clear()
+        if not self.search_bar.text():
+            self._debounce_timer.stop()
+            self._set_results([], 0)
             return
-        
-        result_items = items.search(self.search_bar.text())
-        for i, item in enumerate(result_items[:self.ITEM_RESULTS_LIMIT]):
-            checkbox, label = self.item_results_rows[i]
-            if item.rarity == items.Rarity.UNIQUE:
-                color = '199, 179, 119'
-            elif item.rarity == items.Rarity.SET:
-                color = '0, 255, 0'
-            elif item.slot == items.Slot.RUNE:
-                # color = '255, 168, 0'  # crafted
-                color = '175, 117, 5'
-            label.setText(f'{item.name} - {item.base}')
-            label.setStyleSheet(
-                f'QLabel {{ color: rgba({color}, 0.8); background-color: transparent; }}'
-            )
-            checkbox.item_id = item.id
-            checkbox.setStyleSheet(
-                'QCheckBox::indicator { width: 20px; height: 18px;}'
-                f'QCheckBox::indicator::unchecked {{ border: 1px solid rgba({color}, 0.8); background: transparent; }}'
-                f'QCheckBox::indicator::checked {{ background: rgb({color}); }}'
+        self._debounce_timer.start()
+
+    def _profile_switched(self, name):
+        # found: filters and ranking depend on the profile
+        self.search_session.progress = items.tracker().progress
+        self.search()
+
+    def _catalog_changed(self, item_ids):
+        # shown items may have changed or be gone
+        self.search()
+
+    def _start_search(self):
+        self._search_pool.start(
+            SearchTask(
+                self.search_session,
+                self.search_bar.text(),
+                self.ITEM_RESULTS_LIMIT,
+                self._search_generation,
+                lambda: self._search_generation,
+                self._search_signals,
             )
-            if item.id in items._FOUND_ITEMS_IDS:
-                checkbox.setChecked(True)
-            else:
-                checkbox.setChecked(False)
-            self.flayout.setRowVisible(i, True)
-        
+        )
+
+    def _show_results(self, generation, result_items):
+        if generation != self._search_generation:
+            return
+        self._set_results(result_items, result_items.total)
+        # the newest keystroke until its results are in the list, debounce included
+        instrument.record(
+            'search_window.keystroke', (time.perf_counter() - self._keystroke_time) * 1000
+        )
+
+    @instrument.timed('search_window.set_results')
+    def _set_results(self, result_items, total):
+        self.results_model.set_items(list(result_items))
+        rows = min(len(result_items), self.VISIBLE_ROWS)
+        if rows:
+            self.results_view.setFixedHeight(self.results_delegate.row_height * rows)
+        self.results_view.setVisible(bool(rows))
         # show results truncated row
-        if len(result_items) >= self.ITEM_RESULTS_LIMIT:
-            self.flayout.setRowVisible(self.ITEM_RESULTS_LIMIT, True)
-    
+        self.truncated_label.setVisible(total > self.ITEM_RESULTS_LIMIT)
+
     def hide(self):
         self.search_bar.clear()
         super().hide()
@@ -379,49 +684,133 @@ class SearchWindow(QWidget):
         return super().keyPressEvent(event)
     
 
+def flag_value(argv, flag):
+    # None without the flag, '' for a bare --flag and value for --flag=value
+    for arg in argv:
+        if arg == flag or arg.startswith(f'{flag}='):
+            return arg.partition('=')[2]
+    return None
+
+
+class StartupProfile:
+    # --profile-startup: wall time of every startup phase, printed once the
+    # search window is prewarmed. --profile-startup=<path> writes it to a file
+    # instead, the bundled executable has no console
+    def __init__(self, argv):
+        output = flag_value(argv, '--profile-startup')
+        self.enabled = output is not None
+        self.output = output or None
+        self.started = time.perf_counter()
+        self.phases = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        yield
+        self.phases.append((name, time.perf_counter() - start))
+
+    def report(self):
+        if not self.enabled:
+            return
+        total = time.perf_counter() - self.started
+        lines = [f'{name:<28}{duration * 1000:>9.1f} ms' for name, duration in self.phases]
+        lines.append(f'{"total":<28}{total * 1000:>9.1f} ms')
+        if self.output:
+            Path(self.output).write_text('\n'.join(lines) + '\n')
+        else:
+            print('\n'.join(lines))
+
+
 def main():
-    app = QApplication(sys.argv)
-    QFontDatabase.addApplicationFont(
-        str(Path(__file__).parent / 'assets' / 'exocetblizzardot-medium.otf')
-    )
+    profile = StartupProfile(sys.argv[1:])
+    # --instrument[=path] dumps hot path timings as JSON lines, see instrument.py
+    instrument_output = flag_value(sys.argv[1:], '--instrument')
+    if instrument_output is not None:
+        instrument.enable()
+        instrument.start_dump(instrument_output or INSTRUMENT_OUTPUT_PATH)
+    # parse items.csv (or read its cache) while Qt sets up,
+    # the typo index is built later when the search window is prewarmed
+    catalog_loader = items.tracker().catalog.load_in_background()
+    with profile.phase('qt application'):
+        app = QApplication(sys.argv)
+    with profile.phase('font registration'):
+        QFontDatabase.addApplicationFont(
+            str(Path(__file__).parent / 'assets' / 'exocetblizzardot-medium.otf')
+        )
     app.setQuitOnLastWindowClosed(False)
 
-    trayIcon = SystemTrayIcon(QIcon(str(Path(__file__).parent / 'assets' / 'icon.png')))
-
-    trayIcon.show()
-    list_window = ListOverlayWindow()
-    list_window.show()
+    # overlay and tray first, they are what the user sees at startup
+    with profile.phase('tray icon'):
+        trayIcon = SystemTrayIcon(QIcon(sprites.pixmap('icon.png')))
+        trayIcon.show()
+    with profile.phase('catalog load (waiting)'):
+        catalog_loader.join()
+    with profile.phase('found.db replay'):
+        items.tracker().progress.load()
+    with profile.phase('list overlay window'):
+        list_window = ListOverlayWindow()
+        list_window.show()
+    trayIcon.add_toggle('Debug HUD', list_window.toggle_hud)
+    trayIcon.add_profiles_menu()
     screen_width, screen_height = list_window.screen().size().toTuple()
     x = screen_width - list_window.width()
     y = (screen_height - list_window.height()) / 2
     list_window.move(x, y)
 
-    search_window = SearchWindow()
-    search_window.move(screen_width - 670, y)
-
+    search_window = None
     show_list_window = True
+
+    def get_search_window():
+        # built on first use or when idle, whichever comes first
+        nonlocal search_window
+        if search_window is None:
+            with profile.phase('search window'):
+                search_window = SearchWindow()
+                search_window.move(screen_width - 670, y)
+                # TODO: figure out something to deal with this interconnected state
+                search_window.set_toggle_function(toggle_windows)
+            items.tracker().catalog.load_in_background(fuzzy=True)
+        return search_window
+
     def toggle_windows():
         nonlocal show_list_window
         if show_list_window:
             list_window.hide()
-            search_window.show()
+            get_search_window().show()
             search_window.activateWindow()
         else:
             search_window.hide()
             list_window.show()
             win.activate_d2_window()
         show_list_window = not show_list_window
-    
-    # TODO: figure out something to deal with this interconnected state
-    search_window.set_toggle_function(toggle_windows)
-
 
-
-    button_window = ButtonWindow(list_window, toggle_windows)
-    button_window.show()
+    with profile.phase('button window'):
+        button_window = ButtonWindow(list_window, toggle_windows)
+        button_window.show()
     button_window.move(x + list_window.width() - button_window.width(), y - button_window.height())
-    
 
+    save_watch_signals = SaveWatchSignals()
+    # queued to this thread, progress and the windows following it aren't thread safe
+    save_watch_signals.found.connect(items.tracker().mark_many, QtCore.Qt.QueuedConnection)
+    catalog_watch_signals = CatalogWatchSignals()
+    catalog_watch_signals.changed.connect(
+        functools.partial(catalogs.apply, items.tracker().catalog), QtCore.Qt.QueuedConnection
+    )
+
+    def prewarm():
+        get_search_window()
+        with profile.phase('profiles'):
+            items.tracker().load_profiles()
+        if savewatch.SAVE_DIR.is_dir():
+            savewatch.SaveWatcher(items.tracker().catalog, save_watch_signals.found.emit).start()
+        if catalogs.CATALOGS_DIR.is_dir():
+            catalogs.LayerWatcher(catalog_watch_signals.changed.emit).start()
+        profile.report()
+        if profile.enabled:
+            app.quit()
+
+    # runs once the event loop has painted the windows above
+    QtCore.QTimer.singleShot(0, prewarm)
     sys.exit(app.exec())
 
 
@@ -1,11 +1,27 @@
 # -*- mode: python ; coding: utf-8 -*-
+import sys
+
+sys.path.insert(0, SPECPATH)
+import items
+import sprites
+
+# ship the parsed catalog so the first start of the bundle doesn't parse items.csv
+items.Catalog().build_cache()
+# and every sprite in a single resource file
+sprites.build_resource()
 
 
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('assets/*', 'assets')],
+    datas=[
+        ('assets/items.csv', 'assets'),
+        ('assets/items.cache', 'assets'),
+        ('assets/save_items.csv', 'assets'),
+        ('assets/exocetblizzardot-medium.otf', 'assets'),
+        ('assets/sprites.rcc', 'assets'),
+    ],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,74 @@
+import os
+import threading
+
+# polling a directory for changed files, used for the save files (savewatch.py)
+# and the extra catalogs (catalogs.py)
+
+
+# the files ending in one of suffixes that are new, changed or deleted since
+# the last scan of a directory. a file changed if its mtime or size did
+class FileTracker:
+    def __init__(self, suffixes: tuple[str, ...]):
+        self.suffixes = suffixes
+        # {path: (mtime_ns, size)} when last scanned, None to scan it again
+        self._stats: dict[str, tuple[int, int] | None] = {}
+
+    def scan(self, directory) -> tuple[list[str], list[str]] | None:
+        # (changed paths, deleted paths), None if directory can't be listed
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return None
+        changed = []
+        paths = set()
+        for entry in entries:
+            if not entry.name.lower().endswith(self.suffixes) or not entry.is_file():
+                continue
+            paths.add(entry.path)
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if self._stats.get(entry.path) != (stat.st_mtime_ns, stat.st_size):
+                self._stats[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                changed.append(entry.path)
+        deleted = list(self._stats.keys() - paths)
+        for path in deleted:
+            del self._stats[path]
+        return changed, deleted
+
+    def retry(self, path: str):
+        # path is scanned again next time even if it doesn't change, e.g. it
+        # was being written
+        self._stats[path] = None
+
+    def clear(self) -> list[str]:
+        # forgets every file, returns their paths
+        paths = list(self._stats)
+        self._stats.clear()
+        return paths
+
+
+# calls scanner.scan(directory) every interval seconds and on_change with what
+# it returns unless that is empty. both run on this thread, the GUI has to hand
+# on_change over to the Qt thread
+class PollingWatcher(threading.Thread):
+    def __init__(self, name: str, scanner, on_change, directory, interval: float):
+        super().__init__(name=name, daemon=True)
+        self.scanner = scanner
+        self.on_change = on_change
+        self.directory = directory
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while True:
+            changes = self.scanner.scan(self.directory)
+            if changes:
+                self.on_change(changes)
+            if self._stop_event.wait(self.interval):
+                break
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
@@ -0,0 +1,524 @@
+import collections
+import csv
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+
+import instrument
+import items
+import pollwatch
+
+# Diablo II: Resurrected characters (.d2s) and shared stashes (.d2i)
+SAVE_DIR = Path.home() / 'Saved Games' / 'Diablo II Resurrected'
+SAVE_SUFFIXES = ('.d2s', '.d2i')
+POLL_INTERVAL = 2.0  # seconds between scans of SAVE_DIR
+SAVE_MAGIC = b'\x55\xaa\x55\xaa'
+# item codes are huffman coded since D2R (save version 0x61), older saves aren't read
+MIN_VERSION = 0x61
+# every .d2i section (stash tab) starts with a header of this size:
+# magic, hardcore, version, gold, section size, reserved
+STASH_HEADER_SIZE = 64
+ITEM_LIST_MARKER = b'JM'
+# .d2s mercenary items follow 'jf', an iron golem item 'kf' and a byte
+MERC_MARKER = b'jf'
+GOLEM_MARKER = b'kf'
+
+# D2R item code characters, bits in the order they are read
+HUFFMAN_CODES = {
+    ' ': '10',
+    '0': '11111011',
+    '1': '1111100',
+    '2': '001100',
+    '3': '1101101',
+    '4': '11111010',
+    '5': '00010110',
+    '6': '1101111',
+    '7': '01111',
+    '8': '000100',
+    '9': '01110',
+    'a': '11110',
+    'b': '0101',
+    'c': '01000',
+    'd': '110001',
+    'e': '110000',
+    'f': '010011',
+    'g': '11010',
+    'h': '00011',
+    'i': '1111110',
+    'j': '000101110',
+    'k': '010010',
+    'l': '11101',
+    'm': '01101',
+    'n': '001101',
+    'o': '1111111',
+    'p': '11001',
+    'q': '11011001',
+    'r': '11100',
+    's': '0010',
+    't': '01100',
+    'u': '00001',
+    'v': '1101110',
+    'w': '00000',
+    'x': '00111',
+    'y': '0001010',
+    'z': '11011000',
+}
+
+# unique and set items by their UniqueItems.txt/SetItems.txt row, with their item code
+SAVE_ITEMS_PATH = Path(__file__).parent / 'assets' / 'save_items.csv'
+
+# bits of the item flags
+FLAG_SOCKETED = 11
+FLAG_EAR = 16
+FLAG_SIMPLE = 21
+FLAG_PERSONALIZED = 24
+FLAG_RUNEWORD = 26
+
+# item qualities of extended items
+QUALITY_LOW = 1
+QUALITY_SUPERIOR = 3
+QUALITY_MAGIC = 4
+QUALITY_SET = 5
+QUALITY_RARE = 6
+QUALITY_UNIQUE = 7
+QUALITY_CRAFTED = 8
+# bits following the quality: prefix and suffix of magic items, row of
+# UniqueItems.txt/SetItems.txt. rare and crafted items are read on their own
+QUALITY_BITS = {
+    QUALITY_LOW: 3,
+    QUALITY_SUPERIOR: 3,
+    QUALITY_MAGIC: 11 + 11,
+    QUALITY_SET: 12,
+    QUALITY_UNIQUE: 12,
+}
+
+# rune item codes are r01 (El) to r33 (Zod)
+RUNE_NAMES = [
+    'El', 'Eld', 'Tir', 'Nef', 'Eth', 'Ith', 'Tal', 'Ral', 'Ort', 'Thul', 'Amn',
+    'Sol', 'Shael', 'Dol', 'Hel', 'Io', 'Lum', 'Ko', 'Fal', 'Lem', 'Pul', 'Um',
+    'Mal', 'Ist', 'Gul', 'Vex', 'Ohm', 'Lo', 'Sur', 'Ber', 'Jah', 'Cham', 'Zod',
+]
+
+# codes of armor.txt (defense and durability are saved) and weapons.txt
+# (durability is saved), anything else is a misc item
+ARMOR_CODES = frozenset(
+    '''
+    cap skp hlm fhl ghm crn msk bhm xap xkp xlm xhl xhm xrn xsk xh9 uap ukp ulm uhl uhm
+    urn usk uh9 ci0 ci1 ci2 ci3 qui lea hla stu rng scl chn brs spl plt fld gth ful aar
+    ltp xui xea xla xtu xng xcl xhn xrs xpl xlt xld xth xul xar xtp uui uea ula utu ung
+    ucl uhn urs upl ult uld uth uul uar utp buc sml lrg kit tow gts bsh spk xuc xml xrg
+    xit xow xts xsh xpk uuc uml urg uit uow uts ush upk lgl vgl mgl tgl hgl xlg xvg xmg
+    xtg xhg ulg uvg umg utg uhg lbt vbt mbt tbt hbt xlb xvb xmb xtb xhb ulb uvb umb utb
+    uhb lbl vbl mbl tbl hbl zlb zvb zmb ztb zhb ulc uvc umc utc uhc dr1 dr2 dr3 dr4 dr5
+    dr6 dr7 dr8 dr9 dra drb drc drd dre drf ba1 ba2 ba3 ba4 ba5 ba6 ba7 ba8 ba9 baa bab
+    bac bad bae baf pa1 pa2 pa3 pa4 pa5 pa6 pa7 pa8 pa9 paa pab pac pad pae paf ne1 ne2
+    ne3 ne4 ne5 ne6 ne7 ne8 ne9 nea neb nec ned nee nef
+    '''.split()
+)
+WEAPON_CODES = frozenset(
+    '''
+    hax axe 2ax mpi wax lax bax btx gax gix 9ha 9ax 92a 9mp 9wa 9la 9ba 9bt 9ga 9gi 7ha
+    7ax 72a 7mp 7wa 7la 7ba 7bt 7ga 7gi wnd ywn bwn gwn 9wn 9yw 9bw 9gw 7wn 7yw 7bw 7gw
+    clb spc 9cl 9sp 7cl 7sp scp gsc wsp 9sc 9qs 9ws 7sc 7qs 7ws mac mst fla 9ma 9mt 9fl
+    7ma 7mt 7fl whm mau gma 9wh 9m9 9gm 7wh 7m7 7gm ssd scm sbr flc crs bsd lsd wsd 2hs
+    clm gis bsw flb gsd 9ss 9sm 9sb 9fc 9cr 9bs 9ls 9wd 92h 9cm 9gs 9b9 9fb 9gd 7ss 7sm
+    7sb 7fc 7cr 7bs 7ls 7wd 72h 7cm 7gs 7b7 7fb 7gd dgr dir kri bld 9dg 9di 9kr 9bl 7dg
+    7di 7kr 7bl tkf tax bkf bal 9tk 9ta 9bk 9b8 7tk 7ta 7bk 7b8 jav pil ssp glv tsp 9ja
+    9pi 9s9 9gl 9ts 7ja 7pi 7s7 7gl 7ts spr tri brn spt pik 9sr 9tr 9br 9st 9p9 7sr 7tr
+    7br 7st 7p7 bar vou scy pax hal wsc 9b7 9vo 9s8 9pa 9h9 9wc 7o7 7vo 7s8 7pa 7h7 7wc
+    sst lst cst bst wst 8ss 8ls 8cs 8bs 8ws 6ss 6ls 6cs 6bs 6ws sbw hbw lbw cbw sbb lbb
+    swb lwb 8sb 8hb 8lb 8cb 8s8 8l8 8sw 8lw 6sb 6hb 6lb 6cb 6s7 6l7 6sw 6lw lxb mxb hxb
+    rxb 8lx 8mx 8hx 8rx 6lx 6mx 6hx 6rx ktr wrb axf ces clw btl skr 9ar 9wb 9xf 9cs 9lw
+    9tw 9qr 7ar 7wb 7xf 7cs 7lw 7tw 7qr ob1 ob2 ob3 ob4 ob5 ob6 ob7 ob8 ob9 oba obb obc
+    obd obe obf am1 am2 am3 am4 am5 am6 am7 am8 am9 ama amb amc amd ame amf
+    leg hdm hfh hst msf qf1 qf2 g33 d33
+    '''.split()
+)
+# items with a quantity: throwing weapons, javelins, quivers, keys, tomes, throwing potions
+STACKABLE_CODES = frozenset(
+    '''
+    tkf tax bkf bal 9tk 9ta 9bk 9b8 7tk 7ta 7bk 7b8 jav pil ssp glv tsp 9ja 9pi 9s9 9gl
+    9ts 7ja 7pi 7s7 7gl 7ts am5 ama amf aqv cqv key tbk ibk gps ops gpm opm gpl opl
+    '''.split()
+)
+TOME_CODES = ('tbk', 'ibk')
+
+# ItemStatCost.txt: {stat id: (save bits, save param bits)} of the stats items have
+STAT_BITS = {
+    0: (8, 0), 1: (7, 0), 2: (7, 0), 3: (7, 0), 7: (9, 0), 9: (8, 0), 11: (8, 0),
+    16: (9, 0), 17: (9, 0), 18: (9, 0), 19: (10, 0), 20: (6, 0), 21: (6, 0), 22: (7, 0),
+    23: (6, 0), 24: (7, 0), 25: (8, 0), 26: (8, 0), 27: (8, 0), 28: (8, 0), 31: (11, 0),
+    32: (9, 0), 33: (8, 0), 34: (6, 0), 35: (6, 0), 36: (8, 0), 37: (8, 0), 38: (5, 0),
+    39: (8, 0), 40: (5, 0), 41: (8, 0), 42: (5, 0), 43: (8, 0), 44: (5, 0), 45: (8, 0),
+    46: (5, 0), 48: (8, 0), 49: (9, 0), 50: (6, 0), 51: (10, 0), 52: (8, 0), 53: (9, 0),
+    54: (8, 0), 55: (9, 0), 56: (8, 0), 57: (10, 0), 58: (10, 0), 59: (9, 0), 60: (7, 0),
+    62: (7, 0), 67: (7, 0), 68: (7, 0), 73: (8, 0), 74: (6, 0), 75: (7, 0), 76: (6, 0),
+    77: (6, 0), 78: (7, 0), 79: (9, 0), 80: (8, 0), 81: (7, 0), 82: (10, 0), 83: (3, 3),
+    85: (9, 0), 86: (7, 0), 87: (7, 0), 88: (1, 0), 89: (4, 0), 90: (24, 0), 91: (8, 0),
+    92: (7, 0), 93: (7, 0), 94: (7, 0), 96: (7, 0), 97: (7, 9), 98: (1, 8), 99: (7, 0),
+    102: (7, 0), 105: (7, 0), 107: (3, 9), 108: (1, 0), 109: (9, 0), 110: (8, 0),
+    111: (9, 0), 112: (7, 0), 113: (7, 0), 114: (6, 0), 115: (1, 0), 116: (7, 0),
+    117: (7, 0), 118: (1, 0), 119: (9, 0), 120: (7, 0), 121: (9, 0), 122: (9, 0),
+    123: (10, 0), 124: (10, 0), 125: (1, 0), 126: (3, 3), 127: (3, 0), 128: (5, 0),
+    134: (5, 0), 135: (7, 0), 136: (7, 0), 137: (7, 0), 138: (7, 0), 139: (7, 0),
+    140: (7, 0), 141: (7, 0), 142: (7, 0), 143: (7, 0), 144: (7, 0), 145: (7, 0),
+    146: (7, 0), 147: (7, 0), 148: (7, 0), 149: (7, 0), 150: (7, 0), 151: (5, 9),
+    152: (1, 0), 153: (1, 0), 154: (7, 0), 155: (7, 10), 156: (7, 0), 157: (7, 0),
+    158: (7, 0), 159: (6, 0), 160: (7, 0), 188: (3, 16), 194: (4, 0), 195: (7, 16),
+    196: (7, 16), 197: (7, 16), 198: (7, 16), 199: (7, 16), 201: (7, 16), 204: (16, 16),
+    **{stat: (6, 0) for stat in range(214, 238)},
+    238: (5, 0),
+    **{stat: (6, 0) for stat in range(239, 254)},
+    254: (8, 0), 305: (8, 0), 306: (8, 0), 307: (8, 0), 308: (8, 0),
+    329: (9, 0), 330: (9, 0), 331: (9, 0), 332: (9, 0),
+    333: (8, 0), 334: (8, 0), 335: (8, 0), 336: (8, 0), 356: (2, 0),
+}
+# stats saved right after another one without a stat id of their own,
+# e.g. maximum fire damage after minimum fire damage
+STAT_FOLLOWERS = {
+    17: (18,), 48: (49,), 50: (51,), 52: (53,), 54: (55, 56), 57: (58, 59),
+}
+PROPERTIES_END = 0x1FF
+
+
+class SaveFormatError(Exception):
+    pass
+
+
+def _huffman_tree(codes: dict[str, str]):
+    # nested [child for 0, child for 1] lists with characters as leaves
+    tree = [None, None]
+    for char, code in codes.items():
+        node = tree
+        for bit in code[:-1]:
+            if node[int(bit)] is None:
+                node[int(bit)] = [None, None]
+            node = node[int(bit)]
+        node[int(code[-1])] = char
+    return tree
+
+
+_HUFFMAN_TREE = _huffman_tree(HUFFMAN_CODES)
+
+
+# reads little endian bit fields, the first bit of a field is its lowest
+class BitReader:
+    def __init__(self, data: bytes, offset: int = 0):
+        self.data = data
+        self.pos = offset * 8
+
+    def read(self, bits: int) -> int:
+        start = self.pos >> 3
+        end = (self.pos + bits + 7) >> 3
+        if end > len(self.data):
+            raise SaveFormatError('unexpected end of item data')
+        value = int.from_bytes(self.data[start:end], 'little') >> (self.pos & 7)
+        self.pos += bits
+        return value & ((1 << bits) - 1)
+
+    def read_code(self) -> str:
+        # 4 huffman coded characters, 3 character codes end with a space
+        code = ''
+        for _ in range(4):
+            node = _HUFFMAN_TREE
+            while not isinstance(node, str):
+                node = node[self.read(1)]
+                if node is None:
+                    raise SaveFormatError('invalid item code')
+            code += node
+        return code.rstrip()
+
+    def align(self):
+        self.pos = (self.pos + 7) & ~7
+
+    def read_bytes(self, count: int) -> bytes:
+        # count bytes from the next byte boundary on
+        self.align()
+        start = self.pos >> 3
+        if start + count > len(self.data):
+            raise SaveFormatError('unexpected end of item data')
+        self.pos += count * 8
+        return self.data[start : start + count]
+
+    def peek_bytes(self, count: int) -> bytes:
+        start = (self.pos + 7) >> 3
+        return self.data[start : start + count]
+
+
+@dataclass
+class ParsedItem:
+    code: str
+    simple: bool
+    location: int
+    # row of UniqueItems.txt/SetItems.txt for unique and set items
+    quality: int = 0
+    quality_id: int | None = None
+    # items in its sockets, they follow it in the item list
+    socketed: int = 0
+
+
+def parse_item(reader: BitReader) -> ParsedItem:
+    # reads an item, the reader is at the next item afterwards. how many bits a
+    # property takes is in STAT_BITS, an unknown stat is a SaveFormatError
+    flags = reader.read(32)
+    if flags >> FLAG_EAR & 1:
+        raise SaveFormatError('ears are not supported')
+    reader.read(3)  # item format version
+    location = reader.read(3)
+    reader.read(4 + 4 + 4 + 3)  # equipped slot, x, y, page
+    item = ParsedItem(reader.read_code(), bool(flags >> FLAG_SIMPLE & 1), location)
+    if item.simple:
+        item.socketed = reader.read(1)
+        reader.align()
+        return item
+    item.socketed = reader.read(3)
+    reader.read(32 + 7)  # unique id, item level
+    item.quality = reader.read(4)
+    if reader.read(1):  # multiple pictures
+        reader.read(3)
+    if reader.read(1):  # class specific
+        reader.read(11)
+    if item.quality in (QUALITY_SET, QUALITY_UNIQUE):
+        item.quality_id = reader.read(QUALITY_BITS[item.quality])
+    elif item.quality in (QUALITY_RARE, QUALITY_CRAFTED):
+        reader.read(8 + 8)  # name
+        for _ in range(6):  # prefixes and suffixes
+            if reader.read(1):
+                reader.read(11)
+    else:
+        reader.read(QUALITY_BITS.get(item.quality, 0))
+    runeword = flags >> FLAG_RUNEWORD & 1
+    if runeword:
+        reader.read(12 + 4)
+    if flags >> FLAG_PERSONALIZED & 1:
+        while reader.read(8):  # name, zero terminated
+            pass
+    if item.code in TOME_CODES:
+        reader.read(5)
+    reader.read(1)  # timestamp
+    if item.code in ARMOR_CODES:
+        reader.read(STAT_BITS[31][0])  # defense
+    if (item.code in ARMOR_CODES or item.code in WEAPON_CODES) and reader.read(8):
+        reader.read(9)  # durability, if it has a maximum durability
+    if item.code in STACKABLE_CODES:
+        reader.read(9)  # quantity
+    if flags >> FLAG_SOCKETED & 1:
+        reader.read(4)  # sockets
+    # set items have up to 5 lists of set bonuses after their own properties,
+    # runewords one of the runeword's properties
+    set_lists = reader.read(5) if item.quality == QUALITY_SET else 0
+    _skip_properties(reader)
+    for _ in range(bin(set_lists).count('1') + runeword):
+        _skip_properties(reader)
+    reader.align()
+    return item
+
+
+def _skip_properties(reader: BitReader):
+    # a property list: stat ids with their values, until PROPERTIES_END
+    while (stat := reader.read(9)) != PROPERTIES_END:
+        for stat in (stat, *STAT_FOLLOWERS.get(stat, ())):
+            if stat not in STAT_BITS:
+                raise SaveFormatError(f'unknown stat {stat}')
+            bits, param_bits = STAT_BITS[stat]
+            reader.read(param_bits + bits)
+
+
+def _read_item_list(reader: BitReader, parsed: list[ParsedItem]):
+    # 'JM', item count, the items each followed by the items in its sockets
+    if reader.read_bytes(2) != ITEM_LIST_MARKER:
+        raise SaveFormatError('item list expected')
+    for _ in range(reader.read(16)):
+        item = parse_item(reader)
+        parsed.append(item)
+        for _ in range(item.socketed):
+            parsed.append(parse_item(reader))
+
+
+def parse_item_lists(data: bytes) -> list[ParsedItem]:
+    # items of a stash tab's item list, or of a character's lists: its own,
+    # the ones of its corpses, then after 'jf' the mercenary's and after 'kf'
+    # the iron golem's item. reading stops at the first item that can't be
+    # read, the items before it are returned
+    parsed = []
+    reader = BitReader(data)
+    try:
+        _read_item_list(reader, parsed)
+        if not reader.peek_bytes(2):
+            return parsed
+        if reader.peek_bytes(2) == ITEM_LIST_MARKER:
+            reader.read_bytes(2)
+            for _ in range(reader.read(16)):
+                reader.read_bytes(12)  # corpse position
+                _read_item_list(reader, parsed)
+        if reader.peek_bytes(2) == MERC_MARKER:
+            reader.read_bytes(2)
+            if reader.peek_bytes(2) == ITEM_LIST_MARKER:
+                _read_item_list(reader, parsed)
+        if reader.peek_bytes(2) == GOLEM_MARKER:
+            reader.read_bytes(2)
+            if reader.read_bytes(1) != b'\0':
+                parsed.append(parse_item(reader))
+    except SaveFormatError:
+        pass
+    return parsed
+
+
+def sections(data: bytes, stash: bool) -> list[bytes]:
+    # item data of a save file split in parts that change independently:
+    # every tab of a .d2i stash, the item lists of a .d2s character
+    # (its header and stats change on every save)
+    if data[:4] != SAVE_MAGIC:
+        raise SaveFormatError('not a save file')
+    if stash:
+        return _stash_sections(data)
+    version = int.from_bytes(data[4:8], 'little')
+    if version < MIN_VERSION:
+        raise SaveFormatError(f'unsupported save version {version:#x}')
+    # items follow the skills: 'if' and 30 bytes of skill levels
+    skills = data.find(b'if', data.find(b'gf'))
+    while skills != -1 and data[skills + 32 : skills + 34] != ITEM_LIST_MARKER:
+        skills = data.find(b'if', skills + 1)
+    if skills == -1:
+        raise SaveFormatError('item list not found')
+    return [data[skills + 32 :]]
+
+
+def _stash_sections(data: bytes) -> list[bytes]:
+    parts = []
+    offset = 0
+    while offset < len(data):
+        if data[offset : offset + 4] != SAVE_MAGIC:
+            raise SaveFormatError(f'stash tab expected at {offset}')
+        version = int.from_bytes(data[offset + 8 : offset + 12], 'little')
+        size = int.from_bytes(data[offset + 16 : offset + 20], 'little')
+        if version < MIN_VERSION:
+            raise SaveFormatError(f'unsupported stash version {version:#x}')
+        if size < STASH_HEADER_SIZE or offset + size > len(data):
+            raise SaveFormatError(f'stash tab at {offset} has invalid size {size}')
+        parts.append(data[offset + STASH_HEADER_SIZE : offset + size])
+        offset += size
+    return parts
+
+
+def rune_ids(catalog: items.Catalog) -> dict[str, int]:
+    # {item code: catalog id} of the runes
+    ids = {item.name: item.id for item in catalog.items if item.slot == items.Slot.RUNE}
+    return {f'r{i + 1:02}': ids[name] for i, name in enumerate(RUNE_NAMES) if name in ids}
+
+
+def quality_ids(
+    catalog: items.Catalog, path=SAVE_ITEMS_PATH
+) -> dict[tuple[int, int], tuple[str, int]]:
+    # {(quality, UniqueItems.txt/SetItems.txt row): (item code, catalog id)}
+    # of the unique and set items in SAVE_ITEMS_PATH, matched by name
+    qualities = {
+        'unique': (QUALITY_UNIQUE, items.Rarity.UNIQUE),
+        'set': (QUALITY_SET, items.Rarity.SET),
+    }
+    ids = {(item.rarity, item.name): item.id for item in catalog.items}
+    rows = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            quality, rarity = qualities[row['quality']]
+            item_id = ids.get((rarity, row['name']))
+            if item_id is not None:
+                rows[quality, int(row['row'])] = (row['code'], item_id)
+    return rows
+
+
+# finds catalog items in save files, only rereading what changed since the last scan.
+# files are skipped when their mtime and size or their hash didn't change,
+# stash tabs and item lists are only parsed when their hash is new
+class SaveScanner:
+    def __init__(self, catalog: items.Catalog):
+        self.rune_ids = rune_ids(catalog)
+        self.quality_ids = quality_ids(catalog)
+        # {(quality, item code): catalog id} of the bases only one unique
+        # (or set) item has, for rows that moved in a game update
+        bases = collections.Counter(
+            (quality, code) for (quality, _), (code, _) in self.quality_ids.items()
+        )
+        self.base_ids = {
+            (quality, code): item_id
+            for (quality, _), (code, item_id) in self.quality_ids.items()
+            if bases[quality, code] == 1
+        }
+        self.files = pollwatch.FileTracker(SAVE_SUFFIXES)
+        # {path: (file hash, section hashes, item ids)}
+        self._files: dict[str, tuple] = {}
+        # {section hash: item ids}, of sections of the files above
+        self._sections: dict[bytes, frozenset[int]] = {}
+        self.sections_parsed = 0
+
+    def item_id(self, item: ParsedItem) -> int | None:
+        # catalog id of a parsed item, None if it isn't in the catalog
+        if item.quality_id is None:
+            return self.rune_ids.get(item.code) if item.simple else None
+        known = self.quality_ids.get((item.quality, item.quality_id))
+        if known is not None and known[0] == item.code:
+            return known[1]
+        return self.base_ids.get((item.quality, item.code))
+
+    def _section_ids(self, section: bytes) -> tuple[bytes, frozenset[int]]:
+        digest = hashlib.blake2b(section, digest_size=16).digest()
+        ids = self._sections.get(digest)
+        if ids is None:
+            self.sections_parsed += 1
+            ids = frozenset(self.item_id(item) for item in parse_item_lists(section)) - {None}
+            self._sections[digest] = ids
+        return digest, ids
+
+    def scan_file(self, path: str) -> frozenset[int] | None:
+        # ids of items in the file, None if its content didn't change
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        known = self._files.get(path)
+        if known is not None and known[0] == digest:
+            return None
+        section_digests = []
+        ids = set()
+        for section in sections(data, stash=path.lower().endswith('.d2i')):
+            section_digest, section_ids = self._section_ids(section)
+            section_digests.append(section_digest)
+            ids |= section_ids
+        ids = frozenset(ids)
+        self._files[path] = (digest, section_digests, ids)
+        return ids
+
+    def scan(self, directory) -> set[int]:
+        # ids of items that appeared in the save files since the last scan
+        new_ids = set()
+        with instrument.timer('savewatch.scan'):
+            scanned = self.files.scan(directory)
+            if scanned is None:
+                return new_ids
+            changed, deleted = scanned
+            for path in changed:
+                previous = self._files.get(path)
+                try:
+                    ids = self.scan_file(path)
+                except (OSError, SaveFormatError):
+                    # the game may be writing it, try again next scan
+                    self.files.retry(path)
+                    continue
+                if ids is not None:
+                    new_ids |= ids - (previous[2] if previous else frozenset())
+            self._forget(deleted)
+        return new_ids
+
+    def _forget(self, deleted: list[str]):
+        # drops deleted files and sections no file has anymore
+        for path in deleted:
+            self._files.pop(path, None)
+        referenced = {digest for known in self._files.values() for digest in known[1]}
+        for digest in self._sections.keys() - referenced:
+            del self._sections[digest]
+
+
+# scans directory every interval seconds and calls on_found(ids) with new finds,
+# see pollwatch.PollingWatcher
+class SaveWatcher(pollwatch.PollingWatcher):
+    def __init__(self, catalog: items.Catalog, on_found, directory=SAVE_DIR, interval=POLL_INTERVAL):
+        super().__init__('save-watcher', SaveScanner(catalog), on_found, directory, interval)
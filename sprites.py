@@ -0,0 +1,77 @@
+import functools
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from PySide6.QtCore import QResource
+from PySide6.QtGui import QCursor, QImage, QPixmap, QTransform
+
+ASSETS_PATH = Path(__file__).parent / 'assets'
+# every sprite packed into one file, built by main.spec so the bundle opens
+# a single file instead of one per sprite. without it sprites are read from assets
+SPRITES_RESOURCE_PATH = ASSETS_PATH / 'sprites.rcc'
+SPRITES_RESOURCE_PREFIX = '/sprites'
+SPRITES = [
+    'advancedstatsbutton.sprite.00.png',
+    'advancedstatsbutton.sprite.01.png',
+    'icon.png',
+    'lootbody.sprite.00.png',
+    'lootbody.sprite.01.png',
+    'lootbody.sprite.02.png',
+    'ppress.sprite.01.png',
+]
+
+
+@functools.cache
+def _resource_registered() -> bool:
+    return SPRITES_RESOURCE_PATH.exists() and QResource.registerResource(
+        str(SPRITES_RESOURCE_PATH)
+    )
+
+
+def _path(name: str) -> str:
+    if _resource_registered():
+        return f':{SPRITES_RESOURCE_PREFIX}/{name}'
+    return str(ASSETS_PATH / name)
+
+
+# images are decoded once and shared, the functions below need a QApplication
+@functools.cache
+def image(name: str) -> QImage:
+    decoded = QImage(_path(name))
+    if decoded.isNull():
+        print(f'ERROR: Failed to load sprite {name}')
+    return decoded
+
+
+@functools.cache
+def pixmap(name: str, scale: float = 1.0, mirror: bool = False) -> QPixmap:
+    # every transformed variant is cached under its transform
+    sprite = image(name)
+    if scale != 1.0 or mirror:
+        sprite = sprite.transformed(QTransform().scale(-scale if mirror else scale, scale))
+    return QPixmap.fromImage(sprite)
+
+
+@functools.cache
+def hand_cursor() -> QCursor:
+    return QCursor(pixmap('ppress.sprite.01.png', scale=0.68), hotX=3, hotY=10)
+
+
+def build_resource():
+    # packs SPRITES into SPRITES_RESOURCE_PATH with pyside6-rcc
+    rcc = shutil.which('pyside6-rcc')
+    if rcc is None:
+        raise RuntimeError('pyside6-rcc not found, is PySide6 installed?')
+    files = '\n'.join(
+        f'    <file alias="{name}">{(ASSETS_PATH / name).as_posix()}</file>' for name in SPRITES
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        qrc = Path(tmp) / 'sprites.qrc'
+        qrc.write_text(
+            f'<RCC>\n  <qresource prefix="{SPRITES_RESOURCE_PREFIX}">\n{files}\n  </qresource>\n</RCC>\n'
+        )
+        subprocess.run(
+            [rcc, '--binary', str(qrc), '-o', str(SPRITES_RESOURCE_PATH)], check=True
+        )
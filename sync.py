@@ -0,0 +1,215 @@
+import json
+import os
+import shutil
+import struct
+from pathlib import Path
+
+import founddb
+import items
+
+# every found.db is a replica, its header UUID names it. replicas are merged
+# record by record, the latest record of an item wins (last writer wins) so
+# merging is order independent and merging the same records again changes nothing.
+# on equal timestamps ADD wins.
+# items.csv ids are the same on every machine, layer item ids are not (see
+# items.LAYER_FIRST_ID): every replica is published with its {layer key: id}
+# next to it as <name>.ids.json and its layer records are mapped to local ids
+SYNC_STATE_SUFFIX = '.sync.json'
+LAYER_IDS_SUFFIX = '.ids.json'
+
+
+class MergeState:
+    def __init__(self):
+        # {item_id: (timestamp, action)} of the winning record
+        self.latest: dict[int, tuple[float, bytes]] = {}
+        # {replica UUID: (records merged, last record merged)}, the next merge
+        # of the replica starts after it unless the replica was rewritten
+        self.watermarks: dict[str, tuple[int, tuple | None]] = {}
+
+    def add(self, action: bytes, item_id: int, timestamp: float):
+        current = self.latest.get(item_id)
+        if current is None or (timestamp, action == founddb.ADD) > (
+            current[0],
+            current[1] == founddb.ADD,
+        ):
+            self.latest[item_id] = (timestamp, action)
+
+    def merge(self, path, local_id=None) -> int:
+        # merges the records of replica path added since its last merge in a
+        # single pass, returns how many were read. local_id maps the replica's
+        # item ids to local ones, None skips the record
+        db = founddb.read(str(path))
+        key = str(db.uuid)
+        start, last = self.watermarks.get(key, (0, None))
+        records = founddb.read_records(str(path), max(start - 1, 0))
+        if start:
+            # compacted replicas are rewritten and merged from their start again
+            if start > db.records or next(records, None) != last:
+                records.close()
+                start = 0
+                records = founddb.read_records(str(path))
+        merged = 0
+        record = last if start else None
+        for record in records:
+            action, item_id, timestamp = record
+            if local_id is not None:
+                item_id = local_id(item_id)
+            if item_id is not None:
+                self.add(action, item_id, timestamp)
+            merged += 1
+        self.watermarks[key] = (start + merged, record)
+        return merged
+
+    @property
+    def found_mask(self) -> int:
+        mask = 0
+        for item_id, (_, action) in self.latest.items():
+            if action == founddb.ADD:
+                mask |= 1 << item_id
+        return mask
+
+    def records(self) -> list[tuple[bytes, int, float]]:
+        # winning (action, item_id, timestamp) records, oldest first
+        return sorted(
+            ((action, item_id, timestamp) for item_id, (timestamp, action) in self.latest.items()),
+            key=lambda record: record[2],
+        )
+
+    @classmethod
+    def load(cls, path) -> 'MergeState':
+        state = cls()
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return state
+        for item_id, (timestamp, action) in data['latest'].items():
+            state.latest[int(item_id)] = (timestamp, action.encode())
+        for key, (records, last) in data['watermarks'].items():
+            state.watermarks[key] = (
+                records,
+                (last[0].encode(), last[1], last[2]) if last else None,
+            )
+        return state
+
+    def save(self, path):
+        data = {
+            'latest': {
+                str(item_id): [timestamp, action.decode()]
+                for item_id, (timestamp, action) in self.latest.items()
+            },
+            'watermarks': {
+                key: [records, [last[0].decode(), last[1], last[2]] if last else None]
+                for key, (records, last) in self.watermarks.items()
+            },
+        }
+        temp_file = f'{path}.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_file, path)
+
+
+def layer_ids_path(path) -> Path:
+    return Path(path).with_suffix(LAYER_IDS_SUFFIX)
+
+
+def replica_ids(catalog: items.Catalog, path):
+    # local_id for MergeState.merge of replica path. its layer items are mapped
+    # by key, ones of layers this machine doesn't have get an id too so they are
+    # found once the layer is added. without ids next to the replica (no layers
+    # there) its layer records are skipped
+    try:
+        with open(layer_ids_path(path), encoding='utf-8') as f:
+            keys = {item_id: key for key, item_id in json.load(f).items()}
+    except FileNotFoundError:
+        keys = {}
+    skipped = set()
+
+    def local_id(item_id: int) -> int | None:
+        if item_id < items.LAYER_FIRST_ID:
+            return item_id
+        key = keys.get(item_id)
+        if key is None:
+            if not skipped:
+                print(f'ERROR: {path} has layer items without ids in {layer_ids_path(path)}')
+            skipped.add(item_id)
+            return None
+        return catalog.layer_item_id(key)
+
+    return local_id
+
+
+def merge_replica(state: MergeState, path, catalog: items.Catalog) -> bool:
+    # False if path isn't a readable version 2 found.db
+    try:
+        if founddb.is_v1(str(path)):
+            print(f'ERROR: {path} is a version 1 found.db, open it once to migrate it')
+            return False
+        state.merge(path, replica_ids(catalog, path))
+    except (AssertionError, OSError, ValueError, struct.error) as e:
+        print(f'ERROR: Failed to merge {path}: {e}')
+        return False
+    return True
+
+
+def apply(state: MergeState, progress: items.Progress) -> list[int]:
+    # writes the winning records that differ from progress to its found.db,
+    # returns the ids changed
+    found_ids = progress.found_ids
+    records = [
+        record
+        for record in state.records()
+        if (record[1] in found_ids) != (record[0] == founddb.ADD)
+    ]
+    return progress.apply_records(records)
+
+
+def merge(progress: items.Progress, paths, catalog: items.Catalog) -> list[int]:
+    # one-off merge of other replicas into progress, layer ids of <name>.db are
+    # read from <name>.ids.json (catalog_ids.json of the machine it is from)
+    progress.load()
+    progress.flush()
+    state = MergeState()
+    state.merge(progress.db_path)
+    for path in paths:
+        merge_replica(state, path, catalog)
+    changed = apply(state, progress)
+    progress.flush()
+    return changed
+
+
+def publish(db_path, path, catalog: items.Catalog):
+    # other replicas never see a partially copied file. the layer ids go first,
+    # they only ever grow so they cover every record of the copy
+    temp_file = f'{layer_ids_path(path)}.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(catalog.layer_ids(), f, indent=0)
+    os.replace(temp_file, layer_ids_path(path))
+    temp_file = f'{path}.tmp'
+    shutil.copyfile(db_path, temp_file)
+    os.replace(temp_file, path)
+
+
+def sync(progress: items.Progress, folder, catalog: items.Catalog) -> list[int]:
+    # merges progress with every replica in folder (e.g. one shared by cloud
+    # storage) and publishes the result as folder/<UUID>.db, returns the ids
+    # changed locally. replicas are merged incrementally from the watermarks
+    # saved next to found.db
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    progress.load()
+    progress.flush()
+    state_path = f'{progress.db_path}{SYNC_STATE_SUFFIX}'
+    state = MergeState.load(state_path)
+    own = str(founddb.read(progress.db_path).uuid)
+    state.merge(progress.db_path)
+    for path in sorted(folder.glob('*.db')):
+        if path.stem != own:
+            merge_replica(state, path, catalog)
+    changed = apply(state, progress)
+    progress.flush()
+    # records just written are merged now so the next sync starts after them
+    state.merge(progress.db_path)
+    publish(progress.db_path, folder / f'{own}.db', catalog)
+    state.save(state_path)
+    return changed
@@ -0,0 +1,131 @@
+import pytest
+
+import catalogs
+import items
+
+HEADER = 'name,base,rarity,slot,category\n'
+
+
+def new_catalog(tmp_path) -> items.Catalog:
+    return items.Catalog(ids_path=tmp_path / 'catalog_ids.json')
+
+
+def layer(*rows):
+    return [
+        items.LayerItem(name, base, items.Slot[slot], items.Rarity[rarity], category)
+        for name, base, rarity, slot, category in rows
+    ]
+
+
+def names(results):
+    return [item.name for item in results]
+
+
+MOD = [
+    ('Frostmourne', 'Runeblade', 'UNIQUE', 'WEAPON', 'Lich King'),
+    ('Helm of Domination', 'Great Helm', 'SET', 'HELM', 'Lich King'),
+    ('Saronite Band', 'Ring', 'UNIQUE', 'RING', 'Lich King'),
+]
+
+
+def test_layer_items_are_indexed(tmp_path):
+    catalog = new_catalog(tmp_path)
+    base_count = len(catalog)
+    added = catalog.update_layer('mod', layer(*MOD))
+    assert added == [items.LAYER_FIRST_ID + i for i in range(3)]
+    assert names(catalog.search('frostm')) == ['Frostmourne']
+    # set items are searchable by their set, a category of the layer
+    assert names(catalog.search('lich king')) == ['Helm of Domination']
+    assert names(catalog.search('category:"lich king" slot:ring')) == ['Saronite Band']
+    lich_king = catalog.category_names.index('Lich King')
+    assert catalog.category_items[lich_king] == set(added)
+    # ids between items.csv and the layer have no items
+    assert len(catalog.items) == len(list(catalog.items)) == base_count + 3
+    assert catalog.items[-1].name == 'Saronite Band'
+    assert [item.id for item in reversed(catalog.items)][:4] == [*added[::-1], base_count - 1]
+    with pytest.raises(IndexError):
+        catalog.item(items.LAYER_FIRST_ID - 1)
+    assert catalog.count(items.Rarity.UNIQUE) == items.Catalog().count(items.Rarity.UNIQUE) + 2
+
+    # ids are kept for the next start
+    catalog = new_catalog(tmp_path)
+    assert catalog.update_layer('mod', layer(*MOD[::-1])) == added[::-1]
+
+
+def test_updates_are_incremental(tmp_path):
+    catalog = new_catalog(tmp_path)
+    catalog.build_fuzzy_index()
+    catalog.update_layer('mod', layer(*MOD))
+    session = items.SearchSession(catalog)
+    assert names(session.search('saronite')) == ['Saronite Band']
+
+    frostmourne, helm, band = (items.LAYER_FIRST_ID + i for i in range(3))
+    changed = layer(
+        ('Frostmourne', 'Runeblade', 'UNIQUE', 'WEAPON', 'Lich King'),
+        ('Helm of Domination', 'Great Helm', 'UNIQUE', 'HELM', 'Lich King'),
+        ('Ashbringer', 'Sword', 'UNIQUE', 'WEAPON', 'Lich King'),
+    )
+    # unchanged items aren't touched, removed ids aren't reused
+    assert catalog.update_layer('mod', changed) == [helm, band + 1, band]
+    assert session.search('saronite') == []
+    assert names(catalog.search('domination')) == ['Helm of Domination']
+    assert catalog.search('lich king') == []
+    assert catalog.search('saronit', fuzzy=True) == []
+    assert not catalog.mask(items.Slot.RING) >> band & 1
+    assert catalog.update_layer('mod', changed) == []
+
+    # the indexes are the same as if the layer was loaded once
+    fresh = items.Catalog(ids_path=tmp_path / 'catalog_ids.json')
+    fresh.build_fuzzy_index()
+    fresh.update_layer('mod', changed)
+    assert catalog.search_structure == fresh.search_structure
+    assert catalog.ngram_index == fresh.ngram_index
+    assert catalog.deletes == fresh.deletes
+    assert catalog.masks == fresh.masks
+
+    assert catalog.update_layer('mod', None) == [frostmourne, helm, band + 1]
+    assert catalog.search('runeblade') == []
+    assert (catalog.slots[helm], catalog.rarities[helm], catalog.names[helm]) == (0, 0, '')
+    base = items.Catalog()
+    base.build_fuzzy_index()
+    assert catalog.search_structure == base.search_structure
+    assert catalog.ngram_index == base.ngram_index
+    assert catalog.deletes == base.deletes
+
+
+def test_stats_follow_layers(tmp_path):
+    catalog = new_catalog(tmp_path)
+    progress = items.Progress(str(tmp_path / 'found.db'))
+    stats = items.ProgressStats(catalog, progress)
+    uniques = stats.totals[items.Rarity.UNIQUE]
+    catalog.update_layer('mod', layer(*MOD))
+    progress.mark_found(items.LAYER_FIRST_ID)
+    assert stats.totals[items.Rarity.UNIQUE] == uniques + 2
+    assert stats.found[items.Rarity.UNIQUE] == 1
+    catalog.update_layer('mod', None)
+    assert stats.found[items.Rarity.UNIQUE] == 0
+    progress.close()
+
+
+def test_scanner(tmp_path, capsys):
+    directory = tmp_path / 'catalogs'
+    directory.mkdir()
+    mod = directory / 'mod.csv'
+    mod.write_text(HEADER + 'Frostmourne,Runeblade,unique,weapon,\nAshbringer,Sword,5,6,Light\n')
+    scanner = catalogs.LayerScanner()
+    [(name, layer_items)] = scanner.scan(directory)
+    assert name == 'mod'
+    assert layer_items == [
+        items.LayerItem('Frostmourne', 'Runeblade', items.Slot.WEAPON, items.Rarity.UNIQUE, 'mod'),
+        items.LayerItem('Ashbringer', 'Sword', items.Slot.WEAPON, items.Rarity.UNIQUE, 'Light'),
+    ]
+    assert scanner.scan(directory) == []
+
+    # broken files are reported once and the layer is kept
+    mod.write_text(HEADER + 'Frostmourne,Runeblade,legendary,weapon,\n')
+    assert scanner.scan(directory) == []
+    assert 'unknown rarity' in capsys.readouterr().out
+    assert scanner.scan(directory) == []
+
+    mod.unlink()
+    assert scanner.scan(directory) == [('mod', None)]
@@ -0,0 +1,79 @@
+import json
+
+import cli
+import founddb
+import items
+
+catalog = items.Catalog()
+
+
+def names(item_ids):
+    return [catalog.item(i).name for i in item_ids]
+
+
+def test_resolve():
+    assert names(cli.resolve(catalog, 'Harlequin Crest')) == ['Harlequin Crest']
+    assert names(cli.resolve(catalog, 'harlequin crest - shako')) == ['Harlequin Crest']
+    # substring of a single item
+    assert names(cli.resolve(catalog, 'Shako')) == ['Harlequin Crest']
+    # exact name wins over items containing it
+    assert names(cli.resolve(catalog, 'El')) == ['El']
+    # typo
+    assert names(cli.resolve(catalog, 'Harlequn Crest')) == ['Harlequin Crest']
+    assert len(cli.resolve(catalog, 'Tal Rasha')) == 5
+    assert cli.resolve(catalog, 'zzzz') == []
+    assert cli.resolve(catalog, '') == []
+
+
+def test_read_names():
+    assert cli.read_names(['Shako\n', '\n', '# comment\n', ' El  # rune\n']) == ['Shako', 'El']
+
+
+def test_mark_writes_once(tmp_path, capsys):
+    db_path = str(tmp_path / 'found.db')
+    names_path = tmp_path / 'names.txt'
+    names_path.write_text('Shako\nEl\nStone of Jordan\nShako\nTal Rasha\nzzzz\n')
+    assert cli.main(['--db', db_path, 'mark', '--from', str(names_path)]) == cli.EXIT_UNRESOLVED
+    err = capsys.readouterr().err
+    assert 'ambiguous: Tal Rasha' in err
+    assert 'not found: zzzz' in err
+
+    records = list(founddb.read_records(db_path))
+    assert [record[1] for record in records] == cli.resolve(catalog, 'Harlequin Crest') + [
+        0,
+        *cli.resolve(catalog, 'Stone of Jordan'),
+    ]
+    # a single batch has a single timestamp
+    assert len({record[2] for record in records}) == 1
+
+    # marking again changes nothing
+    assert cli.main(['--db', db_path, 'mark', 'El']) == 0
+    assert len(list(founddb.read_records(db_path))) == 3
+
+    assert cli.main(['--db', db_path, 'mark', '--missing', '--dry-run', 'El']) == 0
+    assert len(list(founddb.read_records(db_path))) == 3
+    assert cli.main(['--db', db_path, 'mark', '--missing', 'El']) == 0
+    assert 0 not in set(founddb.bits(founddb.read(db_path).found))
+
+
+def test_export(tmp_path, capsys):
+    db_path = str(tmp_path / 'found.db')
+    cli.main(['--db', db_path, 'mark', 'Shako'])
+    capsys.readouterr()
+    cli.main(['--db', db_path, 'export', '--format', 'json', '--found-only'])
+    exported = json.loads(capsys.readouterr().out)
+    assert [row['name'] for row in exported] == ['Harlequin Crest']
+    assert exported[0]['found'] and exported[0]['found_at']
+
+
+def test_unknown_profile(tmp_path, capsys):
+    db_path = str(tmp_path / 'found.db')
+    assert cli.main(['--db', db_path, '--profile', 'ladr', 'mark', 'El']) == cli.EXIT_UNKNOWN_PROFILE
+    assert 'unknown profile: ladr' in capsys.readouterr().err
+    assert not (tmp_path / 'found-ladr.db').exists()
+
+    assert cli.main(['--db', db_path, '--profile', 'a/b', '--create', 'stats']) == cli.EXIT_UNKNOWN_PROFILE
+    assert 'a/b' in capsys.readouterr().err
+    assert cli.main(['--db', db_path, '--profile', 'ladder', '--create', 'mark', 'El']) == 0
+    assert cli.main(['--db', db_path, '--profile', 'ladder', 'stats']) == 0
+    assert set(founddb.bits(founddb.read(str(tmp_path / 'found-ladder.db')).found)) == {0}
@@ -0,0 +1,331 @@
+import datetime
+import os
+import pathlib
+import subprocess
+import sys
+import time
+
+import pytest
+
+import founddb
+import items
+
+
+@pytest.fixture
+def found_db(tmp_path):
+    return tmp_path / 'found.db'
+
+
+@pytest.fixture
+def progress(found_db):
+    progress = items.Progress(str(found_db))
+    yield progress
+    progress.close()
+
+
+UUID = '113a52e9-c972-4a7b-a725-be1aafcf5d59'
+
+
+def _timestamp(iso):
+    return datetime.datetime.fromisoformat(iso).timestamp()
+
+
+def test_migrate_v1(found_db, progress):
+    found_db.write_text(
+        f'H,1,{UUID}\n'
+        'A,3,2024-09-01T10:00:00\n'
+        'A,5,2024-09-02T10:00:00\n'
+        'R,3\n'
+    )
+    assert progress.found_ids == {5}
+
+    db = founddb.read(str(found_db))
+    assert str(db.uuid) == UUID
+    assert db.records == 3
+    assert list(founddb.read_records(str(found_db))) == [
+        (founddb.ADD, 3, _timestamp('2024-09-01T10:00:00')),
+        (founddb.ADD, 5, _timestamp('2024-09-02T10:00:00')),
+        (founddb.REMOVE, 3, _timestamp('2024-09-02T10:00:00')),
+    ]
+
+
+def test_migrate_v1_header_without_newline(found_db, progress):
+    found_db.write_text(f'H,1,{UUID}A,7,2024-09-01T10:00:00\nA,8,2024-09-01T11:00:00\n')
+    assert progress.found_ids == {7, 8}
+    assert str(founddb.read(str(found_db)).uuid) == UUID
+
+
+def test_marks_are_written_in_order(found_db):
+    progress = items.Progress(str(found_db), fsync_policy=founddb.FSYNC_ALWAYS)
+    for item_id in range(50):
+        progress.mark_found(item_id)
+    for item_id in range(0, 50, 2):
+        progress.mark_missing(item_id)
+    assert len(progress.found_ids) == 25
+    progress.close()
+
+    assert items.Progress(str(found_db)).found_ids == set(range(1, 50, 2))
+    assert founddb.read(str(found_db)).records == 75
+
+
+def test_compaction_keeps_uuid_and_timestamps(found_db, progress):
+    progress.compact_slack_records = 10
+    log = [f'H,1,{UUID}', 'A,1,2024-01-01T00:00:00']
+    for _ in range(20):
+        log += ['A,2,2024-02-01T00:00:00', 'R,2']
+    log.append('A,4,2024-03-01T00:00:00')
+    found_db.write_text('\n'.join(log) + '\n')
+
+    progress.load()
+    progress.flush()
+
+    assert progress.found_ids == {1, 4}
+    db = founddb.read(str(found_db))
+    assert str(db.uuid) == UUID
+    # removed items keep their latest removal for merging replicas
+    assert list(founddb.read_records(str(found_db))) == [
+        (founddb.ADD, 1, _timestamp('2024-01-01T00:00:00')),
+        (founddb.REMOVE, 2, _timestamp('2024-02-01T00:00:00')),
+        (founddb.ADD, 4, _timestamp('2024-03-01T00:00:00')),
+    ]
+    assert not (found_db.parent / 'found.db.tmp').exists()
+
+
+def test_compaction_when_marking(found_db, progress):
+    progress.compact_slack_records = 3
+    for _ in range(3):
+        progress.mark_found(10)
+        progress.mark_missing(10)
+    progress.mark_found(11)
+    progress.flush()
+
+    db = founddb.read(str(found_db))
+    assert db.records <= 1 + 3 + 1
+    assert set(founddb.bits(db.found)) == {11}
+
+
+def test_bitset_grows_for_new_items(found_db, progress):
+    progress.load()
+    capacity = founddb.read(str(found_db)).capacity
+    progress.mark_found(3)
+    progress.mark_found(capacity + 5)
+    progress.flush()
+
+    db = founddb.read(str(found_db))
+    assert db.capacity > capacity + 5
+    assert set(founddb.bits(db.found)) == {3, capacity + 5}
+
+
+def test_progress_stats_follow_marks(tmp_path):
+    tracker = items.GrailTracker(tmp_path / 'found.db', items.Catalog(cache_path=tmp_path / 'items.cache'))
+    stats = tracker.stats
+    assert stats.totals[items.Rarity.UNIQUE] == 545 - 127 - 33
+    assert stats.totals[items.Rarity.SET] == 127
+    assert stats.totals[items.Slot.RUNE] == 33
+    assert stats.totals[30] == 5  # Tal Rasha's Wrappings
+    assert stats.found[items.Rarity.SET] == 0
+
+    changes = []
+    stats.subscribe(changes.append)
+    tal_rasha = sorted(tracker.catalog.category_items[30])
+    for item_id in tal_rasha[:3]:
+        tracker.mark_found(item_id)
+    tracker.mark_found(tal_rasha[0])  # already found, nothing changes
+    tracker.mark_missing(tal_rasha[1])
+    tracker.mark_found(0)  # El rune
+
+    assert stats.found[30] == 2
+    assert stats.found[items.Rarity.SET] == 2
+    assert stats.found[items.Slot.RUNE] == 1
+    assert len(changes) == 5
+    assert items.Slot.RUNE in changes[-1] and items.Rarity.SET not in changes[-1]
+    tracker.close()
+
+    # counted from the saved bitset when loaded again
+    tracker = items.GrailTracker(tmp_path / 'found.db', tracker.catalog)
+    assert tracker.stats.found[30] == 2
+
+
+def test_profiles(tmp_path, monkeypatch):
+    tracker = items.GrailTracker(str(tmp_path / 'found.db'), catalog=items.Catalog())
+    founddb.create(str(tmp_path / 'found-ladder.db'))
+    assert tracker.profile_names() == ['default', 'ladder']
+    tracker.load_profiles()
+    tracker.mark_found(0)
+    stats = tracker.stats
+    changed = []
+    stats.subscribe(changed.append)
+    switched = []
+    tracker.subscribe_profile(switched.append)
+
+    default = tracker.progress
+    tracker.switch_profile('hardcore')
+    assert switched == ['hardcore']
+    assert tracker.progress.db_path == str(tmp_path / 'found-hardcore.db')
+    assert tracker.found_ids == set()
+    assert stats.found[items.Slot.RUNE] == 0
+    assert items.Slot.RUNE in changed[-1]
+    # inactive profiles keep their bitset only
+    assert default._found_ids is None and default.found_mask == 1
+    tracker.mark_found(1)
+    assert stats.found[items.Slot.RUNE] == 1
+
+    # switching back doesn't read found.db again
+    monkeypatch.setattr(founddb, 'read', None)
+    tracker.switch_profile('default')
+    assert tracker.found_ids == {0}
+    assert stats.found[items.Slot.RUNE] == 1
+    tracker.mark_found(2)
+    tracker.close()
+
+    monkeypatch.undo()
+    assert set(founddb.bits(founddb.read(str(tmp_path / 'found.db')).found)) == {0, 2}
+    assert set(founddb.bits(founddb.read(str(tmp_path / 'found-hardcore.db')).found)) == {1}
+    assert sorted(tracker.profile_names()) == ['default', 'hardcore', 'ladder']
+    with pytest.raises(ValueError):
+        tracker.switch_profile('../found')
+
+
+def test_close_writes_every_profile(tmp_path, monkeypatch):
+    tracker = items.GrailTracker(str(tmp_path / 'found.db'), catalog=items.Catalog())
+    tracker.mark_found(0)
+    default = tracker.progress
+
+    def failing_close():
+        raise founddb.WriterError('disk gone')
+
+    tracker.switch_profile('hardcore')
+    tracker.mark_found(1)
+    monkeypatch.setattr(default, 'close', failing_close)
+    with pytest.raises(founddb.WriterError, match='disk gone'):
+        tracker.close()
+    # the failure didn't keep the other profiles from being written
+    assert set(founddb.bits(founddb.read(str(tmp_path / 'found-hardcore.db')).found)) == {1}
+
+
+def test_failed_writer_raises(found_db, progress, monkeypatch):
+    progress.load()
+
+    def failing_compact(path, bitset_size):
+        found_db.unlink()
+        raise ValueError('disk gone')
+
+    monkeypatch.setattr(founddb, 'compact', failing_compact)
+    progress.mark_found(1)
+    progress.compact()
+    # the writer stopped, flushing doesn't wait for it forever
+    with pytest.raises(founddb.WriterError, match='disk gone'):
+        progress.flush()
+    with pytest.raises(founddb.WriterError):
+        progress.mark_found(2)
+    with pytest.raises(founddb.WriterError):
+        progress.close()
+
+
+def test_interval_fsync_without_further_writes(found_db, monkeypatch):
+    progress = items.Progress(str(found_db), fsync_interval=0.05)
+    fsyncs = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fd: fsyncs.append(fd) or fsync(fd))
+    progress.mark_found(1)
+    progress.mark_found(2)
+    progress.flush()
+    synced = len(fsyncs)
+    time.sleep(0.3)
+    # the last record is synced once the interval is over
+    assert len(fsyncs) == synced + 1
+    progress.close()
+
+
+def test_truncated_bitset_is_corrupted(found_db):
+    founddb.create(str(found_db))
+    with open(found_db, 'r+b') as f:
+        f.truncate(founddb.HEADER_SIZE + 10)
+    with pytest.raises(AssertionError, match='corrupted'):
+        founddb.read(str(found_db))
+
+
+def test_log_ahead_of_bitset_is_applied(found_db, progress):
+    progress.mark_found(1)
+    progress.mark_found(2)
+    progress.close()
+    # a crash after appending the log, before the bitset was patched
+    with open(found_db, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        f.write(founddb.RECORD.pack(founddb.ADD, 3, 1.0))
+        f.write(founddb.RECORD.pack(founddb.REMOVE, 1, 2.0))
+        f.write(founddb.RECORD.pack(founddb.ADD, 4, 3.0)[:5])
+    assert founddb.read(str(found_db)).applied == 2
+    progress = items.Progress(str(found_db))
+    assert progress.found_ids == {2, 3}
+    db = founddb.read(str(found_db))
+    assert (db.records, db.applied) == (4, 4)
+    # the cut off record is dropped before appending again
+    progress.mark_found(5)
+    progress.close()
+    assert [r[1] for r in founddb.read_records(str(found_db))] == [1, 2, 3, 1, 5]
+    assert founddb.read(str(found_db)).applied == 5
+
+
+# marks items argv[2] to argv[3] found one write at a time, like the overlay
+MARK_SCRIPT = """
+import sys
+import items
+progress = items.Progress(sys.argv[1])
+progress.compact_slack_records = 10
+for item_id in range(int(sys.argv[2]), int(sys.argv[3])):
+    progress.mark_found(item_id)
+    progress.flush()
+progress.close()
+"""
+
+
+def _marking(found_db, start, end):
+    return subprocess.Popen(
+        [sys.executable, '-c', MARK_SCRIPT, str(found_db), str(start), str(end)],
+        cwd=pathlib.Path(__file__).parent.parent,
+    )
+
+
+def test_other_process_writes_in_between(found_db, progress):
+    # cli.py marks items while the overlay has its writer open
+    progress.mark_found(1)
+    progress.flush()
+    assert _marking(found_db, 2, 5).wait() == 0
+    progress.mark_found(5)
+    progress.close()
+    db = founddb.read(str(found_db))
+    assert set(founddb.bits(db.found)) == {1, 2, 3, 4, 5}
+    assert db.applied == db.records
+    assert set(items.Progress(str(found_db)).found_ids) == {1, 2, 3, 4, 5}
+
+
+def test_processes_write_at_once(found_db):
+    founddb.create(str(found_db))
+    processes = [_marking(found_db, 0, 60), _marking(found_db, 60, 120)]
+    assert [process.wait() for process in processes] == [0, 0]
+    db = founddb.read(str(found_db))
+    # both compacted the file while the other was writing it
+    assert set(founddb.bits(db.found)) == set(range(120))
+    assert db.applied == db.records
+
+
+def test_new_file_has_room_for_the_catalog(tmp_path):
+    catalog = items.Catalog()
+    tracker = items.GrailTracker(str(tmp_path / 'found.db'), catalog=catalog)
+    tracker.mark_found(len(catalog) - 1)
+    tracker.close()
+    db = founddb.read(str(tmp_path / 'found.db'))
+    assert db.bitset_size == founddb.bitset_size_for(len(catalog))
+    assert db.records == 1
+
+
+def test_growing_bitset_writes_no_placeholder_records(found_db, progress):
+    progress.mark_found(1)
+    # beyond the bitset, the file is compacted to a larger one first
+    progress.mark_found(600)
+    progress.mark_many([700, 701])
+    progress.close()
+    records = list(founddb.read_records(str(found_db)))
+    assert [item_id for _, item_id, _ in records] == [1, 600, 700, 701]
+    assert all(timestamp for _, _, timestamp in records)
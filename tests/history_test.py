@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+
+import founddb
+import history
+import items
+
+catalog = items.Catalog()
+TAL_RASHA = sorted(catalog.category_items[30])
+NOW = datetime.datetime(2024, 6, 10, 12).timestamp()
+HOUR = 60 * 60
+
+
+@pytest.fixture
+def progress(tmp_path):
+    progress = items.Progress(str(tmp_path / 'found.db'))
+    yield progress
+    progress.close()
+
+
+def test_history_from_log(progress):
+    # merged records are written out of time order
+    progress.apply_records(
+        [
+            (founddb.ADD, TAL_RASHA[0], NOW - 3 * history.DAY),
+            (founddb.ADD, TAL_RASHA[1], NOW - 3 * history.DAY + HOUR),
+            (founddb.ADD, 0, NOW - 10 * history.DAY),
+            (founddb.ADD, 1, NOW - HOUR),
+            (founddb.REMOVE, 0, NOW - 9 * history.DAY),
+        ]
+    )
+    progress.flush()
+    grail = history.History(catalog, progress)
+    assert grail.finds() == [TAL_RASHA[0], TAL_RASHA[1], 1]
+    assert grail.finds(NOW - 2 * history.DAY, NOW) == [1]
+    per_day = grail.per_day(4, NOW)
+    assert [count for _, count in per_day] == [1 + 1, 0, 0, 1]
+    assert per_day[-1][0] == datetime.date(2024, 6, 10)
+    assert [session.item_ids for session in grail.sessions()] == [TAL_RASHA[:2], [1]]
+
+
+def test_history_follows_marks(progress):
+    grail = history.History(catalog, progress)
+    progress.apply_records([(founddb.ADD, i, NOW - i * history.DAY) for i in TAL_RASHA[:4]])
+    progress.mark_found(2)
+    assert grail.finds(NOW - HOUR) == [2]
+    progress.mark_missing(2)
+    assert 2 not in grail.found_at
+
+    tal_rasha = grail.sets()[30]
+    assert tal_rasha.category == 30
+    assert (tal_rasha.found, tal_rasha.total, tal_rasha.duration) == (4, 5, None)
+    progress.apply_records([(founddb.ADD, TAL_RASHA[4], NOW)])
+    tal_rasha = grail.sets()[30]
+    assert tal_rasha.complete
+    assert tal_rasha.duration == TAL_RASHA[3] * history.DAY
+
+
+def test_projected_completion(progress):
+    grail = history.History(catalog, progress)
+    assert grail.projected_completion(now=NOW) is None
+    # 30 finds in the last 30 days
+    progress.apply_records([(founddb.ADD, i, NOW - i * history.DAY) for i in range(30)])
+    assert grail.find_rate(30, NOW) == 1
+    assert grail.projected_completion(30, NOW) == NOW + (len(catalog) - 30) * history.DAY
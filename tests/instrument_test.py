@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import founddb
+import instrument
+import items
+
+
+@pytest.fixture
+def enabled():
+    instrument.reset()
+    instrument.enable()
+    yield
+    instrument.disable()
+    instrument.reset()
+
+
+def test_disabled_records_nothing():
+    instrument.reset()
+    with instrument.timer('timer'):
+        pass
+    instrument.record('record', 1.0)
+    instrument.count('counter')
+    assert instrument.snapshot() == {}
+
+
+def test_percentiles(enabled):
+    for value in range(1, 101):
+        instrument.record('metric', float(value))
+    instrument.count('counter', 3)
+    snapshot = instrument.snapshot()
+    assert snapshot['metric']['count'] == 100
+    assert snapshot['metric']['p50_ms'] == 51.0
+    assert snapshot['metric']['p99_ms'] == 100.0
+    assert snapshot['counter'] == {'count': 3}
+
+
+def test_percentiles_are_rolling(enabled):
+    for _ in range(instrument.WINDOW):
+        instrument.record('metric', 100.0)
+    for _ in range(instrument.WINDOW):
+        instrument.record('metric', 1.0)
+    snapshot = instrument.snapshot()['metric']
+    assert snapshot['count'] == 2 * instrument.WINDOW
+    assert snapshot['p99_ms'] == 1.0
+
+
+def test_hot_paths_are_timed(enabled, tmp_path):
+    db_path = str(tmp_path / 'found.db')
+    founddb.create(db_path, 545)
+    tracker = items.GrailTracker(db_path, catalog=items.Catalog())
+    tracker.search('shako')
+    tracker.search_session().search('shako')
+    tracker.mark_found(3)
+    tracker.progress.flush()
+    tracker.close()
+    snapshot = instrument.snapshot()
+    for name in ('search', 'search.session', 'found_db.load', 'found_db.append'):
+        assert snapshot[name]['count'] >= 1, name
+    assert snapshot['found_db.records']['count'] == 1
+
+    dump_path = tmp_path / 'instrument.jsonl'
+    instrument.dump(str(dump_path))
+    instrument.dump(str(dump_path))
+    lines = dump_path.read_text().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])['metrics']['search']['count'] >= 1
@@ -1,21 +1,248 @@
 import items
 
+catalog = items.Catalog()
+
 
 def test_items_count():
-    assert len(items._ITEMS) == 545
+    assert len(catalog.items) == 545
     assert (
-        len([item for item in items._ITEMS if item.rarity == items.Rarity.SET]) == 127
+        len([item for item in catalog.items if item.rarity == items.Rarity.SET]) == 127
     )
-    assert len([item for item in items._ITEMS if item.slot == items.Slot.RUNE]) == 33
+    assert len([item for item in catalog.items if item.slot == items.Slot.RUNE]) == 33
     assert (
-        len([item for item in items._ITEMS if item.rarity == items.Rarity.UNIQUE])
+        len([item for item in catalog.items if item.rarity == items.Rarity.UNIQUE])
         == 545 - 127 - 33
     )
 
 
+def test_vectorized_counts_match_items():
+    found_mask = sum(1 << i for i in range(0, 545, 3))
+    for key in [*items.Rarity, *items.Slot, *range(len(items.CATEGORIES))]:
+        matching = [
+            item for item in catalog.items
+            if key in (item.rarity, item.slot) or key == item.category
+        ]
+        assert catalog.count(key) == len(matching), key
+        assert catalog.count(key, found_mask) == len(
+            [item for item in matching if item.id % 3 == 0]
+        ), key
+    assert catalog.counts(found_mask)[items.Slot.RUNE] == 11
+
+
+def test_items_view():
+    assert catalog.items[-1] == catalog.item(544)
+    assert [item.id for item in catalog.items[10:13]] == [10, 11, 12]
+    assert catalog.items[0] == items.Item(0, 'El', 'Rune', items.Slot.RUNE, items.Rarity.NORMAL, 32)
+
+
 def test_search_by_set_name():
-    result = [item.id for item in items.search("orphans")]
+    result = [item.id for item in catalog.search("orphans")]
     assert sorted(result) == [524, 525, 526, 527]
 
-    result = [item.id for item in items.search("heavens brethren")]
+    result = [item.id for item in catalog.search("heavens brethren")]
     assert sorted(result) == [498, 499, 500, 501]
+
+
+def _linear_search(query):
+    # reference implementation, scans every key of search_structure
+    result_indices = set()
+    for i, word in enumerate(items.prepare_words(query)):
+        hits = set()
+        for key, indices in catalog.search_structure.items():
+            if word in key:
+                hits.update(indices)
+        if i == 0:
+            result_indices.update(hits)
+        else:
+            result_indices.intersection_update(hits)
+    return result_indices
+
+
+def test_ngram_index_matches_linear_scan():
+    queries = set()
+    for item in catalog.items:
+        for word in items.prepare_words(f'{item.name} {item.base}'):
+            # every prefix and suffix covers all ngram lookup paths
+            for i in range(1, len(word) + 1):
+                queries.add(word[:i])
+                queries.add(word[-i:])
+    queries.update(['zzz', 'qx', 'ofthe', 'tal rasha', 'sha ko', 'ring of'])
+    for query in queries:
+        words = items.prepare_words(query)
+        if len(words) == 1:
+            assert catalog.matching_keys(words[0]) == {
+                key for key in catalog.search_structure if words[0] in key
+            }, query
+        result = {item.id for item in catalog.search(query)}
+        assert result == _linear_search(query), query
+
+
+def test_search_session_matches_search():
+    session = items.SearchSession(catalog, cache_size=4)
+    typed = ['s', 'sh', 'sha', 'shak', 'shako', 'shak', 'sha', 'sha r', 'sha ri',
+             'tal', 'tal ', 'tal r', 'ta', 't', '', 'harl', 'orphans']
+    for query in typed:
+        expected = {item.id for item in catalog.search(query)}
+        assert {item.id for item in session.search(query)} == expected, query
+
+
+def test_search_session_narrows_previous_hits(monkeypatch):
+    session = items.SearchSession(catalog)
+    session.search('sha')
+    session.search('shak')
+
+    def fail(words):
+        raise AssertionError(f'full search for {words}')
+
+    monkeypatch.setattr(catalog, 'search_indices', fail)
+    assert {item.name for item in session.search('shako')} == {'Harlequin Crest'}
+    # backspace is served from the prefix cache
+    session.search('shak')
+    session.search('sha')
+
+
+def test_ranked_search_returns_best_hits():
+    for query in ['shako', 'ring', 'sha', 'tal rasha', 'a', 'e', 'of the', 'zzz']:
+        words = items.prepare_words(query)
+        hits = catalog.search(query)
+        expected = sorted(
+            hits,
+            key=lambda item: (
+                catalog.match_score(item.id, words, 10**9),
+                item.id,
+            ),
+        )[:15]
+        ranked = catalog.search(query, limit=15)
+        assert [item.id for item in ranked] == [item.id for item in expected], query
+        assert ranked.total == len(hits)
+
+
+def test_ranked_search_prefers_exact_name_match():
+    assert catalog.search('el', limit=1)[0].name == 'El'
+    assert catalog.search('shako', limit=1)[0].base == 'Shako'
+
+
+def test_ranked_search_puts_unfound_first():
+    found_ids = {item.id for item in catalog.search('ring') if item.id % 2}
+    ranked = catalog.search('ring', limit=1000, found_mask=sum(1 << i for i in found_ids))
+    scores = [catalog.match_score(item.id, ['ring'], 10**9) for item in ranked]
+    for score in set(scores):
+        found = [item.id in found_ids for item, s in zip(ranked, scores) if s == score]
+        assert found == sorted(found)
+
+
+def test_catalog_cache_roundtrip(tmp_path):
+    cache_path = tmp_path / 'items.cache'
+    parsed = items.Catalog(cache_path=cache_path)
+    assert not parsed._load_cache(parsed._cache_key())
+    parsed.load()
+    assert cache_path.is_file()
+
+    cached = items.Catalog(cache_path=cache_path)
+    assert not cached._load_cache('stale')
+    cached.load()
+    assert cached._state() == parsed._state()
+
+
+def test_catalog_is_loaded_lazily(tmp_path):
+    tracker = items.GrailTracker(tmp_path / 'found.db', items.Catalog(cache_path=tmp_path / 'items.cache'))
+    assert not tracker.catalog._loaded
+    assert tracker.search('shako', limit=1)[0].name == 'Harlequin Crest'
+    assert tracker.catalog._loaded
+    assert (tmp_path / 'found.db').is_file()
+
+    tracker = items.GrailTracker(tmp_path / 'other.db', items.Catalog(cache_path=tmp_path / 'items.cache'))
+    assert len(tracker.items) == 545
+    assert not (tmp_path / 'other.db').exists()
+
+
+def test_parse_query():
+    parsed = items.parse_query('-rarity:set shako set:"tal rasha" -ring found:no foo:bar')
+    assert parsed.words == ['shako', 'foo:bar']
+    assert parsed.excluded == ['ring']
+    assert parsed.filters == [
+        (True, 'rarity', 'set'),
+        (False, 'set', 'tal rasha'),
+        (False, 'found', 'no'),
+    ]
+
+
+def test_filters_match_brute_force():
+    found_mask = sum(1 << i for i in range(0, 545, 4))
+
+    def found(item):
+        return bool(found_mask >> item.id & 1)
+
+    def text(item):
+        return ' '.join(catalog.item_words[item.id])
+
+    cases = {
+        'rarity:set slot:ring': lambda item: item.rarity == items.Rarity.SET and item.slot == items.Slot.RING,
+        'slot:ring found:no': lambda item: item.slot == items.Slot.RING and not found(item),
+        'ring -rarity:set': lambda item: 'ring' in text(item) and item.rarity != items.Rarity.SET,
+        'set:"tal rasha" -belt': lambda item: item.category == 30 and 'belt' not in text(item),
+        'rarity:set,unique slot:amu found:yes': lambda item: item.rarity in (items.Rarity.SET, items.Rarity.UNIQUE) and item.slot == items.Slot.AMULET and found(item),
+        'slot:rune -el': lambda item: item.slot == items.Slot.RUNE and 'el' not in text(item),
+        'slot:nothing': lambda item: False,
+    }
+    session = items.SearchSession(catalog)
+    for query, predicate in cases.items():
+        expected = {item.id for item in catalog.items if predicate(item)}
+        assert {item.id for item in catalog.search(query, found_mask=found_mask)} == expected, query
+        ranked = catalog.search(query, limit=5, found_mask=found_mask)
+        assert ranked.total == len(expected), query
+        if 'found' not in query:
+            assert {item.id for item in session.search(query)} == expected, query
+
+
+def test_edit_distance():
+    assert items.edit_distance('windforse', 'windforce', 2) == 1
+    assert items.edit_distance('harelquin', 'harlequin', 2) == 1
+    assert items.edit_distance('shako', 'shkoa', 2) == 2
+    assert items.edit_distance('shako', 'crown', 2) == 3
+    assert items.edit_distance('', 'ab', 2) == 2
+
+
+def test_fuzzy_keys_match_brute_force():
+    for word in ['windforse', 'harelquin', 'harelq', 'shakko', 'rasah', 'jrdan', 'ist', 'bulkathos']:
+        max_distance = items._fuzzy_distance(word)
+        expected = {}
+        if max_distance:
+            for key in catalog.search_structure:
+                distance = items._fuzzy_prefix_distance(word, key, max_distance)
+                if word not in key and distance <= max_distance:
+                    expected[key] = distance
+        assert catalog.fuzzy_keys(word) == expected, word
+
+
+def test_fuzzy_search():
+    assert catalog.search('windforse') == []
+    assert catalog.search('windforse', limit=1, fuzzy=True)[0].name == 'Windforce'
+    assert catalog.search('harelquin', limit=1, fuzzy=True)[0].name == 'Harlequin Crest'
+    assert catalog.search('tal rasah', fuzzy=True).total == 5
+    # exact and substring hits rank above typo matches
+    ranked = catalog.search('shako', limit=100, fuzzy=True)
+    assert ranked[0].name == 'Harlequin Crest'
+    session = items.SearchSession(catalog, fuzzy=True)
+    for query in ['h', 'ha', 'har', 'hare', 'harel', 'harelq', 'harel', 'windforse']:
+        expected = [item.id for item in catalog.search(query, limit=15, fuzzy=True)]
+        assert [item.id for item in session.search(query, limit=15)] == expected, query
+
+
+def test_fuzzy_session_narrows_and_caches(monkeypatch):
+    expected = {item.id for item in catalog.search('harlequn', fuzzy=True)}
+    session = items.SearchSession(catalog, fuzzy=True)
+    session.search('har')
+    session.search('harl')
+
+    def fail(words, fuzzy_words=None):
+        raise AssertionError(f'full search for {words}')
+
+    monkeypatch.setattr(catalog, 'search_indices', fail)
+    for query in ['harle', 'harleq', 'harlequ', 'harlequn']:
+        session.search(query)
+    assert {item.id for item in session.search('harlequn')} == expected
+
+    # typo matches of cached queries aren't looked up again
+    monkeypatch.setattr(catalog, 'fuzzy_words', fail)
+    session.search('harleq')
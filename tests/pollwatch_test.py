@@ -0,0 +1,41 @@
+import os
+
+import pollwatch
+
+
+def test_tracker_reports_changes_once(tmp_path):
+    tracker = pollwatch.FileTracker(('.d2s',))
+    save = tmp_path / 'Sorc.d2s'
+    save.write_bytes(b'1')
+    (tmp_path / 'notes.txt').write_text('x')
+    assert tracker.scan(tmp_path) == ([str(save)], [])
+    assert tracker.scan(tmp_path) == ([], [])
+
+    save.write_bytes(b'12')
+    assert tracker.scan(tmp_path) == ([str(save)], [])
+    # failed reads are retried without another change
+    tracker.retry(str(save))
+    assert tracker.scan(tmp_path) == ([str(save)], [])
+
+    os.utime(save, ns=(1, 1))
+    tracker.retry(str(save))
+    save.unlink()
+    assert tracker.scan(tmp_path) == ([], [str(save)])
+    assert tracker.scan(tmp_path / 'missing') is None
+
+
+def test_watcher_reports_changes(tmp_path):
+    class Scanner:
+        def __init__(self):
+            self.scans = []
+
+        def scan(self, directory):
+            self.scans.append(directory)
+            return [] if len(self.scans) > 1 else ['change']
+
+    reported = []
+    watcher = pollwatch.PollingWatcher('test-watcher', Scanner(), reported.append, tmp_path, 0.01)
+    watcher.start()
+    watcher.stop()
+    assert reported == [['change']]
+    assert watcher.scanner.scans[0] == tmp_path
@@ -0,0 +1,321 @@
+import os
+import random
+
+import pytest
+
+import items
+import savewatch
+
+catalog = items.Catalog()
+RUNE_IDS = savewatch.rune_ids(catalog)
+
+
+# writes save files the way the game does, to have fixtures without game files
+class BitWriter:
+    def __init__(self):
+        self.bits = []
+
+    def write(self, value: int, bits: int):
+        self.bits.extend(value >> i & 1 for i in range(bits))
+
+    def write_code(self, code: str):
+        for char in code.ljust(4):
+            self.bits.extend(int(bit) for bit in savewatch.HUFFMAN_CODES[char])
+
+    def bytes(self) -> bytes:
+        bits = self.bits + [0] * (-len(self.bits) % 8)
+        return bytes(
+            sum(bit << i for i, bit in enumerate(bits[byte : byte + 8]))
+            for byte in range(0, len(bits), 8)
+        )
+
+
+def properties(writer: BitWriter, rng: random.Random, stats=None):
+    # random values of stats (random stats by default) and the end of the list
+    if stats is None:
+        following = {stat for stats in savewatch.STAT_FOLLOWERS.values() for stat in stats}
+        stats = rng.sample(sorted(savewatch.STAT_BITS.keys() - following), 4)
+    for stat in stats:
+        writer.write(stat, 9)
+        for stat in (stat, *savewatch.STAT_FOLLOWERS.get(stat, ())):
+            # a stat the reader doesn't know gets a byte
+            bits, param_bits = savewatch.STAT_BITS.get(stat, (8, 0))
+            writer.write(rng.getrandbits(param_bits + bits), param_bits + bits)
+    writer.write(savewatch.PROPERTIES_END, 9)
+
+
+def item_bytes(
+    code: str,
+    quality: int = 0,
+    quality_id: int = 0,
+    seed: int = 0,
+    x: int = 0,
+    socketed=(),
+    runeword: bool = False,
+    name: str = '',
+    set_lists: int = 0,
+    stats=None,
+) -> bytes:
+    # the item followed by the items in socketed
+    writer = BitWriter()
+    rng = random.Random(seed)
+    simple = not quality
+    flags = 1 << 4 | simple << 21  # identified, simple
+    flags |= bool(socketed) << 11 | bool(name) << 24 | runeword << 26
+    writer.write(flags, 32)
+    writer.write(0b101, 3)
+    writer.write(0, 3 + 4)  # stored, not equipped
+    writer.write(x, 4)
+    writer.write(0, 4)
+    writer.write(5, 3)  # stash
+    writer.write_code(code)
+    if simple:
+        writer.write(0, 1)
+        return writer.bytes()
+    writer.write(len(socketed), 3)
+    writer.write(rng.getrandbits(32), 32)
+    writer.write(80, 7)
+    writer.write(quality, 4)
+    writer.write(0, 2)  # one picture, not class specific
+    if quality in (savewatch.QUALITY_RARE, savewatch.QUALITY_CRAFTED):
+        writer.write(rng.getrandbits(16), 16)
+        for _ in range(6):
+            writer.write(1, 1)
+            writer.write(rng.getrandbits(11), 11)
+    elif quality in (savewatch.QUALITY_SET, savewatch.QUALITY_UNIQUE):
+        writer.write(quality_id, 12)
+    else:
+        bits = savewatch.QUALITY_BITS.get(quality, 0)
+        writer.write(rng.getrandbits(bits), bits)
+    if runeword:
+        writer.write(rng.getrandbits(16), 16)
+    if name:
+        for char in name + '\0':
+            writer.write(ord(char), 8)
+    if code in savewatch.TOME_CODES:
+        writer.write(rng.getrandbits(5), 5)
+    writer.write(0, 1)
+    if code in savewatch.ARMOR_CODES:
+        writer.write(rng.getrandbits(11), 11)
+    if code in savewatch.ARMOR_CODES or code in savewatch.WEAPON_CODES:
+        writer.write(250, 8)
+        writer.write(rng.getrandbits(9), 9)
+    if code in savewatch.STACKABLE_CODES:
+        writer.write(rng.getrandbits(9), 9)
+    if socketed:
+        writer.write(len(socketed) + 1, 4)
+    if quality == savewatch.QUALITY_SET:
+        writer.write(set_lists, 5)
+    properties(writer, rng, stats)
+    for _ in range(bin(set_lists).count('1') + runeword):
+        properties(writer, rng)
+    return writer.bytes() + b''.join(socketed)
+
+
+def item_list(*item_data: bytes) -> bytes:
+    return b'JM' + len(item_data).to_bytes(2, 'little') + b''.join(item_data)
+
+
+def character(*item_data: bytes, corpse=(), merc=(), golem: bytes = b'') -> bytes:
+    header = bytearray(765)
+    header[:4] = savewatch.SAVE_MAGIC
+    header[4:8] = (0x63).to_bytes(4, 'little')
+    stats = b'gf' + bytes(random.Random(1).getrandbits(8) for _ in range(40))
+    skills = b'if' + bytes(30)
+    # a corpse has its position before its items
+    corpses = b'JM\1\0' + bytes(12) + item_list(*corpse) if corpse else item_list()
+    merc_items = b'jf' + (item_list(*merc) if merc else b'')
+    golem_item = b'kf' + (b'\1' + golem if golem else b'\0')
+    body = bytes(header) + stats + skills + item_list(*item_data) + corpses + merc_items + golem_item
+    data = bytearray(body)
+    data[8:12] = len(data).to_bytes(4, 'little')
+    return bytes(data)
+
+
+def stash(*tabs: list[bytes]) -> bytes:
+    data = b''
+    for tab in tabs:
+        items_data = item_list(*tab)
+        header = bytearray(savewatch.STASH_HEADER_SIZE)
+        header[:4] = savewatch.SAVE_MAGIC
+        header[8:12] = (0x63).to_bytes(4, 'little')
+        header[16:20] = (len(header) + len(items_data)).to_bytes(4, 'little')
+        data += bytes(header) + items_data
+    return data
+
+
+def codes(parsed):
+    return [item.code for item in parsed]
+
+
+def test_item_codes():
+    for code in ['r01', 'r33', 'hp1', 'cap', 'uap', 'jew', 'amu']:
+        reader = savewatch.BitReader(item_bytes(code))
+        assert savewatch.parse_item(reader).code == code
+
+
+# El rune in the stash at column 2, row 3, bit fields in the order they are read:
+#   flags     00001000 00000000 00000100 00000000   identified (bit 4), simple (bit 21)
+#   version   101, location 000, equipped 0000, x 0100, y 1100, page 101
+#   code      r 11100, 0 11111011, 1 1111100, space 10
+#   sockets   0, then zero padding to the byte
+# the bits of every byte from its lowest bit on give
+EL_RUNE = bytes.fromhex('10 00 20 00 05 c8 f4 7c 7f 02')
+
+
+def test_hand_encoded_rune():
+    item = savewatch.parse_item(savewatch.BitReader(EL_RUNE))
+    assert (item.code, item.simple) == ('r01', True)
+    data = item_list(item_bytes('cap', savewatch.QUALITY_UNIQUE, 1), EL_RUNE)
+    assert codes(savewatch.parse_item_lists(data)) == ['cap', 'r01']
+
+
+def test_extended_items():
+    # every part of an extended item is read, the rune after each one is found
+    extended = [
+        item_bytes('lea', 2),
+        item_bytes('hax', savewatch.QUALITY_LOW, seed=1),
+        item_bytes('7cr', savewatch.QUALITY_SUPERIOR, seed=2),
+        item_bytes('amu', savewatch.QUALITY_MAGIC, seed=3),
+        item_bytes('rin', savewatch.QUALITY_RARE, seed=4),
+        item_bytes('uhc', savewatch.QUALITY_CRAFTED, seed=5),
+        item_bytes('ztb', savewatch.QUALITY_SET, 105, seed=6, set_lists=0b10110),
+        item_bytes('7gd', savewatch.QUALITY_UNIQUE, seed=7, name='Sorc'),
+        item_bytes('7ja', savewatch.QUALITY_MAGIC, seed=8),
+        item_bytes('tbk', 2, seed=9),
+        item_bytes('cm3', savewatch.QUALITY_MAGIC, seed=10, stats=[17, 48, 54, 57, 204]),
+    ]
+    for i, data in enumerate(extended):
+        rune = f'r{i + 1:02}'
+        parsed = savewatch.parse_item_lists(item_list(data, item_bytes(rune)))
+        assert codes(parsed) == [savewatch.parse_item(savewatch.BitReader(data)).code, rune]
+    # a runeword, its runes follow it
+    runeword = item_bytes(
+        'xui', 2, seed=11, runeword=True, socketed=[item_bytes('r08'), item_bytes('r09')]
+    )
+    parsed = savewatch.parse_item_lists(item_list(runeword, item_bytes('r10')))
+    assert codes(parsed) == ['xui', 'r08', 'r09', 'r10']
+    assert parsed[0].socketed == 2
+
+
+def test_unreadable_item_ends_list():
+    data = item_list(
+        item_bytes('r01'),
+        item_bytes('cap', savewatch.QUALITY_MAGIC, stats=[500]),
+        item_bytes('r02'),
+    )
+    assert codes(savewatch.parse_item_lists(data)) == ['r01']
+
+
+def test_parse_character():
+    data = character(
+        item_bytes('r01'),
+        item_bytes('gpv'),
+        item_bytes('r30'),
+        item_bytes('uap', savewatch.QUALITY_UNIQUE, 123),
+        item_bytes('r08'),
+        item_bytes('rin', savewatch.QUALITY_SET, 7, seed=1),
+        item_bytes('r33'),
+        corpse=[item_bytes('r02'), item_bytes('amu', savewatch.QUALITY_UNIQUE, 117)],
+        merc=[item_bytes('r03')],
+        golem=item_bytes('7gd', savewatch.QUALITY_UNIQUE, 5),
+    )
+    [section] = savewatch.sections(data, stash=False)
+    parsed = savewatch.parse_item_lists(section)
+    assert codes(parsed) == [
+        'r01', 'gpv', 'r30', 'uap', 'r08', 'rin', 'r33', 'r02', 'amu', 'r03', '7gd'
+    ]
+    assert parsed[3].quality == savewatch.QUALITY_UNIQUE
+    assert parsed[3].quality_id == 123
+
+
+def test_every_unique_and_set_item_has_a_row():
+    rows = savewatch.quality_ids(catalog)
+    mapped = {item_id for _, item_id in rows.values()}
+    assert mapped == {
+        item.id
+        for item in catalog.items
+        if item.rarity in (items.Rarity.UNIQUE, items.Rarity.SET)
+    }
+    # every code is a known armor, weapon or misc item code
+    for code, _ in rows.values():
+        assert code in savewatch.ARMOR_CODES | savewatch.WEAPON_CODES or code in (
+            'rin', 'amu', 'cm1', 'cm2', 'cm3', 'jew'
+        )
+
+
+def test_item_ids():
+    scanner = savewatch.SaveScanner(catalog)
+    ids = {item.name: item.id for item in catalog.items}
+
+    def item_id(code, quality=0, quality_id=None, simple=False):
+        return scanner.item_id(savewatch.ParsedItem(code, simple, 0, quality, quality_id))
+
+    assert item_id('r01', simple=True) == ids['El']
+    assert item_id('rin', savewatch.QUALITY_UNIQUE, 122) == ids['Stone of Jordan']
+    assert item_id('amu', savewatch.QUALITY_SET, 95) == ids['Telling of Beads']
+    # the row of a unique of another base: matched by its base if only one
+    # unique has it, never for rings, amulets, ...
+    assert item_id('uap', savewatch.QUALITY_UNIQUE, 122) == ids['Harlequin Crest']
+    assert item_id('rin', savewatch.QUALITY_UNIQUE, 0) is None
+    assert item_id('rin', savewatch.QUALITY_SET, 122) is None
+    assert item_id('rin', savewatch.QUALITY_MAGIC) is None
+
+
+def test_unsupported_saves():
+    with pytest.raises(savewatch.SaveFormatError):
+        savewatch.sections(b'not a save file', stash=False)
+    old = bytearray(character())
+    old[4:8] = (0x60).to_bytes(4, 'little')
+    with pytest.raises(savewatch.SaveFormatError):
+        savewatch.sections(bytes(old), stash=False)
+    with pytest.raises(savewatch.SaveFormatError):
+        savewatch.sections(stash([item_bytes('r01')])[:-1], stash=True)
+
+
+def test_scanner_rescans_changes_only(tmp_path):
+    scanner = savewatch.SaveScanner(catalog)
+    stash_path = tmp_path / 'SharedStashSoftCoreV2.d2i'
+    character_path = tmp_path / 'Sorc.d2s'
+    tabs = [[item_bytes('r01')], [item_bytes('r02'), item_bytes('cap', 7, 71)], [item_bytes('r03')]]
+    stash_path.write_bytes(stash(*tabs))
+    character_path.write_bytes(character(item_bytes('r04')))
+    (tmp_path / 'notes.txt').write_text('r05')
+
+    biggins = next(item.id for item in catalog.items if item.name == "Biggin's Bonnet")
+    assert scanner.scan(tmp_path) == {RUNE_IDS[f'r0{i}'] for i in range(1, 5)} | {biggins}
+    assert scanner.sections_parsed == 4
+    assert scanner.scan(tmp_path) == set()
+
+    # rewritten with the same content
+    stash_path.write_bytes(stash(*tabs))
+    os.utime(stash_path, ns=(0, 0))
+    assert scanner.scan(tmp_path) == set()
+    assert scanner.sections_parsed == 4
+
+    # only the changed tab is parsed, only new items are reported
+    tabs[1].append(item_bytes('r06'))
+    stash_path.write_bytes(stash(*tabs))
+    os.utime(stash_path, ns=(1, 1))
+    assert scanner.scan(tmp_path) == {RUNE_IDS['r06']}
+    assert scanner.sections_parsed == 5
+
+    # a half written file is retried on the next scan
+    character_path.write_bytes(b'\x55\xaa')
+    assert scanner.scan(tmp_path) == set()
+    character_path.write_bytes(character(item_bytes('r04'), item_bytes('r07')))
+    os.utime(character_path, ns=(2, 2))
+    assert scanner.scan(tmp_path) == {RUNE_IDS['r07']}
+
+    character_path.unlink()
+    scanner.scan(tmp_path)
+    assert len(scanner._sections) == 3
+
+
+def test_watcher_reports_from_thread(tmp_path):
+    (tmp_path / 'Sorc.d2s').write_bytes(character(item_bytes('r10')))
+    reported = []
+    watcher = savewatch.SaveWatcher(catalog, reported.append, tmp_path, interval=0.01)
+    watcher.start()
+    watcher.stop()
+    assert reported == [{RUNE_IDS['r10']}]
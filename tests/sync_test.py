@@ -0,0 +1,126 @@
+import founddb
+import items
+import sync
+
+
+def replica(path, records):
+    progress = items.Progress(str(path))
+    progress.apply_records(records)
+    progress.close()
+    return str(path)
+
+
+def found(path) -> set[int]:
+    return set(founddb.bits(founddb.read(str(path)).found))
+
+
+def test_latest_record_wins(tmp_path):
+    desktop = replica(tmp_path / 'desktop.db', [(founddb.ADD, 1, 10.0), (founddb.ADD, 2, 10.0)])
+    laptop = replica(
+        tmp_path / 'laptop.db',
+        [(founddb.ADD, 2, 5.0), (founddb.ADD, 3, 20.0), (founddb.REMOVE, 2, 30.0)],
+    )
+    forward = sync.MergeState()
+    forward.merge(desktop)
+    forward.merge(laptop)
+    backward = sync.MergeState()
+    backward.merge(laptop)
+    backward.merge(desktop)
+    # the later removal of 2 wins over the find on the desktop
+    assert forward.latest == backward.latest
+    assert set(founddb.bits(forward.found_mask)) == {1, 3}
+
+    progress = items.Progress(desktop)
+    assert sync.apply(forward, progress) == [3, 2]
+    progress.close()
+    assert found(desktop) == {1, 3}
+    # the merged records keep their timestamps
+    assert list(founddb.read_records(desktop))[-2:] == [
+        (founddb.ADD, 3, 20.0),
+        (founddb.REMOVE, 2, 30.0),
+    ]
+
+
+def test_incremental_merge(tmp_path):
+    path = tmp_path / 'found.db'
+    progress = items.Progress(str(path))
+    progress.apply_records([(founddb.ADD, i, float(i)) for i in range(10)])
+    progress.flush()
+    state = sync.MergeState()
+    assert state.merge(path) == 10
+
+    state_path = tmp_path / 'found.db.sync.json'
+    state.save(state_path)
+    state = sync.MergeState.load(state_path)
+    assert state.merge(path) == 0
+    progress.apply_records([(founddb.REMOVE, 3, 50.0)])
+    progress.flush()
+    assert state.merge(path) == 1
+    assert 3 not in set(founddb.bits(state.found_mask))
+
+    # compacted replicas are merged again from the start
+    progress.compact()
+    progress.flush()
+    assert state.merge(path) == 10
+    assert set(founddb.bits(state.found_mask)) == set(range(10)) - {3}
+    progress.close()
+
+
+def test_sync_folder(tmp_path, capsys):
+    folder = tmp_path / 'shared'
+    desktop = items.Progress(str(tmp_path / 'desktop' / 'found.db'))
+    laptop = items.Progress(str(tmp_path / 'laptop' / 'found.db'))
+    (tmp_path / 'desktop').mkdir()
+    (tmp_path / 'laptop').mkdir()
+    catalog = items.Catalog(ids_path=tmp_path / 'catalog_ids.json')
+    desktop.mark_many([1, 2])
+    laptop.mark_found(3)
+
+    assert sync.sync(desktop, folder, catalog) == []
+    assert sync.sync(laptop, folder, catalog) == [1, 2]
+    assert sync.sync(desktop, folder, catalog) == [3]
+    laptop.mark_missing(1)
+    assert sync.sync(laptop, folder, catalog) == []
+    assert sync.sync(desktop, folder, catalog) == [1]
+    assert desktop.found_ids == laptop.found_ids == {2, 3}
+
+    # unreadable replicas are skipped
+    (folder / 'broken.db').write_bytes(b'broken')
+    assert sync.sync(desktop, folder, catalog) == []
+    assert 'ERROR' in capsys.readouterr().out
+    desktop.close()
+    laptop.close()
+    assert found(tmp_path / 'desktop' / 'found.db') == {2, 3}
+    assert len(list(folder.glob('*.db'))) == 3
+
+
+def test_sync_layer_items_by_key(tmp_path):
+    folder = tmp_path / 'shared'
+    machines = []
+    for name, layers in (('desktop', ['mod', 'ladder']), ('laptop', ['ladder', 'mod', 'other'])):
+        (tmp_path / name).mkdir()
+        catalog = items.Catalog(ids_path=tmp_path / name / 'catalog_ids.json')
+        for layer in layers:
+            catalog.update_layer(
+                layer,
+                [items.LayerItem(f'{layer} ring', 'Ring', items.Slot.RING, items.Rarity.UNIQUE, layer)],
+            )
+        machines.append((catalog, items.Progress(str(tmp_path / name / 'found.db'))))
+    (desktop_catalog, desktop), (laptop_catalog, laptop) = machines
+    mod, ladder, other = (
+        items.layer_key(layer, f'{layer} ring', 'Ring') for layer in ('mod', 'ladder', 'other')
+    )
+    # loaded in a different order, so with different ids
+    assert desktop_catalog.layer_ids()[mod] != laptop_catalog.layer_ids()[mod]
+
+    desktop.mark_found(desktop_catalog.layer_item_id(mod))
+    laptop.mark_found(laptop_catalog.layer_item_id(ladder))
+    laptop.mark_found(laptop_catalog.layer_item_id(other))
+    sync.sync(desktop, folder, desktop_catalog)
+    sync.sync(laptop, folder, laptop_catalog)
+    sync.sync(desktop, folder, desktop_catalog)
+    assert laptop.found_ids == {laptop_catalog.layer_ids()[key] for key in (mod, ladder, other)}
+    # other isn't a layer on the desktop, it is found once it is added
+    assert desktop.found_ids == {desktop_catalog.layer_ids()[key] for key in (mod, ladder, other)}
+    desktop.close()
+    laptop.close()